@@ -0,0 +1,131 @@
+"""Benchmark of whole agent conversations replayed from an LLM cassette.
+
+The scenarios, an .http or JSONL file as for load_test.py, are run in this process
+one after another, each on a pooled agent graph as /chat does, without the HTTP
+server, the scheduler and the sessions. With --record, the completions are
+requested from the LLM (AI Core or LLM_BASE_URL) and recorded to the cassette.
+Without, they are replayed from it and no LLM is called, so the time is the time of
+the agents, the tools and autogen. The completion cache is off, so every
+completion goes through the cassette.
+
+The report is printed as JSON with the conversation time percentiles in
+milliseconds, overall and per agent:
+
+    LLM_BASE_URL=http://127.0.0.1:8082/v1 python benchmarks/conversation_replay.py --record
+    python benchmarks/conversation_replay.py --repeat 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+from load_test import load_scenarios
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values: list, percentile: float) -> float:
+    """Returns a percentile of the values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def summarize(timings: List[float], failures: int) -> dict:
+    """Returns the percentiles of the conversation times."""
+    summary = {"conversations": len(timings) + failures, "failed": failures}
+    if timings:
+        summary.update(
+            {
+                "p50": round(_percentile(timings, 50), 2),
+                "p95": round(_percentile(timings, 95), 2),
+                "p99": round(_percentile(timings, 99), 2),
+                "mean": round(statistics.fmean(timings), 2),
+            }
+        )
+    return summary
+
+
+def run(scenarios: List[dict], repeat: int) -> dict:
+    """Runs the scenarios and returns the report.
+
+    Arguments:
+        scenarios -- The chat requests.
+        repeat -- Runs of every scenario.
+
+    Returns:
+        The conversation time percentiles, overall and per agent.
+    """
+    # pylint: disable=import-outside-toplevel
+    from mas_autogen.app.services.agent_service import (
+        agent_registry,
+        load_agent_modules,
+        run_conversation,
+    )
+
+    load_agent_modules()
+    timings: Dict[str, List[float]] = {}
+    failures: Dict[str, int] = {}
+    for _ in range(repeat):
+        for scenario in scenarios:
+            agent_name = scenario["agent_name"]
+            agent_pool = agent_registry.get_pool(agent_name)
+            start_time = time.perf_counter()
+            try:
+                run_conversation(agent_pool, scenario["message"])
+            except Exception as e:  # pylint: disable=broad-except
+                failures[agent_name] = failures.get(agent_name, 0) + 1
+                print(f"{agent_name}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            timings.setdefault(agent_name, []).append((time.perf_counter() - start_time) * 1000)
+
+    agents = sorted(set(timings) | set(failures))
+    return {
+        "overall": summarize(
+            [timing for values in timings.values() for timing in values], sum(failures.values())
+        ),
+        "agents": {
+            agent_name: summarize(timings.get(agent_name, []), failures.get(agent_name, 0))
+            for agent_name in agents
+        },
+    }
+
+
+def main():
+    """Records or replays the scenarios and prints the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scenarios",
+        default=os.path.join(REPO_ROOT, "requests.http"),
+        help="The .http or JSONL file of chat requests",
+    )
+    parser.add_argument(
+        "--cassette",
+        default=os.path.join(REPO_ROOT, ".cassettes", "completions.jsonl"),
+        help="The cassette file",
+    )
+    parser.add_argument("--record", action="store_true", help="Record instead of replay")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of every scenario")
+    args = parser.parse_args()
+
+    # Read by the configuration when the app is imported.
+    os.environ["LLM_CASSETTE_MODE"] = "record" if args.record else "replay"
+    os.environ["LLM_CASSETTE_PATH"] = args.cassette
+    os.environ["COMPLETION_CACHE_BACKEND"] = "none"
+    sys.path.insert(0, REPO_ROOT)
+
+    # autogen prints the conversations, keep stdout for the report.
+    stdout = sys.stdout
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        sys.stdout = devnull
+        try:
+            report = run(load_scenarios(args.scenarios), 1 if args.record else args.repeat)
+        finally:
+            sys.stdout = stdout
+    print(json.dumps({"mode": os.environ["LLM_CASSETTE_MODE"], **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
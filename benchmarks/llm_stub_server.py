@@ -0,0 +1,305 @@
+"""Local stub of the OpenAI compatible LLM endpoint for load tests without AI Core.
+
+It answers /chat/completions and /embeddings like the OpenAI API, with a
+configurable latency distribution and error rate, see stub_latency. The answers
+are scripted from the request, so the agent conversations run their usual course:
+
+- with tools, the first message calls the tool whose name best matches the user
+  message and whose arguments (ZIP code, customer id, ...) are in the messages,
+  and the message after the tool result is the final answer.
+- the speaker selection of a group chat gets the first role offered.
+- the extraction prompts get the ZIP code or customer id of the user input.
+
+Streamed completions are sent as server-sent events. Point LLM_BASE_URL at it:
+
+    python benchmarks/llm_stub_server.py --latency-ms 800 --latency-distribution lognormal
+    LLM_BASE_URL=http://127.0.0.1:8082/v1 PYTHONPATH=./ python mas_autogen/app/server.py
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+from stub_latency import StubBehavior
+
+EMBEDDING_DIMENSIONS = 64
+
+ARGUMENT_PATTERNS = {
+    "zip_code": re.compile(r"\b\d{5}\b"),
+    "customer_id": re.compile(r"\bCUST\d+\b", re.IGNORECASE),
+    "phone_number": re.compile(r"\+?\d[\d\- ]{7,}\d"),
+}
+
+
+def _text(message: Dict[str, Any]) -> str:
+    """Returns the text content of a message."""
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(content)
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z]+", text.lower()))
+
+
+def _tool_arguments(tool: Dict[str, Any], user_text: str, all_text: str) -> Dict | None:
+    """Fills the required arguments of a tool from the messages, None if one is missing."""
+    parameters = tool["function"].get("parameters") or {}
+    arguments = {}
+    for name in parameters.get("required", []):
+        pattern = ARGUMENT_PATTERNS.get(name)
+        if pattern is not None:
+            match = pattern.search(user_text) or pattern.search(all_text)
+            if match is None:
+                return None
+            arguments[name] = match.group(0).upper() if name == "customer_id" else match.group(0)
+        elif name == "message":
+            arguments[name] = "Friendly reminder of your pending invoice."
+        else:
+            arguments[name] = user_text
+    return arguments
+
+
+def _choose_tool(tools: List[Dict], user_text: str, all_text: str) -> Dict | None:
+    """Returns the tool call best matching the user message, None if no tool fits."""
+    user_words = _words(user_text)
+    best, best_score = None, -1
+    for tool in tools:
+        if tool.get("type") != "function":
+            continue
+        arguments = _tool_arguments(tool, user_text, all_text)
+        if arguments is None:
+            continue
+        function = tool["function"]
+        score = 3 * len(user_words & _words(function["name"].replace("_", " ")))
+        score += len(user_words & _words(function.get("description", "")))
+        if score > best_score:
+            best, best_score = {"name": function["name"], "arguments": arguments}, score
+    return best
+
+
+def scripted_reply(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the assistant message answering a chat completion request."""
+    messages = request.get("messages") or []
+    all_text = " ".join(_text(message) for message in messages)
+    # The request of the conversation, the later user messages are other agents.
+    user_text = next((_text(m) for m in messages if m.get("role") == "user"), "")
+    last = messages[-1] if messages else {}
+
+    role_offer = re.search(r"select the next role from \[([^\]]*)\]", all_text)
+    if role_offer:
+        first_role = role_offer.group(1).split(",")[0].strip().strip("'\"")
+        return {"role": "assistant", "content": first_role}
+
+    tools = request.get("tools") or []
+    if tools and last.get("role") not in ("tool", "function"):
+        tool_call = _choose_tool(tools, user_text, all_text)
+        if tool_call is not None:
+            return {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{uuid.uuid4().hex[:12]}",
+                        "type": "function",
+                        "function": {
+                            "name": tool_call["name"],
+                            "arguments": json.dumps(tool_call["arguments"]),
+                        },
+                    }
+                ],
+            }
+
+    if last.get("role") in ("tool", "function"):
+        answer = f"Here is what I found: {_text(last)[:400]} TERMINATE."
+        return {"role": "assistant", "content": answer}
+
+    system_text = " ".join(_text(m) for m in messages if m.get("role") == "system").lower()
+    if "extract" in system_text:
+        for pattern in (ARGUMENT_PATTERNS["zip_code"], ARGUMENT_PATTERNS["customer_id"]):
+            match = pattern.search(user_text)
+            if match:
+                return {"role": "assistant", "content": match.group(0).upper()}
+        return {"role": "assistant", "content": "None"}
+
+    return {"role": "assistant", "content": "I could not find an answer to that. TERMINATE."}
+
+
+def _tokens(text: str) -> int:
+    """Estimates the tokens of a text."""
+    return max(1, len(text) // 4)
+
+
+def embedding(text: str) -> List[float]:
+    """Returns a deterministic bag of words embedding, similar texts are close."""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in _words(text):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=2).digest()
+        vector[int.from_bytes(digest, "big") % EMBEDDING_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class LLMStubHandler(BaseHTTPRequestHandler):
+    """Serves scripted chat completions and embeddings."""
+
+    protocol_version = "HTTP/1.1"
+    behavior = StubBehavior()
+    token_interval_ms = 0.0
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Answers a chat completion or embeddings request."""
+        request = self._read_json()
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if not path.endswith(("/chat/completions", "/embeddings")):
+            self._send_json(404, {"error": {"message": f"Unknown path {path}."}})
+            return
+
+        self.behavior.wait()
+        error_status = self.behavior.error_status()
+        if error_status is not None:
+            self._send_json(
+                error_status, {"error": {"message": "Stubbed failure.", "type": "server_error"}}
+            )
+            return
+
+        if path.endswith("/embeddings"):
+            self._send_embeddings(request)
+        elif request.get("stream"):
+            self._send_stream(request)
+        else:
+            self._send_completion(request)
+
+    def _usage(self, request: Dict[str, Any], message: Dict[str, Any]) -> Dict[str, int]:
+        prompt_tokens = sum(_tokens(_text(m)) for m in request.get("messages") or [])
+        completion_tokens = _tokens(json.dumps(message.get("tool_calls")) or _text(message))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _send_completion(self, request: Dict[str, Any]):
+        message = scripted_reply(request)
+        self._send_json(
+            200,
+            {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "gpt-4o"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": message,
+                        "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                    }
+                ],
+                "usage": self._usage(request, message),
+            },
+        )
+
+    def _send_stream(self, request: Dict[str, Any]):
+        message = scripted_reply(request)
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+        }
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(delta: dict, finish_reason: str | None = None):
+            chunk = {
+                **base,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        if message.get("tool_calls"):
+            tool_calls = [{"index": i, **call} for i, call in enumerate(message["tool_calls"])]
+            send({"role": "assistant", "tool_calls": tool_calls})
+            send({}, "tool_calls")
+        else:
+            send({"role": "assistant", "content": ""})
+            for word in message["content"].split(" "):
+                if self.token_interval_ms:
+                    time.sleep(self.token_interval_ms / 1000)
+                send({"content": word + " "})
+            send({}, "stop")
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_embeddings(self, request: Dict[str, Any]):
+        inputs = request.get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self._send_json(
+            200,
+            {
+                "object": "list",
+                "model": request.get("model", "text-embedding-3-small"),
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": embedding(str(text))}
+                    for i, text in enumerate(inputs)
+                ],
+                "usage": {
+                    "prompt_tokens": sum(_tokens(str(text)) for text in inputs),
+                    "total_tokens": sum(_tokens(str(text)) for text in inputs),
+                },
+            },
+        )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keeps the stub quiet under load."""
+
+
+def main():
+    """Runs the stub server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument(
+        "--token-interval-ms", type=float, default=0, help="Delay between streamed tokens"
+    )
+    StubBehavior.add_arguments(parser)
+    args = parser.parse_args()
+
+    LLMStubHandler.behavior = StubBehavior.from_args(args)
+    LLMStubHandler.token_interval_ms = args.token_interval_ms
+
+    server = ThreadingHTTPServer((args.host, args.port), LLMStubHandler)
+    print(f"LLM stub listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
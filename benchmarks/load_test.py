@@ -0,0 +1,357 @@
+"""Load test of /chat replaying request scenarios at a target rate.
+
+The scenarios are the /chat requests of an .http file, such as requests.http, or
+the lines of a JSONL file with agent_name, message and optionally session_id, the
+format of /chat/batch. They are sent in turn at --rps, on schedule whether or not
+the earlier requests were answered, and the latency of a request counts from its
+scheduled time, so a slow server is not hidden by a slow client.
+
+The report is printed as JSON with the latency percentiles of the answered
+requests, the throughput and the error rates, overall and per agent. With
+--baseline, the report of an earlier run, it also has the relative changes.
+
+With --spawn, the LLM stub, the weather stub and the server are started on free
+ports for the run, so no AI Core or weather API is needed. The stub options are
+passed through --llm-stub and --weather-stub, the server inherits the environment:
+
+    python benchmarks/load_test.py --spawn --rps 10 --duration 30
+    python benchmarks/load_test.py --spawn --llm-stub "--latency-ms 800 --error-rate 0.01"
+    python benchmarks/load_test.py --url http://localhost:8080 --output report.json
+    python benchmarks/load_test.py --spawn --baseline report.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(REPO_ROOT, "benchmarks")
+
+# Values compared with the baseline, lower is better for all but the throughput.
+COMPARED_VALUES = ("p50", "p95", "p99", "throughput_rps", "error_rate")
+
+
+def load_http_scenarios(path: str) -> List[dict]:
+    """Returns the /chat request bodies of an .http file."""
+    with open(path, encoding="utf-8") as file:
+        blocks = file.read().split("###")
+
+    scenarios = []
+    for block in blocks:
+        lines = block.strip().splitlines()
+        request_line = next((line for line in lines if line.startswith("POST ")), None)
+        if request_line is None or not request_line.split()[1].rstrip("/").endswith("/chat"):
+            continue
+        body_start = lines.index(request_line) + 1
+        while body_start < len(lines) and lines[body_start].strip():
+            body_start += 1  # the headers
+        body = "\n".join(lines[body_start:]).strip()
+        if body:
+            scenarios.append(json.loads(body))
+    return scenarios
+
+
+def load_jsonl_scenarios(path: str) -> List[dict]:
+    """Returns the chat requests of a JSONL file."""
+    scenarios = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            message = item.get("message") or item.get("body")
+            if message and item.get("agent_name"):
+                scenarios.append(
+                    {
+                        "agent_name": item["agent_name"],
+                        "message": message,
+                        "session_id": str(item.get("session_id") or "load-test"),
+                    }
+                )
+    return scenarios
+
+
+def load_scenarios(path: str) -> List[dict]:
+    """Returns the chat requests of an .http or JSONL file.
+
+    Raises:
+        ValueError: If the file has no chat request.
+    """
+    if path.endswith(".http"):
+        scenarios = load_http_scenarios(path)
+    else:
+        scenarios = load_jsonl_scenarios(path)
+    if not scenarios:
+        raise ValueError(f"No /chat requests in {path}.")
+    return scenarios
+
+
+def _percentile(values: list, percentile: float) -> float:
+    """Returns a percentile of the values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def summarize(results: List[dict], elapsed: float) -> dict:
+    """Returns the latency percentiles, throughput and error rates of the results."""
+    answered = [result["latency_ms"] for result in results if result["outcome"] == "200"]
+    errors: Dict[str, int] = {}
+    for result in results:
+        if result["outcome"] != "200":
+            errors[result["outcome"]] = errors.get(result["outcome"], 0) + 1
+
+    summary = {
+        "requests": len(results),
+        "answered": len(answered),
+        "throughput_rps": round(len(answered) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - len(answered) / len(results), 4) if results else 0.0,
+        "errors": dict(sorted(errors.items())),
+    }
+    if answered:
+        summary.update(
+            {
+                "p50": round(_percentile(answered, 50), 1),
+                "p95": round(_percentile(answered, 95), 1),
+                "p99": round(_percentile(answered, 99), 1),
+                "max": round(max(answered), 1),
+                "mean": round(statistics.fmean(answered), 1),
+            }
+        )
+    return summary
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """Returns the relative change of the compared values against a baseline report."""
+    changes = {}
+    for key in COMPARED_VALUES:
+        current, previous = report["overall"].get(key), baseline["overall"].get(key)
+        if current is None or previous is None:
+            continue
+        changes[key] = round((current - previous) / previous, 4) if previous else None
+    return changes
+
+
+async def send(client: httpx.AsyncClient, url: str, body: dict, scheduled: float) -> dict:
+    """Sends a chat request and returns its outcome and latency from its scheduled time."""
+    try:
+        response = await client.post(url, json=body)
+        outcome = str(response.status_code)
+    except httpx.TimeoutException:
+        outcome = "timeout"
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    return {
+        "agent_name": body["agent_name"].lower(),
+        "outcome": outcome,
+        "latency_ms": (time.perf_counter() - scheduled) * 1000,
+    }
+
+
+def _request_bodies(scenarios: List[dict], total: int, sessions: str) -> List[dict]:
+    """Returns the request bodies of a run, the scenarios in turn."""
+    run_id = uuid.uuid4().hex[:8]
+    bodies = []
+    for index in range(total):
+        body = dict(scenarios[index % len(scenarios)])
+        if sessions == "unique":
+            # Without the history of the earlier replays, and not coalesced with them.
+            body["session_id"] = f"{body.get('session_id', 'load-test')}-{run_id}-{index}"
+        bodies.append(body)
+    return bodies
+
+
+async def run_load(args: argparse.Namespace, base_url: str, scenarios: List[dict]) -> dict:
+    """Sends the requests at the target rate and returns the report."""
+    url = f"{base_url.rstrip('/')}/chat"
+    total = args.requests or max(1, int(args.rps * args.duration))
+    bodies = _request_bodies(scenarios, total, args.sessions)
+
+    limits = httpx.Limits(max_connections=args.max_connections)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        if args.warm_up:
+            # Builds the agent graphs and connections outside of the measurement.
+            agent_scenarios = {scenario["agent_name"].lower(): scenario for scenario in scenarios}
+            for body in agent_scenarios.values():
+                await send(client, url, {**body, "session_id": "load-test-warm-up"}, 0)
+
+        tasks = []
+        start = time.perf_counter()
+        scheduled = start
+        for body in bodies:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(client, url, body, scheduled)))
+            interval = 1 / args.rps
+            scheduled += random.expovariate(1 / interval) if args.arrival == "poisson" else interval
+        results = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    agents = sorted({result["agent_name"] for result in results})
+    return {
+        "label": args.label,
+        "target_rps": args.rps,
+        "arrival": args.arrival,
+        "scenarios": len(scenarios),
+        "duration_s": round(elapsed, 2),
+        "overall": summarize(results, elapsed),
+        "agents": {
+            agent: summarize([r for r in results if r["agent_name"] == agent], elapsed)
+            for agent in agents
+        },
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float):
+    """Waits until a spawned server answers.
+
+    Raises:
+        RuntimeError: If the process exits or does not answer in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with {process.returncode}.")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not answer within {timeout} seconds.")
+
+
+@contextmanager
+def spawn_services(args: argparse.Namespace) -> Iterator[str]:
+    """Starts the stubs and the server pointed at them, stops them on exit.
+
+    Yields:
+        The base URL of the server.
+    """
+    llm_port, weather_port, server_port = _free_port(), _free_port(), _free_port()
+    environment = dict(os.environ)
+    environment.update(
+        {
+            "PYTHONPATH": os.pathsep.join(
+                path for path in (REPO_ROOT, environment.get("PYTHONPATH")) if path
+            ),
+            "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+            "WEATHER_API_URL": f"http://127.0.0.1:{weather_port}/v1/current.json",
+            "WEATHER_API_KEY": "stub",
+            "PORT": str(server_port),
+            "METRICS_PORT": str(_free_port()),
+        }
+    )
+    environment.setdefault("TELEMETRY_PROFILE", "metrics")
+
+    log = tempfile.NamedTemporaryFile(  # pylint: disable=consider-using-with
+        "w", prefix="load_test_", suffix=".log", delete=False
+    )
+    commands = [
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS_DIR, "llm_stub_server.py"),
+            "--port",
+            str(llm_port),
+        ]
+        + shlex.split(args.llm_stub),
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS_DIR, "weather_stub_server.py"),
+            "--port",
+            str(weather_port),
+        ]
+        + shlex.split(args.weather_stub),
+        [sys.executable, os.path.join(REPO_ROOT, "mas_autogen", "app", "server.py")],
+    ]
+    processes = []
+    try:
+        for command in commands:
+            processes.append(
+                subprocess.Popen(  # pylint: disable=consider-using-with
+                    command, cwd=REPO_ROOT, env=environment, stdout=log, stderr=log
+                )
+            )
+        base_url = f"http://127.0.0.1:{server_port}"
+        _wait_ready(f"{base_url}/", processes[-1], timeout=60)
+        print(f"Services started, logs in {log.name}", file=sys.stderr)
+        yield base_url
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        log.close()
+
+
+def main():
+    """Runs the load test and prints the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8080", help="Base URL of the server")
+    parser.add_argument(
+        "--scenarios",
+        default=os.path.join(REPO_ROOT, "requests.http"),
+        help="The .http or JSONL file of chat requests",
+    )
+    parser.add_argument("--rps", type=float, default=5, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of sending")
+    parser.add_argument("--requests", type=int, help="Requests to send, instead of --duration")
+    parser.add_argument("--arrival", choices=("constant", "poisson"), default="constant")
+    parser.add_argument(
+        "--sessions",
+        choices=("unique", "scenario"),
+        default="unique",
+        help="A new session per request, or the session ids of the scenarios",
+    )
+    parser.add_argument("--timeout", type=float, default=180, help="Seconds per request")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false")
+    parser.add_argument("--label", default="", help="Names the run in the report")
+    parser.add_argument("--output", help="Also writes the report to this file")
+    parser.add_argument("--baseline", help="A report of an earlier run to compare with")
+    parser.add_argument("--spawn", action="store_true", help="Start the stubs and the server")
+    parser.add_argument("--llm-stub", default="", help="Options of llm_stub_server.py")
+    parser.add_argument("--weather-stub", default="", help="Options of weather_stub_server.py")
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    if args.spawn:
+        with spawn_services(args) as base_url:
+            report = asyncio.run(run_load(args, base_url, scenarios))
+    else:
+        report = asyncio.run(run_load(args, args.url, scenarios))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            report["baseline_change"] = compare(report, json.load(file))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Micro-benchmark of the time the observability adds to a request.
+
+It calls a handler decorated like /chat, with metric_collector and two nested
+trace_agent_function calls, and the same handler without instrumentation, and
+reports the added time per request as JSON. Each telemetry profile is measured in
+its own process, as the providers are set up once per process. The handler does
+no work, so the numbers are the pure instrumentation cost. The OTLP export is
+replaced by a no-op, as for a collector which keeps up, so the span queue does
+not fill up and drop spans. It runs on the background thread anyway.
+
+    python benchmarks/observability_overhead.py --requests 20000
+    python benchmarks/observability_overhead.py --profiles production --head-sample-ratio 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES = ("development", "production", "metrics")
+
+
+def _percentile(values: list, percentile: float) -> float:
+    """Returns a percentile of the values."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+
+def measure(profile: str, requests: int) -> dict:
+    """Measures the handler with and without instrumentation in this process.
+
+    Arguments:
+        profile -- The telemetry profile.
+        requests -- Calls per variant.
+
+    Returns:
+        The p50 and p99 in microseconds of both variants, and the overhead.
+    """
+    # pylint: disable=import-outside-toplevel
+    from pydantic import BaseModel
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.trace.export import SpanExportResult
+    from mas_autogen.app.utils.agent_observability import AgentObservability
+
+    OTLPSpanExporter.export = lambda exporter, spans: SpanExportResult.SUCCESS
+    observability = AgentObservability(service_name="mas_app")
+    observability.setup_providers(profile)
+
+    class ChatRequest(BaseModel):
+        agent_name: str
+        message: str
+        session_id: str
+
+    def lookup(value: str) -> str:
+        return value
+
+    def extract(value: str) -> str:
+        return lookup(value)
+
+    traced_lookup = observability.trace_agent_function(function_name="lookup")(lookup)
+
+    @observability.trace_agent_function(function_name="extract")
+    def traced_extract(value: str) -> str:
+        return traced_lookup(value)
+
+    async def bare(request: ChatRequest):
+        return extract(request.message)
+
+    @observability.metric_collector(endpoint="/chat")
+    async def instrumented(request: ChatRequest):
+        return traced_extract(request.message)
+
+    async def run(handler) -> list:
+        request = ChatRequest(agent_name="weather", message="weather in 10001", session_id="1")
+        timings = []
+        for _ in range(requests):
+            start_time = time.perf_counter_ns()
+            await handler(request=request)
+            timings.append((time.perf_counter_ns() - start_time) / 1000)
+        return timings
+
+    # Warm up, the first calls set up the instruments and the export threads.
+    asyncio.run(run(instrumented))
+    bare_timings = asyncio.run(run(bare))
+    instrumented_timings = asyncio.run(run(instrumented))
+    if observability.tracer_provider is not None:
+        observability.tracer_provider.shutdown()
+
+    bare_p50 = statistics.median(bare_timings)
+    return {
+        "requests": requests,
+        "bare_p50_us": round(bare_p50, 2),
+        "instrumented_p50_us": round(statistics.median(instrumented_timings), 2),
+        "instrumented_p99_us": round(_percentile(instrumented_timings, 99), 2),
+        "overhead_p50_us": round(statistics.median(instrumented_timings) - bare_p50, 2),
+    }
+
+
+def run_profile(profile: str, args: argparse.Namespace) -> dict:
+    """Measures a profile in a fresh interpreter."""
+    environment = dict(os.environ)
+    environment.update(
+        {
+            "PYTHONPATH": os.pathsep.join(
+                path for path in (REPO_ROOT, environment.get("PYTHONPATH")) if path
+            ),
+            "TELEMETRY_TRACE_SAMPLE_RATIO": str(args.head_sample_ratio),
+            "TELEMETRY_TAIL_SAMPLE_RATIO": str(args.tail_sample_ratio),
+        }
+    )
+    result = subprocess.run(
+        [sys.executable, __file__, "--measure", profile, "--requests", str(args.requests)],
+        capture_output=True,
+        text=True,
+        env=environment,
+        cwd=REPO_ROOT,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Runs the benchmark of the selected profiles."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10000, help="Calls per variant")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--head-sample-ratio", type=float, default=1.0)
+    parser.add_argument("--tail-sample-ratio", type=float, default=1.0)
+    parser.add_argument("--measure", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        # The development profile prints every span, keep stdout for the result.
+        stdout = sys.stdout
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            sys.stdout = devnull
+            try:
+                result = measure(args.measure, args.requests)
+            finally:
+                sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    report = {profile: run_profile(profile, args) for profile in args.profiles}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
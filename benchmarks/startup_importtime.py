@@ -0,0 +1,154 @@
+"""Startup time benchmark of the server process.
+
+It imports the server module under `python -X importtime` and reports the import
+time with the slowest modules as JSON. It fails when the import exceeds the budget
+or pulls in a module which must only load lazily, e.g. autogen or the OTLP
+exporter. With --ready it also starts the server and measures until "/" answers.
+
+    python benchmarks/startup_importtime.py --budget-ms 1500
+    python benchmarks/startup_importtime.py --ready --port 8090
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_MODULE = "mas_autogen.app.server"
+
+# Imported by the agent warm up or the lifespan hook, never by the server import.
+LAZY_MODULES = (
+    "autogen",
+    "gen_ai_hub",
+    "openai",
+    "grpc",
+    "opentelemetry.sdk",
+    "opentelemetry.exporter",
+    "mas_autogen.app.agents.weather_agent",
+    "mas_autogen.app.agents.finance_group_chat_agent",
+)
+
+
+def _environment() -> dict:
+    """Returns the environment of the measured process."""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        path for path in (REPO_ROOT, environment.get("PYTHONPATH")) if path
+    )
+    return environment
+
+
+def measure_import() -> dict:
+    """Imports the server module in a fresh interpreter.
+
+    Returns:
+        The total import time in ms and the self and cumulative time per module.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {SERVER_MODULE}"],
+        capture_output=True,
+        text=True,
+        env=_environment(),
+        cwd=REPO_ROOT,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+
+    return {"total_ms": modules[SERVER_MODULE][1], "modules": modules}
+
+
+def measure_ready(port: int, timeout: float) -> float:
+    """Starts the server and waits until "/" answers.
+
+    Arguments:
+        port -- The port of the server.
+        timeout -- Seconds to wait.
+
+    Returns:
+        Milliseconds from the process start until "/" answered.
+    """
+    with socket.socket() as sock:
+        if sock.connect_ex(("127.0.0.1", port)) == 0:
+            raise RuntimeError(f"Port {port} is already in use.")
+
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join("mas_autogen", "app", "server.py")],
+        env={**_environment(), "PORT": str(port)},
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start_time < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"The server exited with {process.returncode}.")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start_time) * 1000
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"The server was not ready after {timeout} seconds.")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    """Runs the benchmark and exits with 1 on a regression."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Imports measured, the fastest counts")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Allowed import time")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules reported")
+    parser.add_argument("--ready", action="store_true", help="Also measure until / answers")
+    parser.add_argument("--port", type=int, default=8090, help="Port of the --ready server")
+    parser.add_argument("--ready-timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    runs = [measure_import() for _ in range(max(1, args.runs))]
+    fastest = min(runs, key=lambda run: run["total_ms"])
+    modules = fastest["modules"]
+
+    lazy_imported = sorted(
+        name
+        for name in modules
+        if any(name == lazy or name.startswith(f"{lazy}.") for lazy in LAZY_MODULES)
+    )
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[: args.top]
+    report = {
+        "import_ms": round(fastest["total_ms"], 1),
+        "import_ms_runs": [round(run["total_ms"], 1) for run in runs],
+        "budget_ms": args.budget_ms,
+        "modules_imported": len(modules),
+        "slowest_modules_self_ms": {name: round(times[0], 1) for name, times in slowest},
+        "lazy_modules_imported": lazy_imported,
+    }
+    if args.ready:
+        report["ready_ms"] = round(measure_ready(args.port, args.ready_timeout), 1)
+
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if fastest["total_ms"] > args.budget_ms:
+        failures.append(f"import took {fastest['total_ms']:.0f} ms, budget {args.budget_ms:.0f} ms")
+    if lazy_imported:
+        failures.append(f"lazy modules imported at startup: {', '.join(lazy_imported[:5])}")
+    if failures:
+        print("Startup regression: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
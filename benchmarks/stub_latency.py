@@ -0,0 +1,103 @@
+"""Latency and error model shared by the local stub servers.
+
+The latency of a response is drawn from a distribution around a median, so the
+stubs reproduce the long tail of a real upstream:
+
+- fixed -- every response takes the median.
+- uniform -- between 0 and twice the median.
+- lognormal -- the median with a spread of --latency-sigma, which gives a long tail.
+
+A share of the responses fails with one of the error statuses, after the latency.
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import List
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+
+
+class StubBehavior:
+    """Draws the latency and the failures of stubbed responses."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        distribution: str = "fixed",
+        sigma: float = 0.5,
+        error_rate: float = 0.0,
+        error_statuses: List[int] | None = None,
+    ):
+        """Creates the behavior.
+
+        Keyword Arguments:
+            latency_ms -- Median latency of a response (default: {0.0})
+            distribution -- One of LATENCY_DISTRIBUTIONS (default: {"fixed"})
+            sigma -- Spread of the lognormal distribution (default: {0.5})
+            error_rate -- Share of failed responses (default: {0.0})
+            error_statuses -- Statuses of the failures, drawn evenly (default: {None} for 503)
+        """
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Latency distribution must be one of {LATENCY_DISTRIBUTIONS}.")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses or [503]
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "StubBehavior":
+        """Creates the behavior of the arguments added by add_arguments."""
+        return cls(
+            latency_ms=args.latency_ms,
+            distribution=args.latency_distribution,
+            sigma=args.latency_sigma,
+            error_rate=args.error_rate,
+            error_statuses=args.error_status,
+        )
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser):
+        """Adds the latency and error options to a stub's argument parser."""
+        parser.add_argument("--latency-ms", type=float, default=0, help="Median response latency")
+        parser.add_argument(
+            "--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed"
+        )
+        parser.add_argument(
+            "--latency-sigma", type=float, default=0.5, help="Spread of the lognormal latency"
+        )
+        parser.add_argument(
+            "--error-rate", "--failure-rate", type=float, default=0, help="Share of failures"
+        )
+        parser.add_argument(
+            "--error-status",
+            "--failure-status",
+            type=int,
+            nargs="+",
+            default=[503],
+            help="Statuses of failures",
+        )
+
+    def sample_latency_ms(self) -> float:
+        """Returns the latency of a response."""
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            return random.uniform(0, 2 * self.latency_ms)
+        if self.distribution == "lognormal":
+            return random.lognormvariate(math.log(self.latency_ms), self.sigma)
+        return self.latency_ms
+
+    def wait(self):
+        """Sleeps for the latency of a response."""
+        latency_ms = self.sample_latency_ms()
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    def error_status(self) -> int | None:
+        """Returns the status of a failed response, None if the response succeeds."""
+        if random.random() < self.error_rate:
+            return random.choice(self.error_statuses)
+        return None
@@ -0,0 +1,83 @@
+"""Local stub of the weather API for exercising the weather client.
+
+It answers like the current weather endpoint of weatherapi.com with a
+configurable latency distribution and failure rate, see stub_latency. Point
+WEATHER_API_URL at it:
+
+    python benchmarks/weather_stub_server.py --port 8081 --latency-ms 50 --failure-rate 0.1
+    python benchmarks/weather_stub_server.py --latency-ms 50 --latency-distribution lognormal
+    WEATHER_API_URL=http://127.0.0.1:8081/v1/current.json WEATHER_API_KEY=stub ...
+"""
+
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from stub_latency import StubBehavior
+
+
+class WeatherStubHandler(BaseHTTPRequestHandler):
+    """Serves the current weather for any ZIP code."""
+
+    protocol_version = "HTTP/1.1"
+    behavior = StubBehavior()
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answers the current weather request."""
+        self.behavior.wait()
+
+        query = parse_qs(urlparse(self.path).query)
+        zip_code = query.get("q", [""])[0]
+        if not query.get("key"):
+            self._send_json(401, {"error": {"code": 1002, "message": "API key is invalid."}})
+            return
+        if not zip_code:
+            self._send_json(400, {"error": {"code": 1003, "message": "Parameter q is missing."}})
+            return
+        error_status = self.behavior.error_status()
+        if error_status is not None:
+            self._send_json(error_status, {"error": {"message": "Stubbed failure."}})
+            return
+
+        self._send_json(
+            200,
+            {
+                "location": {"name": f"Stubville {zip_code}"},
+                "current": {"temp_c": 21.5, "condition": {"text": "Partly cloudy"}},
+            },
+        )
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Keeps the stub quiet under load."""
+
+
+def main():
+    """Runs the stub server until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    StubBehavior.add_arguments(parser)
+    args = parser.parse_args()
+
+    WeatherStubHandler.behavior = StubBehavior.from_args(args)
+
+    server = ThreadingHTTPServer((args.host, args.port), WeatherStubHandler)
+    print(f"Weather stub listening on http://{args.host}:{args.port}/v1/current.json")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""This module pools pre-built agent graphs so that they can be reused across conversations.
+
+The agent class can be given as an import path, so that autogen and the LLM SDKs
+are only imported when the first graph is built.
+
+Checkouts waiting on a full pool are woken when a graph is released, and also when a
+graph is dropped, so that the waiter builds a replacement in the freed slot.
+"""
+
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Type
+from loguru import logger
+from mas_autogen.app.agents.super_agent import SuperAgent
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    AGENT_POOL_CHECKOUT_TIMEOUT,
+    AGENT_POOL_MAX_SIZE,
+    AGENT_POOL_WARM_UP_SIZE,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class AgentPoolExhaustedError(Exception):
+    """Raised when no agent graph becomes available within the checkout timeout."""
+
+
+@dataclass
+class AgentGraph:
+    """An agent graph built by SuperAgent.create_ai_agents.
+
+    Arguments:
+        agent -- The SuperAgent instance which built the graph.
+        sender -- The sender agent.
+        receiver -- The receiver agent.
+    """
+
+    agent: SuperAgent
+    sender: Any
+    receiver: Any
+
+
+class AgentPool:
+    """Bounded pool of reusable agent graphs for one agent type."""
+
+    def __init__(
+        self,
+        agent_cls: Type[SuperAgent] | str,
+        agent_name: str,
+        max_size: int = AGENT_POOL_MAX_SIZE,
+        checkout_timeout: float = AGENT_POOL_CHECKOUT_TIMEOUT,
+    ):
+        """Creates an empty pool. Graphs are built on warm up or on demand.
+
+        Arguments:
+            agent_cls -- The SuperAgent subclass building the graphs, or its "module:Class" path.
+            agent_name -- The agent name.
+
+        Keyword Arguments:
+            max_size -- Maximum number of graphs (default: {AGENT_POOL_MAX_SIZE})
+            checkout_timeout -- Seconds to wait for a graph (default: {AGENT_POOL_CHECKOUT_TIMEOUT})
+        """
+        self.agent_cls = agent_cls
+        self.agent_name = agent_name
+        self.max_size = max(1, max_size)
+        self.checkout_timeout = checkout_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._size = 0
+        self._in_use = 0
+
+    def load_agent_cls(self) -> Type[SuperAgent]:
+        """Imports the agent class if it was given as an import path.
+
+        Returns:
+            The SuperAgent subclass.
+        """
+        if isinstance(self.agent_cls, str):
+            module_name, _, class_name = self.agent_cls.partition(":")
+            self.agent_cls = getattr(importlib.import_module(module_name), class_name)
+        return self.agent_cls
+
+    def _reserve(self) -> bool:
+        """Reserves a slot for a new graph if the pool is not full."""
+        with self._lock:
+            if self._size >= self.max_size:
+                return False
+            self._size += 1
+            return True
+
+    def _free_slot(self):
+        """Frees a reserved slot and wakes a checkout waiting to build a graph in it."""
+        with self._available:
+            self._size -= 1
+            self._available.notify()
+
+    def _discard(self):
+        """Frees the slot of a graph that is dropped from the pool."""
+        self._free_slot()
+        agent_observability_mas.track_agent_pool_size(self.agent_name, created=-1)
+
+    def _build(self) -> AgentGraph:
+        """Builds a new agent graph for a reserved slot."""
+        # pylint: disable=import-outside-toplevel
+        from mas_autogen.app.agents.conversation_events import register_conversation_events
+
+        start_time = time.time()
+        try:
+            agent = self.load_agent_cls()(agent_name=self.agent_name)
+            sender, receiver = agent.create_ai_agents()
+            register_conversation_events(agent.get_ai_agents(sender, receiver))
+        except Exception:
+            self._free_slot()
+            raise
+
+        agent_observability_mas.track_agent_pool_size(self.agent_name, created=1)
+        agent_observability_mas.track_agent_pool_warm_up(
+            self.agent_name, (time.time() - start_time) * 1000
+        )
+        return AgentGraph(agent=agent, sender=sender, receiver=receiver)
+
+    def warm_up(self, count: int = AGENT_POOL_WARM_UP_SIZE) -> int:
+        """Builds graphs ahead of the first request.
+
+        Keyword Arguments:
+            count -- Number of idle graphs to have ready (default: {AGENT_POOL_WARM_UP_SIZE})
+
+        Returns:
+            The number of graphs built.
+        """
+        built = 0
+        while len(self._idle) < count and self._reserve():
+            graph = self._build()
+            with self._available:
+                self._idle.append(graph)
+                self._available.notify()
+            built += 1
+
+        logger.info(f"Agent pool '{self.agent_name}' warmed up with {built} graph(s).")
+        return built
+
+    def acquire(self, timeout: float | None = None) -> AgentGraph:
+        """Checks out a graph, building one if the pool is not full yet.
+
+        Keyword Arguments:
+            timeout -- Seconds to wait for a free graph (default: {None} uses checkout_timeout)
+
+        Raises:
+            AgentPoolExhaustedError: If no graph became free in time.
+
+        Returns:
+            The agent graph.
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start_time = time.time()
+        deadline = start_time + timeout
+
+        graph = None
+        with self._available:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    agent_observability_mas.track_agent_pool_checkout(
+                        self.agent_name, (time.time() - start_time) * 1000, exhausted=True
+                    )
+                    raise AgentPoolExhaustedError(
+                        f"No '{self.agent_name}' agent available after {timeout} seconds."
+                    )
+                self._available.wait(remaining)
+
+            if self._idle:
+                graph = self._idle.pop()
+            else:
+                self._size += 1
+
+        if graph is None:
+            graph = self._build()
+
+        with self._lock:
+            self._in_use += 1
+        agent_observability_mas.track_agent_pool_size(self.agent_name, in_use=1)
+        agent_observability_mas.track_agent_pool_checkout(
+            self.agent_name, (time.time() - start_time) * 1000, exhausted=False
+        )
+        return graph
+
+    def release(self, graph: AgentGraph):
+        """Resets a graph and returns it to the pool.
+
+        Arguments:
+            graph -- The agent graph returned by acquire.
+        """
+        with self._lock:
+            self._in_use -= 1
+        agent_observability_mas.track_agent_pool_size(self.agent_name, in_use=-1)
+
+        try:
+            graph.agent.reset_ai_agents(graph.sender, graph.receiver)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Dropping '{self.agent_name}' agent graph, reset failed: {e}")
+            self._discard()
+            return
+
+        with self._available:
+            self._idle.append(graph)
+            self._available.notify()
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None) -> Iterator[AgentGraph]:
+        """Context manager pairing acquire and release.
+
+        Keyword Arguments:
+            timeout -- Seconds to wait for a free graph (default: {None} uses checkout_timeout)
+
+        Yields:
+            The agent graph.
+        """
+        graph = self.acquire(timeout=timeout)
+        try:
+            yield graph
+        finally:
+            self.release(graph)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the pool size.
+
+        Returns:
+            The pool size, idle and in use graph counts.
+        """
+        with self._lock:
+            return {
+                "agent_name": self.agent_name,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+            }
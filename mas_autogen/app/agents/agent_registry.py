@@ -0,0 +1,386 @@
+"""This module keeps the registry of the agents served by the chat endpoints.
+
+An agent is a SuperAgent subclass registered under its agent name with the
+register_agent decorator, which also declares its capacity and scheduling priority:
+
+    @register_agent("weather", pool_size=4, timeout=60.0, priority="interactive")
+    class WeatherAgent(SuperAgent):
+        ...
+
+The agents are discovered by importing every module of the agents package and by
+loading the "mas_autogen.agents" entry points of the installed packages, so a new
+agent needs no change of the chat service. An entry point names the agent and
+points to its class, which registers with default capacity if it has no decorator.
+
+The discovery imports the agent modules, and with them autogen and the LLM SDKs,
+so it runs with the warm up of the agent pools and not on import. Every value of
+an agent spec can be overridden with an AGENT_<NAME>_<FIELD> environment variable,
+e.g. AGENT_FINANCE_POOL_SIZE=8. The AGENT_POOL_ prefix belongs to the settings of
+every agent pool, so no agent can be named "pool". An invalid spec or override fails
+the discovery instead of skipping the agent, and validate_env_overrides checks the
+variables at server startup, before the agents are discovered.
+
+A module of the agents package which fails to import fails the discovery as well,
+while a failing plugin of another package is logged and skipped.
+"""
+
+import dataclasses
+import importlib
+import os
+import pkgutil
+import threading
+import typing
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from typing import Any, Callable, Dict, List, Type
+from loguru import logger
+from mas_autogen.app.agents.agent_pool import AgentPool
+from mas_autogen.app.agents.super_agent import SuperAgent
+from mas_autogen.app.services.chat_scheduler import PRIORITIES
+from mas_autogen.app.utils.config import (
+    AGENT_POOL_CHECKOUT_TIMEOUT,
+    AGENT_POOL_MAX_SIZE,
+    AGENT_POOL_WARM_UP_SIZE,
+    CHAT_TIMEOUT,
+    CONVERSATION_MAX_DURATION,
+    CONVERSATION_MAX_REPEATS,
+    CONVERSATION_MAX_ROUNDS,
+    CONVERSATION_MAX_TOKENS,
+)
+from mas_autogen.app.utils.conversation_budget import ConversationBudget, max_duration_within
+
+AGENTS_PACKAGE = "mas_autogen.app.agents"
+ENTRY_POINT_GROUP = "mas_autogen.agents"
+
+# The spec fields which can not be overridden by the environment.
+FIXED_FIELDS = ("name", "agent_cls")
+
+# Agent names whose AGENT_<NAME>_ variables are global settings, e.g. AGENT_POOL_MAX_SIZE.
+RESERVED_NAMES = ("pool",)
+
+BOOLEAN_VALUES = {"1": True, "true": True, "yes": True, "0": False, "false": False, "no": False}
+
+
+class AgentSpecError(Exception):
+    """Raised when an agent spec or one of its AGENT_<NAME>_<FIELD> overrides is invalid."""
+
+
+def _invalid_reason(field_name: str, value: Any) -> str | None:
+    """Returns why a value of a spec field is invalid, None if it is valid."""
+    if field_name == "priority" and value not in PRIORITIES:
+        return f"must be one of {', '.join(PRIORITIES)}"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        minimum = 1 if field_name in ("pool_size", "max_concurrency") else 0
+        if value < minimum:
+            return f"must be at least {minimum}"
+    return None
+
+
+def _parse_override(variable: str, value: str, spec_field: dataclasses.Field) -> Any:
+    """Parses the value of an AGENT_<NAME>_<FIELD> variable.
+
+    Arguments:
+        variable -- The variable name.
+        value -- The variable value.
+        spec_field -- The overridden spec field.
+
+    Raises:
+        AgentSpecError: If the value is not valid for the field.
+
+    Returns:
+        The field value.
+    """
+    # int | None fields are parsed as int.
+    field_type = next(
+        (arg for arg in typing.get_args(spec_field.type) if arg is not type(None)),
+        spec_field.type,
+    )
+    parsed = None
+    if field_type is bool:
+        parsed = BOOLEAN_VALUES.get(value.strip().lower())
+    else:
+        try:
+            parsed = field_type(value)
+        except ValueError:
+            pass
+    if parsed is None:
+        raise AgentSpecError(f"{variable}={value!r} is not a valid {field_type.__name__}.")
+
+    reason = _invalid_reason(spec_field.name, parsed)
+    if reason is not None:
+        raise AgentSpecError(f"{variable}={value!r} {reason}.")
+    return parsed
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """The registration of an agent type.
+
+    Arguments:
+        name -- The agent name requested by the clients, lower case.
+        agent_cls -- The SuperAgent subclass.
+        pool_size -- Agent graphs in the pool, which bounds the concurrent conversations.
+        warm_up_size -- Agent graphs built ahead of the first request.
+        checkout_timeout -- Seconds to wait for a free agent graph.
+        timeout -- Seconds a conversation may take.
+        cacheable -- Whether the LLM completions of the agent are served from the cache.
+        max_concurrency -- Conversations of the agent running at once, None for the pool size.
+        priority -- The scheduling priority class: "interactive", "standard" or "batch".
+        max_duration -- Seconds a conversation may take before it answers with what it has.
+        max_tokens -- LLM tokens a conversation may spend, 0 for no limit.
+        max_rounds -- Messages the agents of a conversation may send, 0 for no limit.
+        max_repeats -- Times an agent may send the same message, 0 for no limit.
+    """
+
+    name: str
+    agent_cls: Type[SuperAgent]
+    pool_size: int = AGENT_POOL_MAX_SIZE
+    warm_up_size: int = AGENT_POOL_WARM_UP_SIZE
+    checkout_timeout: float = AGENT_POOL_CHECKOUT_TIMEOUT
+    timeout: float = CHAT_TIMEOUT
+    cacheable: bool = True
+    max_concurrency: int | None = None
+    priority: str = "standard"
+    max_duration: float = CONVERSATION_MAX_DURATION
+    max_tokens: int = CONVERSATION_MAX_TOKENS
+    max_rounds: int = CONVERSATION_MAX_ROUNDS
+    max_repeats: int = CONVERSATION_MAX_REPEATS
+
+    def __post_init__(self):
+        if self.name.lower() in RESERVED_NAMES:
+            raise AgentSpecError(
+                f"Agent '{self.name}': the name is reserved, AGENT_{self.name.upper()}_* "
+                "variables are global settings."
+            )
+        for spec_field in dataclasses.fields(self):
+            value = getattr(self, spec_field.name)
+            reason = _invalid_reason(spec_field.name, value)
+            if reason is not None:
+                raise AgentSpecError(
+                    f"Agent '{self.name}': {spec_field.name} {reason}, not {value!r}."
+                )
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Conversations of the agent running at once."""
+        return self.max_concurrency or self.pool_size
+
+    def new_budget(self) -> ConversationBudget:
+        """Returns the budget of a conversation of the agent, starting now.
+
+        The wall time limit ends before the timeout, so that the conversation answers
+        with what it has rather than failing with 504.
+        """
+        return ConversationBudget(
+            max_duration=max_duration_within(self.max_duration, self.timeout),
+            max_tokens=self.max_tokens,
+            max_rounds=self.max_rounds,
+            max_repeats=self.max_repeats,
+        )
+
+    def with_env_overrides(self) -> "AgentSpec":
+        """Returns the spec with the values set by AGENT_<NAME>_<FIELD> variables.
+
+        Raises:
+            AgentSpecError: If a variable holds an invalid value.
+        """
+        overrides = {}
+        for spec_field in dataclasses.fields(self):
+            if spec_field.name in FIXED_FIELDS:
+                continue
+            variable = f"AGENT_{self.name.upper()}_{spec_field.name.upper()}"
+            value = os.getenv(variable)
+            if value is not None:
+                overrides[spec_field.name] = _parse_override(variable, value, spec_field)
+        return dataclasses.replace(self, **overrides) if overrides else self
+
+
+def validate_env_overrides():
+    """Checks the values of the AGENT_<NAME>_<FIELD> variables of any agent name.
+
+    The agents are only discovered with the warm up of the agent pools, after the
+    server started, this fails the startup on a value the discovery would reject.
+    The global settings of the reserved names, e.g. AGENT_POOL_WARM_UP_SIZE, are skipped.
+
+    Raises:
+        AgentSpecError: If a variable holds an invalid value.
+    """
+    spec_fields = [
+        spec_field
+        for spec_field in dataclasses.fields(AgentSpec)
+        if spec_field.name not in FIXED_FIELDS
+    ]
+    reserved_prefixes = tuple(f"AGENT_{name.upper()}_" for name in RESERVED_NAMES)
+    for variable, value in os.environ.items():
+        if variable.startswith(reserved_prefixes):
+            continue
+        for spec_field in spec_fields:
+            suffix = f"_{spec_field.name.upper()}"
+            if variable.startswith("AGENT_") and variable.endswith(suffix):
+                if len(variable) > len("AGENT_") + len(suffix):
+                    _parse_override(variable, value, spec_field)
+
+
+class AgentRegistry:
+    """Registry of the agent types and of their agent pools."""
+
+    def __init__(self, package: str = AGENTS_PACKAGE, entry_point_group: str = ENTRY_POINT_GROUP):
+        """Creates an empty registry.
+
+        Keyword Arguments:
+            package -- The package scanned for agent modules (default: {AGENTS_PACKAGE})
+            entry_point_group -- The entry point group of agent plugins
+                (default: {ENTRY_POINT_GROUP})
+        """
+        self.package = package
+        self.entry_point_group = entry_point_group
+        self._specs: Dict[str, AgentSpec] = {}
+        self._pools: Dict[str, AgentPool] = {}
+        self._lock = threading.RLock()
+        self._discovered = False
+
+    @property
+    def discovered(self) -> bool:
+        """Whether the agents were discovered."""
+        return self._discovered
+
+    def register(self, spec: AgentSpec) -> AgentSpec:
+        """Registers an agent type and creates its agent pool.
+
+        Arguments:
+            spec -- The agent spec.
+
+        Raises:
+            ValueError: If another class is registered under the same name.
+            AgentSpecError: If the spec or its environment overrides are invalid.
+
+        Returns:
+            The registered spec, with its environment overrides.
+        """
+        spec = dataclasses.replace(spec, name=spec.name.lower()).with_env_overrides()
+        with self._lock:
+            registered = self._specs.get(spec.name)
+            if registered is not None:
+                if registered.agent_cls is not spec.agent_cls:
+                    raise ValueError(
+                        f"Agent '{spec.name}' is already registered by "
+                        f"{registered.agent_cls.__qualname__}."
+                    )
+                return registered
+
+            self._specs[spec.name] = spec
+            self._pools[spec.name] = AgentPool(
+                spec.agent_cls,
+                agent_name=spec.name,
+                max_size=spec.pool_size,
+                checkout_timeout=spec.checkout_timeout,
+            )
+        logger.info(f"Registered agent '{spec.name}' ({spec.agent_cls.__qualname__}).")
+        return spec
+
+    def _scan_package(self):
+        """Imports the modules of the agents package, their decorators register the agents.
+
+        A module failing to import is a bug of the application, the error is raised.
+        """
+        package = importlib.import_module(self.package)
+        for module in pkgutil.iter_modules(package.__path__, prefix=f"{self.package}."):
+            try:
+                importlib.import_module(module.name)
+            except Exception:
+                logger.error(f"Agent module '{module.name}' failed to import.")
+                raise
+
+    def _load_entry_points(self):
+        """Loads the agent plugins of the installed packages.
+
+        A failing plugin of another package is skipped, one pointing into the agents
+        package raises its error like the package scan.
+        """
+        for entry_point in entry_points(group=self.entry_point_group):
+            module_name = entry_point.module
+            in_package = module_name == self.package or module_name.startswith(f"{self.package}.")
+            try:
+                agent_cls = entry_point.load()
+                # A decorated class registered itself on import.
+                spec = getattr(agent_cls, "agent_spec", None) or AgentSpec(
+                    name=entry_point.name, agent_cls=agent_cls
+                )
+                self.register(spec)
+            except AgentSpecError:
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                if in_package:
+                    raise
+                logger.error(f"Skipping agent plugin '{entry_point.name}': {e}")
+
+    def discover(self):
+        """Registers the agents of the agents package and of the entry points, once."""
+        with self._lock:
+            if self._discovered:
+                return
+            self._scan_package()
+            self._load_entry_points()
+            self._discovered = True
+        logger.info(f"Discovered agents: {', '.join(sorted(self._specs))}.")
+
+    def get(self, agent_name: str) -> AgentSpec | None:
+        """Returns the spec of an agent.
+
+        Arguments:
+            agent_name -- The agent name, in any case.
+
+        Returns:
+            The agent spec, None if no such agent is registered.
+        """
+        if not self._discovered:
+            self.discover()
+        return self._specs.get(agent_name.lower())
+
+    def get_pool(self, agent_name: str) -> AgentPool | None:
+        """Returns the agent pool of an agent.
+
+        Arguments:
+            agent_name -- The agent name, in any case.
+
+        Returns:
+            The agent pool, None if no such agent is registered.
+        """
+        if not self._discovered:
+            self.discover()
+        return self._pools.get(agent_name.lower())
+
+    def specs(self) -> List[AgentSpec]:
+        """Returns the specs of the registered agents."""
+        self.discover()
+        return list(self._specs.values())
+
+    def warm_up(self):
+        """Builds the agent graphs of every registered agent ahead of the first request."""
+        for spec in self.specs():
+            self._pools[spec.name].warm_up(spec.warm_up_size)
+
+
+agent_registry = AgentRegistry()
+
+
+def register_agent(name: str, **metadata) -> Callable[[Type[SuperAgent]], Type[SuperAgent]]:
+    """Class decorator registering a SuperAgent subclass as an agent type.
+
+    Arguments:
+        name -- The agent name requested by the clients.
+
+    Keyword Arguments:
+        metadata -- The AgentSpec values, e.g. pool_size or timeout.
+
+    Returns:
+        The decorator, which sets the agent_spec attribute of the class.
+    """
+
+    def decorator(agent_cls: Type[SuperAgent]) -> Type[SuperAgent]:
+        agent_cls.agent_spec = agent_registry.register(
+            AgentSpec(name=name, agent_cls=agent_cls, **metadata)
+        )
+        return agent_cls
+
+    return decorator
@@ -0,0 +1,129 @@
+"""This module reports the messages of a conversation to the client streaming it.
+
+A hook on every agent of a graph sees each message before it is sent. For a
+streamed request it emits the message as an event of the conversation context:
+
+- message -- a text message of an agent.
+- tool_call -- an agent asks for functions to run, with their arguments.
+- tool_result -- the results of the functions.
+
+The hook is also the point where a cancelled conversation or one over its budget
+stops, as every round of a conversation sends at least one message, and where its
+rounds are counted and closed on the timeline of the conversation profiler.
+
+autogen's a_generate_oai_reply runs the completion on a thread without the context
+variables of the conversation, so it is replaced by one that keeps them. The
+completion tokens of async conversations reach the event sink that way.
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from autogen import Agent, ConversableAgent, GroupChatManager
+from autogen.io.base import IOStream
+from mas_autogen.app.utils.conversation_context import get_conversation_context
+from mas_autogen.app.utils.conversation_profiler import get_conversation_timeline
+
+
+def _tool_calls(message: Dict[str, Any]) -> List[dict]:
+    """Returns the function calls of a message."""
+    calls = []
+    if message.get("function_call"):
+        calls.append(message["function_call"])
+    for tool_call in message.get("tool_calls") or []:
+        if tool_call.get("type") == "function":
+            calls.append(tool_call["function"])
+    return [{"name": call.get("name"), "arguments": call.get("arguments")} for call in calls]
+
+
+def _tool_results(message: Dict[str, Any]) -> List[str]:
+    """Returns the function results of a message."""
+    if message.get("tool_responses"):
+        return [str(response.get("content") or "") for response in message["tool_responses"]]
+    return [str(message.get("content") or "")]
+
+
+def emit_message_event(
+    sender: ConversableAgent,
+    message: Dict | str,
+    recipient: Agent,
+    silent: bool,  # pylint: disable=unused-argument
+) -> Dict | str:
+    """process_message_before_send hook emitting the message to the event sink.
+
+    Arguments:
+        sender -- The agent sending the message.
+        message -- The message.
+        recipient -- The receiving agent.
+        silent -- Whether the message is printed.
+
+    Raises:
+        ConversationCancelledError: If the conversation was cancelled.
+        ConversationBudgetExceededError: If the message exceeds the budget of the conversation.
+
+    Returns:
+        The unchanged message.
+    """
+    context = get_conversation_context()
+    if context is not None:
+        context.raise_if_cancelled()
+
+    # The group chat manager only broadcasts the messages of the speakers.
+    if isinstance(sender, GroupChatManager):
+        return message
+    timeline = get_conversation_timeline()
+    if timeline is not None:
+        timeline.end_round(sender.name)
+    if context is None:
+        return message
+    payload = {"content": message} if isinstance(message, str) else message
+    if context.budget is not None:
+        context.budget.check_message(sender.name, payload, context.rounds)
+    context.rounds += 1
+    if not context.streaming:
+        return message
+
+    event = {"sender": sender.name, "recipient": recipient.name}
+
+    tool_calls = _tool_calls(payload)
+    if tool_calls:
+        context.emit("tool_call", **event, tool_calls=tool_calls)
+    elif payload.get("role") in ("tool", "function"):
+        context.emit("tool_result", **event, results=_tool_results(payload))
+    elif payload.get("content"):
+        context.emit("message", **event, content=payload["content"])
+    return message
+
+
+async def a_generate_oai_reply_in_context(
+    recipient: ConversableAgent,
+    messages: Optional[List[Dict]] = None,
+    sender: Optional[Agent] = None,
+    config: Optional[Any] = None,
+) -> Tuple[bool, Dict | str | None]:
+    """a_generate_oai_reply running the completion with the conversation context.
+
+    Returns:
+        Whether the reply is final and the reply.
+    """
+    iostream = IOStream.get_default()
+    context = contextvars.copy_context()
+
+    def generate_oai_reply():
+        with IOStream.set_default(iostream):
+            return recipient.generate_oai_reply(messages=messages, sender=sender, config=config)
+
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, generate_oai_reply)
+
+
+def register_conversation_events(agents: Iterable[ConversableAgent]):
+    """Registers the event hook on the agents of a graph.
+
+    Arguments:
+        agents -- The agents of the graph.
+    """
+    for agent in agents:
+        agent.register_hook("process_message_before_send", emit_message_event)
+        agent.replace_reply_func(
+            ConversableAgent.a_generate_oai_reply, a_generate_oai_reply_in_context
+        )
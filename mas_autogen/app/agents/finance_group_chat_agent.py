@@ -2,20 +2,27 @@
 """
 
 import autogen
-from gen_ai_hub.proxy import GenAIHubProxyClient
-from gen_ai_hub.proxy.native.openai import OpenAI as OpenAIProxy
 from loguru import logger
+from mas_autogen.app.agents.agent_registry import register_agent
+from mas_autogen.app.agents.parallel_tools import register_parallel_tool_execution
+from mas_autogen.app.agents.speaker_selection import (
+    REMINDER_INTENT_PATTERN,
+    IntentHandoff,
+    RuleBasedSpeakerSelector,
+)
 from mas_autogen.app.agents.super_agent import SuperAgent
-from mas_autogen.app.utils.aicoreclient import AICoreClient
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.aicoreclient import AICoreClient, get_openai_proxy_client
 from mas_autogen.app.utils.llm_config import (
     llm_config_for_finance_agent,
     llm_config_for_csr_agent,
     llm_config_for_group_chat_manager,
 )
 from mas_autogen.app.functions.finance_functions import (
-    extract_customer_id_using_llm,
+    find_customer_id,
     get_customer_balance,
     get_customer_details,
+    get_customer_overview,
     get_invoices,
 )
 from mas_autogen.app.utils.prompt_config import (
@@ -23,8 +30,13 @@ from mas_autogen.app.utils.prompt_config import (
     CSR_AGENT_PROMPT,
     GROUP_CHAT_MANAGER_PROMPT,
 )
+from mas_autogen.app.utils.config import FINANCE_SPEAKER_SELECTION
+
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
 
 
+@register_agent("finance")
 class FinanceGroupChatAgent(SuperAgent):
     """This class implements create_ai_agents method.
 
@@ -34,8 +46,7 @@ class FinanceGroupChatAgent(SuperAgent):
 
     def create_ai_agents(self):
 
-        gen_ai_hub_proxy_client = GenAIHubProxyClient()
-        openai_proxy_client = OpenAIProxy(proxy_client=gen_ai_hub_proxy_client)
+        openai_proxy_client = get_openai_proxy_client()
 
         csr_agent = autogen.AssistantAgent(
             name="csr_agent",
@@ -64,13 +75,29 @@ class FinanceGroupChatAgent(SuperAgent):
             csr_agent: [],
         }
 
+        # The rules follow allowed_transitions and only fall back to the LLM when ambiguous.
+        speaker_selection_method = "auto"
+        if FINANCE_SPEAKER_SELECTION == "rules":
+            speaker_selection_method = RuleBasedSpeakerSelector(
+                name="finance",
+                handoffs=[
+                    IntentHandoff(
+                        from_agent="finance_agent",
+                        to_agent="csr_agent",
+                        pattern=REMINDER_INTENT_PATTERN,
+                        after_function="fetch_customer_details",
+                    )
+                ],
+                defaults={"finance_agent": "user_proxy"},
+            )
+
         group_chat = autogen.GroupChat(
             agents=[user_proxy_agent, finance_agent, csr_agent],
             allowed_or_disallowed_speaker_transitions=allowed_transitions,
             speaker_transitions_type="allowed",
             messages=[],
             max_round=20,
-            speaker_selection_method="auto",
+            speaker_selection_method=speaker_selection_method,
         )
 
         groupchat_manager = autogen.GroupChatManager(
@@ -102,15 +129,15 @@ class FinanceGroupChatAgent(SuperAgent):
 
         def extract_customer_id(user_input: str) -> str:
             """
-            Uses an LLM to extract a ZIP code from the user's input.
+            Extracts the customer id from the user's input, using an LLM only when ambiguous.
 
             Args:
             user_input (str): The user's query.
 
             Returns:
-                str: The extracted ZIP code or None.
+                str: The extracted customer id or None.
             """
-            return extract_customer_id_using_llm(user_input=user_input)
+            return find_customer_id(user_input=user_input)
 
         def fetch_customer_details(customer_id: str) -> dict:
             """Fetches the customer details.
@@ -145,16 +172,32 @@ class FinanceGroupChatAgent(SuperAgent):
             """
             return get_invoices(customer_id)
 
+        def fetch_customer_overview(customer_id: str) -> dict:
+            """Fetches the customer details, balance and invoices.
+
+            Arguments:
+                customer_id -- The customer id.
+
+            Returns:
+                The customer details, balance and invoices.
+            """
+            return get_customer_overview(customer_id)
+
         # Register functions with user proxy agent.
         user_proxy_agent.register_function(
-            function_map={
-                "extract_customer_id": extract_customer_id,
-                "fetch_customer_details": fetch_customer_details,
-                "fetch_customer_balance": fetch_customer_balance,
-                "fetch_invoices": fetch_invoices,
-                "send_text_message": send_text_message,
-            }
+            function_map=agent_observability_mas.tool_metric_collector(
+                self.agent_name,
+                {
+                    "extract_customer_id": extract_customer_id,
+                    "fetch_customer_details": fetch_customer_details,
+                    "fetch_customer_balance": fetch_customer_balance,
+                    "fetch_invoices": fetch_invoices,
+                    "fetch_customer_overview": fetch_customer_overview,
+                    "send_text_message": send_text_message,
+                },
+            )
         )
+        register_parallel_tool_execution(user_proxy_agent)
 
         csr_agent.register_model_client(model_client_cls=AICoreClient, client=openai_proxy_client)
 
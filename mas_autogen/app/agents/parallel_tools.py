@@ -0,0 +1,167 @@
+"""This module runs the tool calls of one assistant message concurrently.
+
+autogen executes the tool calls of a message one after another. When the model
+requests several independent functions at once, e.g. the details, balance and
+invoices of a customer, the reply functions registered here run them on a thread
+pool instead and return the tool responses in the order of the calls.
+
+In async chats even a single tool call runs on the thread pool, as autogen would
+call the blocking tool functions on the event loop. Only async tool functions are
+awaited there.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from autogen import Agent, ConversableAgent
+from mas_autogen.app.utils.config import PARALLEL_TOOL_MAX_WORKERS
+
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    """Returns the thread pool shared by the tool calls of all agents."""
+    global _tool_executor  # pylint: disable=global-statement
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(
+                max_workers=PARALLEL_TOOL_MAX_WORKERS, thread_name_prefix="tool-call"
+            )
+        return _tool_executor
+
+
+def _tool_response(tool_call: Dict[str, Any], function_return: Dict[str, Any]) -> Dict[str, Any]:
+    """Builds the tool response of a tool call from the function result."""
+    tool_response = {"role": "tool", "content": function_return.get("content") or ""}
+    if tool_call.get("id") is not None:
+        tool_response["tool_call_id"] = tool_call["id"]
+    return tool_response
+
+
+def _execute_tool_call(agent: ConversableAgent, tool_call: Dict[str, Any]) -> Dict[str, Any]:
+    """Executes one tool call and returns the tool response."""
+    _, function_return = agent.execute_function(tool_call.get("function", {}))
+    return _tool_response(tool_call, function_return)
+
+
+async def _a_execute_tool_call(
+    agent: ConversableAgent, tool_call: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Executes one tool call, awaiting async functions and running others on the thread pool."""
+    function_call = tool_call.get("function", {})
+    if asyncio.iscoroutinefunction(agent.function_map.get(function_call.get("name"))):
+        _, function_return = await agent.a_execute_function(function_call)
+        return _tool_response(tool_call, function_return)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        _get_tool_executor(), contextvars.copy_context().run, _execute_tool_call, agent, tool_call
+    )
+
+
+def _tool_calls_reply(agent: ConversableAgent, tool_responses: List[dict]) -> Dict[str, Any]:
+    """Builds the reply message of the tool responses like autogen does."""
+    return {
+        "role": "tool",
+        "tool_responses": tool_responses,
+        "content": "\n\n".join(
+            agent._str_for_tool_response(r) for r in tool_responses  # pylint: disable=W0212
+        ),
+    }
+
+
+def _pending_tool_calls(
+    agent: ConversableAgent, messages, sender, minimum: int
+) -> List[dict] | None:
+    """Returns the tool calls of the last message if there are at least minimum to run."""
+    if messages is None:
+        messages = agent._oai_messages[sender]  # pylint: disable=protected-access
+    tool_calls = messages[-1].get("tool_calls") or []
+    if len(tool_calls) < minimum:
+        return None
+    return tool_calls
+
+
+def generate_parallel_tool_calls_reply(
+    recipient: ConversableAgent,
+    messages: Optional[List[Dict]] = None,
+    sender: Optional[Agent] = None,
+    config: Optional[Any] = None,  # pylint: disable=unused-argument
+) -> Tuple[bool, Dict | None]:
+    """Reply function running the tool calls of the last message on the thread pool.
+
+    Single tool calls are left to autogen's generate_tool_calls_reply.
+
+    Returns:
+        Whether the reply is final and the tool responses message.
+    """
+    tool_calls = _pending_tool_calls(recipient, messages, sender, minimum=2)
+    if tool_calls is None:
+        return False, None
+
+    executor = _get_tool_executor()
+    futures = [
+        executor.submit(contextvars.copy_context().run, _execute_tool_call, recipient, tool_call)
+        for tool_call in tool_calls
+    ]
+    return True, _tool_calls_reply(recipient, [future.result() for future in futures])
+
+
+async def a_generate_parallel_tool_calls_reply(
+    recipient: ConversableAgent,
+    messages: Optional[List[Dict]] = None,
+    sender: Optional[Agent] = None,
+    config: Optional[Any] = None,  # pylint: disable=unused-argument
+) -> Tuple[bool, Dict | None]:
+    """Async counterpart of generate_parallel_tool_calls_reply for a_initiate_chat.
+
+    Single tool calls run on the thread pool too, so no tool blocks the event loop.
+    Async tool functions, e.g. the weather API call of async chats, are awaited on it.
+
+    Returns:
+        Whether the reply is final and the tool responses message.
+    """
+    tool_calls = _pending_tool_calls(recipient, messages, sender, minimum=1)
+    if tool_calls is None:
+        return False, None
+
+    tool_responses = await asyncio.gather(
+        *(_a_execute_tool_call(recipient, tool_call) for tool_call in tool_calls)
+    )
+    return True, _tool_calls_reply(recipient, list(tool_responses))
+
+
+def _after_termination_check(agent: ConversableAgent) -> int:
+    """Returns the reply function position right after the termination and human reply check."""
+    termination_checks = (
+        ConversableAgent.check_termination_and_human_reply,
+        ConversableAgent.a_check_termination_and_human_reply,
+    )
+    positions = [
+        position
+        for position, reply in enumerate(agent._reply_func_list)  # pylint: disable=protected-access
+        if reply["reply_func"] in termination_checks
+    ]
+    return max(positions) + 1 if positions else 0
+
+
+def register_parallel_tool_execution(agent: ConversableAgent):
+    """Makes an executing agent run several tool calls of a message concurrently.
+
+    In async chats the tool calls always run off the event loop. The reply functions
+    take the place of the sequential tool call replies, after the termination and
+    human reply check, so a terminating message is not executed.
+
+    Arguments:
+        agent -- The agent holding the function map, e.g. the user proxy.
+    """
+    position = _after_termination_check(agent)
+    agent.register_reply([Agent, None], generate_parallel_tool_calls_reply, position=position)
+    agent.register_reply(
+        [Agent, None],
+        a_generate_parallel_tool_calls_reply,
+        position=position,
+        ignore_async_in_sync_chat=True,
+    )
@@ -0,0 +1,148 @@
+"""This module selects the next speaker of a group chat with rules instead of an LLM call.
+
+The rules are tried in order, the first match wins:
+
+1. tool_call -- the last message calls a function, its executor speaks next.
+2. graph -- the allowed transitions leave only one candidate.
+3. intent -- a handoff rule matches the user input, e.g. finance_agent hands over
+   to csr_agent once the customer details are fetched for a reminder request.
+4. default -- no handoff matches, the default next speaker of the agent speaks,
+   e.g. finance_agent answers back to user_proxy.
+5. llm -- the choice is still ambiguous, the group chat manager asks the LLM ("auto").
+
+autogen applies the first two rules itself before asking the LLM, so only the
+intent, default and llm decisions are counted by speaker_selection_count.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+from autogen import Agent, GroupChat
+from mas_autogen.app.utils.agent_observability import AgentObservability
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+# Marks the user input after the session chat history, see build_session_message.
+USER_INPUT_MARKER = "\n\nUser Input: "
+
+
+@dataclass
+class IntentHandoff:
+    """Hands the conversation from one agent to another when the user asked for it.
+
+    Arguments:
+        from_agent -- The name of the agent which just spoke.
+        to_agent -- The name of the agent to hand over to.
+        pattern -- The intent pattern searched in the user input.
+        after_function -- The function which must have run before the handoff.
+    """
+
+    from_agent: str
+    to_agent: str
+    pattern: re.Pattern
+    after_function: str | None = None
+
+
+class RuleBasedSpeakerSelector:
+    """Speaker selection callable for GroupChat(speaker_selection_method=...)."""
+
+    def __init__(
+        self,
+        name: str,
+        handoffs: List[IntentHandoff] | None = None,
+        defaults: Dict[str, str] | None = None,
+    ):
+        """Creates the selector.
+
+        Arguments:
+            name -- The group chat name used in metrics.
+
+        Keyword Arguments:
+            handoffs -- The intent handoff rules (default: {None})
+            defaults -- The next speaker by last speaker name when no handoff matches
+                        (default: {None})
+        """
+        self.name = name
+        self.handoffs = handoffs or []
+        self.defaults = defaults or {}
+
+    @staticmethod
+    def _called_functions(message: dict) -> List[str]:
+        """Returns the names of the functions called by a message."""
+        names = []
+        if message.get("function_call"):
+            names.append(message["function_call"]["name"])
+        for tool_call in message.get("tool_calls") or []:
+            if tool_call.get("type") == "function":
+                names.append(tool_call["function"]["name"])
+        return names
+
+    @staticmethod
+    def _user_input(groupchat: GroupChat) -> str:
+        """Returns the user input of the conversation without the session chat history."""
+        if not groupchat.messages:
+            return ""
+        task = str(groupchat.messages[0].get("content") or "")
+        return task.rsplit(USER_INPUT_MARKER, 1)[-1]
+
+    def _select(self, last_speaker: Agent, groupchat: GroupChat) -> tuple:
+        """Applies the rules.
+
+        Returns:
+            The rule which decided and the next speaker or "auto".
+        """
+        last_message = groupchat.messages[-1] if groupchat.messages else {}
+
+        functions = self._called_functions(last_message)
+        if functions:
+            executors = [
+                agent for agent in groupchat.agents if agent.can_execute_function(functions)
+            ]
+            if len(executors) == 1:
+                return "tool_call", executors[0]
+
+        candidates = groupchat.allowed_speaker_transitions_dict.get(last_speaker, [])
+        if len(candidates) == 1:
+            return "graph", candidates[0]
+
+        user_input = self._user_input(groupchat)
+        called = {
+            name for message in groupchat.messages for name in self._called_functions(message)
+        }
+        for handoff in self.handoffs:
+            if (
+                handoff.from_agent == last_speaker.name
+                and handoff.pattern.search(user_input)
+                and (handoff.after_function is None or handoff.after_function in called)
+            ):
+                return "intent", groupchat.agent_by_name(handoff.to_agent)
+
+        default = next(
+            (agent for agent in candidates if agent.name == self.defaults.get(last_speaker.name)),
+            None,
+        )
+        if default is not None:
+            return "default", default
+
+        return "llm", "auto"
+
+    def __call__(self, last_speaker: Agent, groupchat: GroupChat) -> Agent | str:
+        """Selects the next speaker.
+
+        Arguments:
+            last_speaker -- The agent which just spoke.
+            groupchat -- The group chat.
+
+        Returns:
+            The next speaker, or "auto" to let the LLM decide.
+        """
+        rule, speaker = self._select(last_speaker, groupchat)
+        if rule not in ("tool_call", "graph"):
+            agent_observability_mas.track_speaker_selection(self.name, rule)
+        return speaker
+
+
+REMINDER_INTENT_PATTERN = re.compile(
+    r"\b(remind(er)?s?|text(ing)? message|sms|send (him |her |them )?(a |an )?(text|message))\b",
+    re.IGNORECASE,
+)
@@ -1,6 +1,19 @@
 """This module is agent parent class."""
 
 from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from loguru import logger
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.conversation_budget import ConversationBudgetExceededError
+from mas_autogen.app.utils.conversation_context import get_conversation_context
+from mas_autogen.app.utils.conversation_profiler import conversation_profiler
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+# Answer of a conversation stopped by its budget before any agent answered.
+BUDGET_EXCEEDED_ANSWER = (
+    "Sorry, I could not complete your request in time. Please try again or rephrase it."
+)
 
 
 class SuperAgent(ABC):
@@ -17,9 +30,82 @@ class SuperAgent(ABC):
     def create_ai_agents(self):
         """This is an abstract method."""
 
+    def get_ai_agents(self, sender, receiver):
+        """This function returns every agent of the graph, including the group chat members.
+
+        Arguments:
+            sender -- The sender agent.
+            receiver -- The receiver agent.
+
+        Returns:
+            The agents, each once.
+        """
+        agents = [sender, receiver]
+
+        group_chat = getattr(receiver, "groupchat", None)
+        if group_chat is not None:
+            agents.extend(group_chat.agents)
+
+        return list({id(agent): agent for agent in agents}.values())
+
+    def reset_ai_agents(self, sender, receiver):
+        """This function resets the agents so that they can serve the next conversation.
+
+        Arguments:
+            sender -- The sender agent.
+            receiver -- The receiver agent.
+        """
+        group_chat = getattr(receiver, "groupchat", None)
+        if group_chat is not None:
+            group_chat.reset()
+
+        for agent in self.get_ai_agents(sender, receiver):
+            agent.reset()
+
+    def profile_conversation(self, sampled: bool = True):
+        """This function returns the context manager recording the timeline of a conversation.
+
+        Keyword Arguments:
+            sampled -- Whether the stacks of the thread may be sampled (default: {True})
+
+        Returns:
+            The context manager, which does nothing when the profiler is disabled.
+        """
+        if conversation_profiler is None:
+            return nullcontext()
+        context = get_conversation_context()
+        if context is None:
+            return conversation_profiler.profile(self.agent_name, None, sampled=sampled)
+        return conversation_profiler.profile(
+            context.agent_name, context.session_id, sampled=sampled
+        )
+
     def start_chat(self, sender, receiver, message):
         """This function initiates the chat.
 
+        Arguments:
+            sender -- The sender agent.
+            receiver -- The receiver agent.
+            message -- The user message.
+
+        Returns:
+            The final answer or error, the best partial answer when the budget is exceeded.
+        """
+
+        try:
+            with self.profile_conversation():
+                response = sender.initiate_chat(
+                    receiver,
+                    message=(f"{message}"),
+                )
+        except ConversationBudgetExceededError as e:
+            return self.get_partial_answer(sender, receiver, e)
+
+        return self.get_final_answer(response)
+
+    async def a_start_chat(self, sender, receiver, message):
+        """This function initiates the chat asynchronously.
+
         Arguments:
             sender -- The sender agent.
             receiver -- The receiver agent.
@@ -29,11 +115,79 @@ class SuperAgent(ABC):
             The final answer or error.
         """
 
-        response = sender.initiate_chat(
-            receiver,
-            message=(f"{message}"),
-        )
+        # The event loop thread runs other conversations too, it is not sampled.
+        try:
+            with self.profile_conversation(sampled=False):
+                response = await sender.a_initiate_chat(
+                    receiver,
+                    message=(f"{message}"),
+                )
+        except ConversationBudgetExceededError as e:
+            return self.get_partial_answer(sender, receiver, e)
 
-        return (
-            response.chat_history[-1]["content"].replace("TERMINATE.", "").replace("**", "").strip()
-        )
+        return self.get_final_answer(response)
+
+    def get_final_answer(self, response):
+        """This function extracts the final answer from the chat result.
+
+        Arguments:
+            response -- The chat result.
+
+        Returns:
+            The final answer.
+        """
+        return self.clean_answer(response.chat_history[-1]["content"])
+
+    def clean_answer(self, content):
+        """This function strips the termination keyword and the markdown emphasis of an answer.
+
+        Arguments:
+            content -- The message content.
+
+        Returns:
+            The answer.
+        """
+        return content.replace("TERMINATE.", "").replace("**", "").strip()
+
+    def get_partial_answer(self, sender, receiver, error):
+        """This function returns the best answer of a conversation stopped by its budget.
+
+        That is the last text an agent sent, else the last function result, which
+        holds the data looked up so far. The first message is the user request.
+
+        Arguments:
+            sender -- The sender agent.
+            receiver -- The receiver agent.
+            error -- The ConversationBudgetExceededError.
+
+        Returns:
+            The partial answer.
+        """
+        context = get_conversation_context()
+        agent_name = context.agent_name if context is not None else self.agent_name
+        agent_observability_mas.track_budget_hit(agent_name, error.limit)
+        logger.warning(f"Agent '{agent_name}' answers with a partial answer: {error}")
+
+        group_chat = getattr(receiver, "groupchat", None)
+        if group_chat is not None:
+            messages = list(group_chat.messages)
+        else:
+            messages = list(sender.chat_messages.get(receiver, []))
+        if error.pending_message is not None:
+            messages.append(error.pending_message)
+
+        texts, results = [], []
+        for message in messages[1:]:
+            content = message.get("content")
+            if not isinstance(content, str) or not content.strip():
+                continue
+            if message.get("role") in ("tool", "function") or message.get("tool_responses"):
+                results.append(content)
+            elif not message.get("tool_calls") and not message.get("function_call"):
+                texts.append(content)
+
+        if texts:
+            return self.clean_answer(texts[-1])
+        if results:
+            return self.clean_answer(results[-1])
+        return BUDGET_EXCEEDED_ANSWER
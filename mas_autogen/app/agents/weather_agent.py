@@ -2,14 +2,24 @@
 """
 
 import autogen
-from gen_ai_hub.proxy import GenAIHubProxyClient
-from gen_ai_hub.proxy.native.openai import OpenAI as OpenAIProxy
+from mas_autogen.app.agents.agent_registry import register_agent
+from mas_autogen.app.agents.parallel_tools import register_parallel_tool_execution
 from mas_autogen.app.agents.super_agent import SuperAgent
-from mas_autogen.app.utils.aicoreclient import AICoreClient
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.aicoreclient import AICoreClient, get_openai_proxy_client
+from mas_autogen.app.utils.config import CHAT_EXECUTION_MODE
 from mas_autogen.app.utils.llm_config import llm_config_for_weather_agent
-from mas_autogen.app.functions.weather_functions import get_weather_data, extract_zip_code_using_llm
+from mas_autogen.app.functions.weather_functions import (
+    a_get_weather_data,
+    find_zip_code,
+    get_weather_data,
+)
 from mas_autogen.app.utils.prompt_config import WEATHER_AGENT_PROMPT
 
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+@register_agent("weather", timeout=60.0, priority="interactive")
 class WeatherAgent(SuperAgent):
     """This class implements create_ai_agents method.
 
@@ -19,8 +29,7 @@ class WeatherAgent(SuperAgent):
 
     def create_ai_agents(self):
 
-        gen_ai_hub_proxy_client = GenAIHubProxyClient()
-        openai_proxy_client = OpenAIProxy(proxy_client=gen_ai_hub_proxy_client)
+        openai_proxy_client = get_openai_proxy_client()
 
         weather_agent = autogen.AssistantAgent(
             name="weather_agent",
@@ -41,7 +50,7 @@ class WeatherAgent(SuperAgent):
 
         def extract_zip_code(user_input: str) -> str:
             """
-            Uses an LLM to extract a ZIP code from the user's input.
+            Extracts a ZIP code from the user's input, using an LLM only when ambiguous.
 
             Args:
             user_input (str): The user's query.
@@ -49,7 +58,7 @@ class WeatherAgent(SuperAgent):
             Returns:
                 str: The extracted ZIP code or None.
             """
-            return extract_zip_code_using_llm(user_input=user_input)
+            return find_zip_code(user_input=user_input)
 
         def fetch_weather_data(zip_code: str) -> dict:
             """
@@ -63,13 +72,34 @@ class WeatherAgent(SuperAgent):
             """
             return get_weather_data(zip_code)
 
+        async def a_fetch_weather_data(zip_code: str) -> dict:
+            """
+            Calls weather API to get the weather details using zip code, without blocking.
+
+            Args:
+                zip_code (str): zip code
+
+            Returns:
+                dict: Weather details or an error message.
+            """
+            return await a_get_weather_data(zip_code)
+
         # Register functions with user proxy agent.
         user_proxy_agent.register_function(
-            function_map={
-                "extract_zip_code": extract_zip_code,
-                "fetch_weather_data": fetch_weather_data,
-            }
+            function_map=agent_observability_mas.tool_metric_collector(
+                self.agent_name,
+                {
+                    "extract_zip_code": extract_zip_code,
+                    # Async chats await the weather API on the event loop.
+                    "fetch_weather_data": (
+                        a_fetch_weather_data
+                        if CHAT_EXECUTION_MODE == "async"
+                        else fetch_weather_data
+                    ),
+                },
+            )
         )
+        register_parallel_tool_execution(user_proxy_agent)
 
         weather_agent.register_model_client(
             model_client_cls=AICoreClient, client=openai_proxy_client
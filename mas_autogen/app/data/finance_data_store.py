@@ -0,0 +1,203 @@
+"""This module holds the in-memory finance data store.
+
+Each JSON file is parsed once and indexed by its lookup keys. A file is only
+parsed again when its modification time or size changes.
+"""
+
+import json
+import os
+import threading
+import time
+from loguru import logger
+from mas_autogen.app.data.invoice_store import MappedInvoiceStore, check_invoice_store
+from mas_autogen.app.utils.config import FINANCE_DATA_RELOAD_INTERVAL, FINANCE_INVOICE_STORE
+
+DATA_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class IndexedJsonTable:
+    """A collection of records from a JSON file with hash indexes on its keys."""
+
+    def __init__(
+        self,
+        file_name: str,
+        collection: str,
+        unique_keys: tuple = (),
+        group_keys: tuple = (),
+        reload_interval: float = FINANCE_DATA_RELOAD_INTERVAL,
+    ):
+        """Creates the table. The file is loaded on first access.
+
+        Arguments:
+            file_name -- The JSON file name in the data directory.
+            collection -- The top level key holding the records.
+
+        Keyword Arguments:
+            unique_keys -- Keys identifying one record (default: {()})
+            group_keys -- Keys shared by several records (default: {()})
+            reload_interval -- Seconds between checks (default: {FINANCE_DATA_RELOAD_INTERVAL})
+        """
+        self.file_path = os.path.join(DATA_DIRECTORY, file_name)
+        self.collection = collection
+        self.unique_keys = unique_keys
+        self.group_keys = group_keys
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        self._unique_indexes = {}
+        self._group_indexes = {}
+
+    def _file_signature(self) -> tuple:
+        """Returns the modification time and size of the file."""
+        stat = os.stat(self.file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature: tuple):
+        """Parses the file and rebuilds the indexes."""
+        start_time = time.time()
+        with open(self.file_path, "r", encoding="utf-8") as file:
+            records = json.load(file)[self.collection]
+
+        unique_indexes = {key: {} for key in self.unique_keys}
+        group_indexes = {key: {} for key in self.group_keys}
+        for record in records:
+            for key, index in unique_indexes.items():
+                index[record.get(key)] = record
+            for key, index in group_indexes.items():
+                index.setdefault(record.get(key), []).append(record)
+
+        self._unique_indexes = unique_indexes
+        self._group_indexes = group_indexes
+        self._signature = signature
+        logger.info(
+            f"Loaded {len(records)} {self.collection} in {(time.time() - start_time) * 1000:.1f} ms"
+        )
+
+    def _refresh(self):
+        """Loads the file on first access and reloads it when it has changed."""
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.reload_interval:
+            return
+
+        with self._lock:
+            signature = self._file_signature()
+            if signature != self._signature:
+                self._load(signature)
+            self._checked_at = now
+
+    def get(self, key: str, value: str) -> dict | None:
+        """Returns the record with the given unique key value.
+
+        Arguments:
+            key -- One of the unique keys.
+            value -- The key value.
+
+        Returns:
+            A copy of the record or None.
+        """
+        self._refresh()
+        record = self._unique_indexes[key].get(value)
+        return dict(record) if record is not None else None
+
+    def find(self, key: str, value: str) -> list:
+        """Returns the records sharing the given group key value.
+
+        Arguments:
+            key -- One of the group keys.
+            value -- The key value.
+
+        Returns:
+            Copies of the matching records in file order.
+        """
+        self._refresh()
+        return [dict(record) for record in self._group_indexes[key].get(value, [])]
+
+
+class FinanceDataStore:
+    """Indexed access to the balances, customer details and invoices.
+
+    Invoices are served from the memory-mapped invoice store when
+    FINANCE_INVOICE_STORE is "mapped", or when it is "auto" and the converted
+    invoice file exists and is not older than invoices.json. Otherwise they are
+    served from invoices.json.
+    """
+
+    def __init__(
+        self,
+        invoice_store: str = FINANCE_INVOICE_STORE,
+        reload_interval: float = FINANCE_DATA_RELOAD_INTERVAL,
+    ):
+        """Creates the store. The files are loaded on first access.
+
+        Keyword Arguments:
+            invoice_store -- "json", "mapped" or "auto" (default: {FINANCE_INVOICE_STORE})
+            reload_interval -- Seconds between checks (default: {FINANCE_DATA_RELOAD_INTERVAL})
+
+        Raises:
+            ValueError: If the invoice store is unknown.
+            FileNotFoundError: If it is "mapped" and the invoices were not converted.
+        """
+        self.balances = IndexedJsonTable("balances.json", "balances", unique_keys=("customer_id",))
+        self.customer_details = IndexedJsonTable(
+            "customer_details.json", "customer_details", unique_keys=("customer_id",)
+        )
+        self.invoices = IndexedJsonTable(
+            "invoices.json",
+            "invoices",
+            unique_keys=("invoice_id",),
+            group_keys=("customer_id",),
+        )
+        self.mapped_invoices = MappedInvoiceStore()
+        check_invoice_store(invoice_store, self.mapped_invoices.file_path)
+        self.invoice_store = invoice_store
+        self.reload_interval = reload_interval
+        self._use_mapped_invoices = None
+        self._checked_at = 0.0
+
+    @property
+    def use_mapped_invoices(self) -> bool:
+        """Whether the invoices are served from the memory-mapped invoice store.
+
+        In "auto" mode the converted file is checked against invoices.json every reload
+        interval, so invoices changed after the conversion are not served stale.
+        """
+        if self.invoice_store != "auto":
+            return self.invoice_store == "mapped"
+
+        now = time.monotonic()
+        if self._use_mapped_invoices is None or now - self._checked_at >= self.reload_interval:
+            use_mapped_invoices = self.mapped_invoices.is_current(self.invoices.file_path)
+            if self.mapped_invoices.is_available() and not use_mapped_invoices:
+                if self._use_mapped_invoices is not False:
+                    logger.warning(
+                        f"{self.mapped_invoices.file_path} is older than "
+                        f"{self.invoices.file_path}, serving the invoices from the JSON "
+                        "file until they are converted again."
+                    )
+            self._use_mapped_invoices = use_mapped_invoices
+            self._checked_at = now
+        return self._use_mapped_invoices
+
+    def get_customer_balance(self, customer_id: str) -> dict | None:
+        """Returns the balance of the customer or None."""
+        return self.balances.get("customer_id", customer_id)
+
+    def get_customer_details(self, customer_id: str) -> dict | None:
+        """Returns the details of the customer or None."""
+        return self.customer_details.get("customer_id", customer_id)
+
+    def get_invoices(self, customer_id: str) -> list:
+        """Returns the invoices of the customer."""
+        if self.use_mapped_invoices:
+            return self.mapped_invoices.get_invoices(customer_id)
+        return self.invoices.find("customer_id", customer_id)
+
+    def get_invoice(self, invoice_id: str) -> dict | None:
+        """Returns the invoice with the invoice id or None."""
+        if self.use_mapped_invoices:
+            return self.mapped_invoices.get_invoice(invoice_id)
+        return self.invoices.get("invoice_id", invoice_id)
+
+
+finance_data_store = FinanceDataStore()
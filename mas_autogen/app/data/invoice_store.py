@@ -0,0 +1,367 @@
+"""This module holds the memory-mapped invoice store for large invoice datasets.
+
+The invoices are kept in a line-delimited JSON file (one invoice per line) next
+to an offset index by customer_id and invoice_id. Both files are memory-mapped,
+so a lookup only decodes the lines of one customer and all worker processes
+share the same page cache instead of each holding a parsed copy.
+
+The index is binary: a header, then the customer and invoice sections of
+fixed-width records sorted by key, searched with bisect, and the postings of the
+customers, the (offset, length) of their lines in file order. A record is the key,
+UTF-8 and padded with NUL bytes to the longest key, followed by an entry:
+
+- customer section -- the position of the first posting and the number of postings.
+- invoice section -- the offset and the length of the line.
+
+Convert the existing JSON file with:
+
+    python -m mas_autogen.app.data.invoice_store convert
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+from loguru import logger
+from mas_autogen.app.utils.config import FINANCE_DATA_RELOAD_INTERVAL
+
+DATA_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+INVOICES_JSON_PATH = os.path.join(DATA_DIRECTORY, "invoices.json")
+INVOICES_NDJSON_PATH = os.path.join(DATA_DIRECTORY, "invoices.ndjson")
+INDEX_SUFFIX = ".idx"
+INVOICE_STORES = ("json", "mapped", "auto")
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Magic, key width, then the customer, invoice and posting counts.
+INDEX_HEADER = struct.Struct("<8sIQQQ")
+INDEX_MAGIC = b"INVIDX01"
+# (offset, length) of a line, or (first posting, postings) of a customer.
+INDEX_ENTRY = struct.Struct("<QI")
+
+
+def iter_json_array(file_path: str, collection: str) -> Iterator[dict]:
+    """Streams the records of a top level JSON array without loading the whole file.
+
+    Arguments:
+        file_path -- The JSON file path.
+        collection -- The top level key holding the array.
+
+    Yields:
+        The records one at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as file:
+        buffer = ""
+        position = 0
+        marker = f'"{collection}"'
+
+        # Seek to the opening bracket of the array.
+        while True:
+            start = buffer.find(marker)
+            bracket = buffer.find("[", start + len(marker)) if start != -1 else -1
+            if bracket != -1:
+                position = bracket + 1
+                break
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise ValueError(f"No '{collection}' array found in {file_path}")
+            buffer += chunk
+
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = file.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            yield record
+            position = end
+            if position > READ_CHUNK_SIZE:
+                buffer = buffer[position:]
+                position = 0
+
+
+def convert_invoices(
+    source_path: str = INVOICES_JSON_PATH, target_path: str = INVOICES_NDJSON_PATH
+) -> int:
+    """Converts the invoices JSON file to the line-delimited file and its index.
+
+    Keyword Arguments:
+        source_path -- The invoices JSON file (default: {INVOICES_JSON_PATH})
+        target_path -- The line-delimited output file (default: {INVOICES_NDJSON_PATH})
+
+    Returns:
+        The number of converted invoices.
+    """
+    customer_index: Dict[bytes, List[Tuple[int, int]]] = {}
+    invoice_index: Dict[bytes, Tuple[int, int]] = {}
+    count = 0
+    temporary_path = target_path + ".tmp"
+
+    with open(temporary_path, "wb") as target:
+        for invoice in iter_json_array(source_path, "invoices"):
+            line = json.dumps(invoice, separators=(",", ":")).encode("utf-8") + b"\n"
+            offset = target.tell()
+            target.write(line)
+            entry = (offset, len(line) - 1)
+            if invoice.get("customer_id") is not None:
+                customer_key = str(invoice["customer_id"]).encode("utf-8")
+                customer_index.setdefault(customer_key, []).append(entry)
+            if invoice.get("invoice_id") is not None:
+                invoice_index[str(invoice["invoice_id"]).encode("utf-8")] = entry
+            count += 1
+
+    write_index(target_path + INDEX_SUFFIX + ".tmp", customer_index, invoice_index)
+
+    # Replace the index first, readers reload once the data file changes.
+    os.replace(target_path + INDEX_SUFFIX + ".tmp", target_path + INDEX_SUFFIX)
+    os.replace(temporary_path, target_path)
+    return count
+
+
+def write_index(
+    index_path: str,
+    customer_index: Dict[bytes, List[Tuple[int, int]]],
+    invoice_index: Dict[bytes, Tuple[int, int]],
+):
+    """Writes the binary offset index.
+
+    Arguments:
+        index_path -- The index file path.
+        customer_index -- The (offset, length) of the lines of each customer, in file order.
+        invoice_index -- The (offset, length) of the line of each invoice.
+    """
+    key_width = max(map(len, [*customer_index, *invoice_index]), default=0)
+    postings = sum(len(entries) for entries in customer_index.values())
+    with open(index_path, "wb") as index_file:
+        index_file.write(
+            INDEX_HEADER.pack(
+                INDEX_MAGIC, key_width, len(customer_index), len(invoice_index), postings
+            )
+        )
+        first = 0
+        for key in sorted(customer_index):
+            index_file.write(key.ljust(key_width, b"\0"))
+            index_file.write(INDEX_ENTRY.pack(first, len(customer_index[key])))
+            first += len(customer_index[key])
+        for key in sorted(invoice_index):
+            index_file.write(key.ljust(key_width, b"\0"))
+            index_file.write(INDEX_ENTRY.pack(*invoice_index[key]))
+        for key in sorted(customer_index):
+            for entry in customer_index[key]:
+                index_file.write(INDEX_ENTRY.pack(*entry))
+
+
+class _IndexSection:
+    """Sorted records of a section of the mapped index, a sequence of their keys for bisect."""
+
+    def __init__(self, mapping, start: int, count: int, key_width: int):
+        self.mapping = mapping
+        self.start = start
+        self.count = count
+        self.key_width = key_width
+        self.record_size = key_width + INDEX_ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> bytes:
+        offset = self.start + position * self.record_size
+        return self.mapping[offset : offset + self.key_width]
+
+    @property
+    def end(self) -> int:
+        """The offset following the section."""
+        return self.start + self.count * self.record_size
+
+    def find(self, key: str) -> Tuple[int, int] | None:
+        """Returns the entry of a key, None if the key is not indexed."""
+        encoded = key.encode("utf-8")
+        if len(encoded) > self.key_width:
+            return None
+        encoded = encoded.ljust(self.key_width, b"\0")
+        position = bisect.bisect_left(self, encoded)
+        if position == self.count or self[position] != encoded:
+            return None
+        return INDEX_ENTRY.unpack_from(
+            self.mapping, self.start + position * self.record_size + self.key_width
+        )
+
+
+def _map_file(file_path: str):
+    """Maps a file read-only, an empty file cannot be mapped."""
+    if not os.path.getsize(file_path):
+        return b""
+    with open(file_path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MappedInvoiceStore:
+    """Read-only invoice lookups on the memory-mapped line-delimited file."""
+
+    def __init__(
+        self,
+        file_path: str = INVOICES_NDJSON_PATH,
+        reload_interval: float = FINANCE_DATA_RELOAD_INTERVAL,
+    ):
+        """Creates the store. The file is mapped on first access.
+
+        Keyword Arguments:
+            file_path -- The line-delimited invoices file (default: {INVOICES_NDJSON_PATH})
+            reload_interval -- Seconds between checks (default: {FINANCE_DATA_RELOAD_INTERVAL})
+        """
+        self.file_path = file_path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked_at = 0.0
+        # The data mapping with the customer and invoice sections of its index.
+        self._mapped = None
+
+    def is_available(self) -> bool:
+        """Whether the converted invoice file and its index exist."""
+        return os.path.exists(self.file_path) and os.path.exists(self.file_path + INDEX_SUFFIX)
+
+    def is_current(self, source_path: str = INVOICES_JSON_PATH) -> bool:
+        """Whether the converted invoice file exists and is not older than its source.
+
+        Keyword Arguments:
+            source_path -- The converted JSON invoices file (default: {INVOICES_JSON_PATH})
+        """
+        if not self.is_available():
+            return False
+        try:
+            return os.stat(self.file_path).st_mtime_ns >= os.stat(source_path).st_mtime_ns
+        except FileNotFoundError:
+            return True
+
+    def _refresh(self):
+        """Maps the files on first access and remaps them when the data file has changed.
+
+        Raises:
+            ValueError: If the index is not in the binary format, e.g. of an older convert.
+        """
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked_at < self.reload_interval:
+            return
+
+        with self._lock:
+            stat = os.stat(self.file_path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature != self._signature:
+                start_time = time.time()
+                index = _map_file(self.file_path + INDEX_SUFFIX)
+                if index[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+                    raise ValueError(
+                        f"{self.file_path + INDEX_SUFFIX} is not a binary invoice index, "
+                        "convert the invoices again."
+                    )
+                _, key_width, customers, invoices, _ = INDEX_HEADER.unpack_from(index)
+                customer_section = _IndexSection(index, INDEX_HEADER.size, customers, key_width)
+                invoice_section = _IndexSection(index, customer_section.end, invoices, key_width)
+
+                # Old mappings are left to the garbage collector as readers may still hold them.
+                self._mapped = (_map_file(self.file_path), customer_section, invoice_section)
+                self._signature = signature
+                logger.info(
+                    f"Mapped {invoices} invoices in {(time.time() - start_time) * 1000:.1f} ms"
+                )
+            self._checked_at = now
+
+    def iter_invoices(self, customer_id: str) -> Iterator[dict]:
+        """Streams the invoices of a customer.
+
+        Arguments:
+            customer_id -- The customer id.
+
+        Yields:
+            The invoices in file order.
+        """
+        self._refresh()
+        mapping, customers, invoices = self._mapped
+        entry = customers.find(customer_id)
+        if entry is None:
+            return
+        first, postings = entry
+        for posting in range(first, first + postings):
+            # The postings follow the invoice section.
+            offset, length = INDEX_ENTRY.unpack_from(
+                customers.mapping, invoices.end + posting * INDEX_ENTRY.size
+            )
+            yield json.loads(mapping[offset : offset + length])
+
+    def get_invoices(self, customer_id: str) -> list:
+        """Returns the invoices of a customer."""
+        return list(self.iter_invoices(customer_id))
+
+    def get_invoice(self, invoice_id: str) -> dict | None:
+        """Returns the invoice with the invoice id or None."""
+        self._refresh()
+        mapping, _, invoices = self._mapped
+        entry = invoices.find(invoice_id)
+        if entry is None:
+            return None
+        offset, length = entry
+        return json.loads(mapping[offset : offset + length])
+
+
+def check_invoice_store(invoice_store: str, file_path: str = INVOICES_NDJSON_PATH):
+    """Checks that the configured invoice store can serve the invoices.
+
+    Arguments:
+        invoice_store -- The FINANCE_INVOICE_STORE value, "json", "mapped" or "auto".
+
+    Keyword Arguments:
+        file_path -- The line-delimited invoices file (default: {INVOICES_NDJSON_PATH})
+
+    Raises:
+        ValueError: If the invoice store is unknown.
+        FileNotFoundError: If it is "mapped" and the invoices were not converted.
+    """
+    if invoice_store not in INVOICE_STORES:
+        raise ValueError(
+            f"FINANCE_INVOICE_STORE must be one of {INVOICE_STORES}, not '{invoice_store}'."
+        )
+    if invoice_store == "mapped" and not MappedInvoiceStore(file_path).is_available():
+        raise FileNotFoundError(
+            f"FINANCE_INVOICE_STORE is mapped but {file_path} or its index is missing, "
+            "convert the invoices with: python -m mas_autogen.app.data.invoice_store convert"
+        )
+
+
+def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Memory-mapped invoice store utilities.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser(
+        "convert", help="Convert invoices.json to the line-delimited invoice store."
+    )
+    convert_parser.add_argument("--source", default=INVOICES_JSON_PATH)
+    convert_parser.add_argument("--target", default=INVOICES_NDJSON_PATH)
+    arguments = parser.parse_args()
+
+    if arguments.command == "convert":
+        start_time = time.time()
+        count = convert_invoices(arguments.source, arguments.target)
+        logger.info(
+            f"Converted {count} invoices to {arguments.target} in {time.time() - start_time:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""This module extracts entities like customer ids and ZIP codes from user input.
+
+Extraction is tiered from cheapest to most expensive:
+
+1. pattern -- exactly one distinct match in the user input.
+2. session_history -- no match in the user input, the last match in the session history.
+3. llm -- the cheap tiers are ambiguous or found nothing, the LLM decides.
+
+The session history defaults to the user messages of the current conversation's session.
+"""
+
+import re
+from typing import Callable, Iterable
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.conversation_context import get_conversation_context
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class TieredExtractor:
+    """Extracts one entity with a pattern first and falls back to the LLM."""
+
+    def __init__(
+        self,
+        name: str,
+        pattern: re.Pattern,
+        normalize: Callable[[re.Match], str],
+        llm_extract: Callable[[str], str],
+    ):
+        """Creates the extractor.
+
+        Arguments:
+            name -- The extractor name used in metrics.
+            pattern -- The compiled entity pattern.
+            normalize -- Turns a match into the canonical entity value.
+            llm_extract -- The LLM based extraction used as last resort.
+        """
+        self.name = name
+        self.pattern = pattern
+        self.normalize = normalize
+        self.llm_extract = llm_extract
+
+    def find_all(self, text: str) -> list:
+        """Returns the distinct entities in the text in order of appearance.
+
+        Arguments:
+            text -- The text to search.
+
+        Returns:
+            The normalized entities.
+        """
+        entities = []
+        for match in self.pattern.finditer(text or ""):
+            entity = self.normalize(match)
+            if entity not in entities:
+                entities.append(entity)
+        return entities
+
+    def extract(self, user_input: str, session_history: Iterable[str] | None = None) -> str:
+        """Extracts the entity from the user input.
+
+        Arguments:
+            user_input -- The user input.
+
+        Keyword Arguments:
+            session_history -- Earlier messages of the session, oldest first
+                (default: {None} uses the session of the current conversation)
+
+        Returns:
+            The entity or 'None'.
+        """
+        if session_history is None:
+            context = get_conversation_context()
+            session_history = context.user_messages() if context else []
+        session_history = list(session_history)
+
+        entities = self.find_all(user_input)
+        if len(entities) == 1:
+            agent_observability_mas.track_entity_extraction(self.name, "pattern")
+            return entities[0]
+
+        if not entities and session_history:
+            for message in reversed(session_history):
+                history_entities = self.find_all(message)
+                if history_entities:
+                    agent_observability_mas.track_entity_extraction(self.name, "session_history")
+                    return history_entities[-1]
+
+        agent_observability_mas.track_entity_extraction(self.name, "llm")
+        if session_history:
+            history = "\n".join(session_history)
+            user_input = f"{user_input}\n\nSession Chat History:\n{history}"
+        return self.llm_extract(user_input)
+
+
+CUSTOMER_ID_PATTERN = re.compile(r"\bCUST[-_ ]?(\d+)\b", re.IGNORECASE)
+
+ZIP_CODE_PATTERN = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+
+
+def normalize_customer_id(match: re.Match) -> str:
+    """Normalizes 'cust 002' or 'CUST-002' to 'CUST002'."""
+    return f"CUST{match.group(1)}"
+
+
+def normalize_zip_code(match: re.Match) -> str:
+    """Normalizes a ZIP+4 code to its 5-digit ZIP code."""
+    return match.group(1)
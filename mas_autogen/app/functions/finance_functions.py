@@ -1,27 +1,14 @@
 """This module holds all finance related functions.
 """
 
-import json
-import os
-from loguru import logger
-from gen_ai_hub.proxy.native.openai import chat  # pylint: disable=no-name-in-module
-
-BASE_DIRECTORY = os.path.join(os.path.dirname(__file__), "../data")
-
-def load_data_from_json(file_name: str) -> dict:
-    """This function loads data from the json.
-
-    Arguments:
-        file_name -- The file name.
-
-    Returns:
-        The data in JSON format.
-    """
-    file_path = os.path.join(BASE_DIRECTORY, file_name)
-    with open(file_path, "r", encoding="utf-8") as file:
-        data = json.load(file)
-    # logger.info(data)
-    return data
+from mas_autogen.app.data.finance_data_store import finance_data_store
+from mas_autogen.app.functions.entity_extraction import (
+    CUSTOMER_ID_PATTERN,
+    TieredExtractor,
+    normalize_customer_id,
+)
+from mas_autogen.app.utils.aicoreclient import get_openai_proxy_client
+from mas_autogen.app.utils.completion_cache import create_cached_completion
 
 
 def get_customer_balance(customer_id: str) -> dict:
@@ -33,10 +20,9 @@ def get_customer_balance(customer_id: str) -> dict:
     Returns:
         The customer balance in JSON format.
     """
-    balances = load_data_from_json("balances.json")
-    for balance in balances["balances"]:
-        if balance["customer_id"] == customer_id:
-            return balance
+    balance = finance_data_store.get_customer_balance(customer_id)
+    if balance is not None:
+        return balance
 
     return {"error": f"No balance found for customer '{customer_id}'"}
 
@@ -50,10 +36,9 @@ def get_customer_details(customer_id: str) -> dict:
     Returns:
         The customer details in JSON format.
     """
-    customer_details = load_data_from_json("customer_details.json")
-    for customer_detail in customer_details["customer_details"]:
-        if customer_detail["customer_id"] == customer_id:
-            return customer_detail
+    customer_detail = finance_data_store.get_customer_details(customer_id)
+    if customer_detail is not None:
+        return customer_detail
 
     return {"error": f"No details found for customer '{customer_id}'"}
 
@@ -67,13 +52,23 @@ def get_invoices(customer_id: str) -> dict:
     Returns:
         The invoices details in JSON format.
     """
-    invoices = load_data_from_json("invoices.json")
-    pending_invoices = []
-    for invoice in invoices["invoices"]:
-        if invoice["customer_id"] == customer_id:
-            pending_invoices.append(invoice)
+    return finance_data_store.get_invoices(customer_id)
 
-    return pending_invoices
+
+def get_customer_overview(customer_id: str) -> dict:
+    """This function gets the details, balance and invoices for the customer id.
+
+    Arguments:
+        customer_id -- The customer id.
+
+    Returns:
+        The customer details, balance and invoices in JSON format.
+    """
+    return {
+        "customer_details": get_customer_details(customer_id),
+        "balance": get_customer_balance(customer_id),
+        "invoices": get_invoices(customer_id),
+    }
 
 
 def extract_customer_id_using_llm(user_input: str) -> str:
@@ -105,7 +100,32 @@ def extract_customer_id_using_llm(user_input: str) -> str:
         },
     ]
 
-    kwargs = dict(model_name="gpt-4o", messages=input_messages)
-    response = chat.completions.create(**kwargs)
+    kwargs = dict(model="gpt-4o", messages=input_messages)
+    create = get_openai_proxy_client().chat.completions.create
+    response = create_cached_completion(create, **kwargs)
     customer_id = response.choices[0].message.content.strip()
     return customer_id
+
+
+customer_id_extractor = TieredExtractor(
+    name="customer_id",
+    pattern=CUSTOMER_ID_PATTERN,
+    normalize=normalize_customer_id,
+    llm_extract=extract_customer_id_using_llm,
+)
+
+
+def find_customer_id(user_input: str, session_history: list | None = None) -> str:
+    """This function extracts the customer id, using the LLM only when the text is ambiguous.
+
+    Arguments:
+        user_input -- The user input.
+
+    Keyword Arguments:
+        session_history -- Earlier messages of the session, oldest first
+            (default: {None} uses the session of the current conversation)
+
+    Returns:
+        The customer id or 'None'.
+    """
+    return customer_id_extractor.extract(user_input, session_history=session_history)
@@ -0,0 +1,194 @@
+"""This module holds the HTTP client for the weather API.
+
+The client keeps connections alive in a pool, retries transient failures with
+jittered exponential backoff and fails fast through a circuit breaker while the
+weather API is down. get_current_weather blocks, a_get_current_weather is its
+counterpart for the event loop.
+"""
+
+import asyncio
+import time
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from mas_autogen.app.utils.config import (
+    WEATHER_API_BACKOFF_BASE,
+    WEATHER_API_BACKOFF_MAX,
+    WEATHER_API_KEY,
+    WEATHER_API_MAX_RETRIES,
+    WEATHER_API_POOL_SIZE,
+    WEATHER_API_TIMEOUT,
+    WEATHER_API_URL,
+    WEATHER_CIRCUIT_FAILURE_THRESHOLD,
+    WEATHER_CIRCUIT_RESET_TIMEOUT,
+)
+from mas_autogen.app.utils.resilience import CircuitBreaker, backoff_delays
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class WeatherApiError(Exception):
+    """Raised when the weather API call failed after all retries."""
+
+
+class WeatherApiClient:
+    """Pooled, retrying weather API client guarded by a circuit breaker."""
+
+    def __init__(
+        self,
+        base_url: str | None = WEATHER_API_URL,
+        api_key: str | None = WEATHER_API_KEY,
+        timeout: float = WEATHER_API_TIMEOUT,
+        max_retries: int = WEATHER_API_MAX_RETRIES,
+        pool_size: int = WEATHER_API_POOL_SIZE,
+        circuit_breaker: CircuitBreaker | None = None,
+    ):
+        """Creates the client. Connections are opened on first use.
+
+        Keyword Arguments:
+            base_url -- The current weather endpoint (default: {WEATHER_API_URL})
+            api_key -- The weather API key (default: {WEATHER_API_KEY})
+            timeout -- Seconds per attempt (default: {WEATHER_API_TIMEOUT})
+            max_retries -- Retries after the first attempt (default: {WEATHER_API_MAX_RETRIES})
+            pool_size -- Kept-alive connections (default: {WEATHER_API_POOL_SIZE})
+            circuit_breaker -- The circuit breaker (default: {None} creates one)
+        """
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.pool_size = pool_size
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(
+            "weather_api",
+            failure_threshold=WEATHER_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=WEATHER_CIRCUIT_RESET_TIMEOUT,
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_client = None
+
+    def _parameters(self, zip_code: str) -> dict:
+        return {"key": self.api_key, "q": zip_code}
+
+    def _backoff_delays(self):
+        return backoff_delays(self.max_retries, WEATHER_API_BACKOFF_BASE, WEATHER_API_BACKOFF_MAX)
+
+    def _handle_status(self, status_code: int, reason: str) -> WeatherApiError | None:
+        """Settles the circuit for a response.
+
+        Returns:
+            The error to retry on, or None if the response is final.
+        """
+        if status_code in RETRYABLE_STATUS_CODES:
+            self.circuit_breaker.record_failure()
+            return WeatherApiError(f"Weather API responded {status_code} {reason}")
+
+        # The upstream is healthy even if it rejected this request.
+        self.circuit_breaker.record_success()
+        if status_code >= 400:
+            raise WeatherApiError(f"Weather API responded {status_code} {reason}")
+        return None
+
+    def get_current_weather(self, zip_code: str) -> dict:
+        """Calls the weather API.
+
+        Arguments:
+            zip_code -- The zip code.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            WeatherApiError: If the call failed after all retries.
+
+        Returns:
+            The weather API response.
+        """
+        delays = self._backoff_delays()
+        while True:
+            self.circuit_breaker.before_call()
+            try:
+                response = self.session.get(
+                    self.base_url, params=self._parameters(zip_code), timeout=self.timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.circuit_breaker.record_failure()
+                error = WeatherApiError(f"Weather API unreachable: {e}")
+            except Exception:
+                # Any other request error, e.g. a broken response, also settles the circuit.
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                self.circuit_breaker.abort_call()
+                raise
+            else:
+                error = self._handle_status(response.status_code, response.reason)
+                if error is None:
+                    return response.json()
+
+            delay = next(delays, None)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    async def a_get_current_weather(self, zip_code: str) -> dict:
+        """Calls the weather API without blocking the event loop.
+
+        Arguments:
+            zip_code -- The zip code.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            WeatherApiError: If the call failed after all retries.
+
+        Returns:
+            The weather API response.
+        """
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size, max_keepalive_connections=self.pool_size
+                ),
+            )
+
+        delays = self._backoff_delays()
+        while True:
+            self.circuit_breaker.before_call()
+            try:
+                response = await self._async_client.get(
+                    self.base_url, params=self._parameters(zip_code)
+                )
+            except httpx.TransportError as e:
+                self.circuit_breaker.record_failure()
+                error = WeatherApiError(f"Weather API unreachable: {e}")
+            except Exception:
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled, e.g. when the chat timed out, the upstream did not answer.
+                self.circuit_breaker.abort_call()
+                raise
+            else:
+                error = self._handle_status(response.status_code, response.reason_phrase)
+                if error is None:
+                    return response.json()
+
+            delay = next(delays, None)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    def close(self):
+        """Closes the pooled connections of the blocking client."""
+        self.session.close()
+
+    async def aclose(self):
+        """Closes the pooled connections of the async client."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+weather_api_client = WeatherApiClient()
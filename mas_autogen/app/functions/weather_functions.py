@@ -1,12 +1,27 @@
 """This module holds all the weather related functions.
 """
 
+import httpx
 import requests
-from gen_ai_hub.proxy.native.openai import chat  # pylint: disable=no-name-in-module
 from loguru import logger
 
+from mas_autogen.app.functions.entity_extraction import (
+    ZIP_CODE_PATTERN,
+    TieredExtractor,
+    normalize_zip_code,
+)
+from mas_autogen.app.functions.weather_client import WeatherApiError, weather_api_client
 from mas_autogen.app.utils.agent_observability import AgentObservability
-from mas_autogen.app.utils.config import WEATHER_API_KEY, WEATHER_API_URL
+from mas_autogen.app.utils.aicoreclient import get_openai_proxy_client
+from mas_autogen.app.utils.completion_cache import create_cached_completion
+from mas_autogen.app.utils.config import (
+    WEATHER_API_KEY,
+    WEATHER_CACHE_MAX_SIZE,
+    WEATHER_CACHE_STALE_TTL,
+    WEATHER_CACHE_TTL,
+)
+from mas_autogen.app.utils.resilience import CircuitOpenError
+from mas_autogen.app.utils.ttl_cache import StaleWhileRevalidateCache
 
 agent_observability_mas = AgentObservability(service_name="mas_app")
 
@@ -39,16 +54,106 @@ def extract_zip_code_using_llm(user_input: str) -> str:
         },
     ]
 
-    kwargs = dict(model_name="gpt-4o", messages=input_messages)
-    response = chat.completions.create(**kwargs)
+    kwargs = dict(model="gpt-4o", messages=input_messages)
+    create = get_openai_proxy_client().chat.completions.create
+    response = create_cached_completion(create, **kwargs)
 
     zip_code = response.choices[0].message.content.strip()
     return zip_code
 
 
+zip_code_extractor = TieredExtractor(
+    name="zip_code",
+    pattern=ZIP_CODE_PATTERN,
+    normalize=normalize_zip_code,
+    llm_extract=extract_zip_code_using_llm,
+)
+
+
+@agent_observability_mas.trace_agent_function(function_name="find_zip_code")
+def find_zip_code(user_input: str, session_history: list | None = None) -> str:
+    """This function extracts the zip code, using the LLM only when the text is ambiguous.
+
+    Arguments:
+        user_input -- The user input.
+
+    Keyword Arguments:
+        session_history -- Earlier messages of the session, oldest first
+            (default: {None} uses the session of the current conversation)
+
+    Returns:
+        The zip code or 'None'.
+    """
+    return zip_code_extractor.extract(user_input, session_history=session_history)
+
+
+weather_cache = StaleWhileRevalidateCache(
+    name="weather",
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_CACHE_STALE_TTL,
+    maxsize=WEATHER_CACHE_MAX_SIZE,
+    should_cache=lambda weather_data: "error" not in weather_data,
+)
+
+
+def normalize_zip_code_key(zip_code: str) -> str:
+    """This function normalizes the zip code used as weather cache key.
+
+    Arguments:
+        zip_code -- The zip code.
+
+    Returns:
+        The 5-digit zip code, or the stripped input if it holds no zip code.
+    """
+    match = ZIP_CODE_PATTERN.search(str(zip_code))
+    return normalize_zip_code(match) if match else str(zip_code).strip()
+
+
 @agent_observability_mas.trace_agent_function(function_name="get_weather_data")
 def get_weather_data(zip_code: str) -> dict:
-    """This function calls weather api to get the data.
+    """This function gets the weather data from the cache or the weather api.
+
+    Arguments:
+        zip_code -- The zip code.
+
+    Returns:
+        The location, temperature and condition.
+    """
+    zip_code = normalize_zip_code_key(zip_code)
+    weather_data = weather_cache.get_or_load(
+        zip_code, lambda: fetch_weather_data_from_api(zip_code)
+    )
+    return dict(weather_data)
+
+
+@agent_observability_mas.trace_agent_function(function_name="get_weather_data")
+async def a_get_weather_data(zip_code: str) -> dict:
+    """This function gets the weather data without blocking the event loop.
+
+    Arguments:
+        zip_code -- The zip code.
+
+    Returns:
+        The location, temperature and condition.
+    """
+    zip_code = normalize_zip_code_key(zip_code)
+    weather_data = await weather_cache.a_get_or_load(
+        zip_code, lambda: a_fetch_weather_data_from_api(zip_code)
+    )
+    return dict(weather_data)
+
+
+def _weather_summary(data: dict) -> dict:
+    """Picks the location, temperature and condition of a weather api response."""
+    return {
+        "location": data["location"]["name"],
+        "temperature": data["current"]["temp_c"],
+        "condition": data["current"]["condition"]["text"],
+    }
+
+
+def fetch_weather_data_from_api(zip_code: str) -> dict:
+    """This function calls weather api to get the data through the pooled weather client.
 
     Arguments:
         zip_code -- The zip code.
@@ -60,17 +165,34 @@ def get_weather_data(zip_code: str) -> dict:
         logger.error("Weather API key is missing")
         return {"error": "Weather API key is not configured"}
 
-    parameters = {"key": WEATHER_API_KEY, "q": zip_code}
+    try:
+        return _weather_summary(weather_api_client.get_current_weather(zip_code))
+    except CircuitOpenError as e:
+        logger.warning(f"Skipping weather api call: {e}")
+        return {"error": "Weather service is temporarily unavailable."}
+    except (WeatherApiError, requests.exceptions.RequestException, KeyError) as e:
+        logger.error(f"Error fetching weather data: {e}")
+        return {"error": "Failed to fetch weather data."}
+
+
+async def a_fetch_weather_data_from_api(zip_code: str) -> dict:
+    """This function calls weather api through the async weather client.
+
+    Arguments:
+        zip_code -- The zip code.
+
+    Returns:
+        The location, temperature and condition.
+    """
+    if not WEATHER_API_KEY:
+        logger.error("Weather API key is missing")
+        return {"error": "Weather API key is not configured"}
 
     try:
-        response = requests.get(WEATHER_API_URL, params=parameters, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        return {
-            "location": data["location"]["name"],
-            "temperature": data["current"]["temp_c"],
-            "condition": data["current"]["condition"]["text"],
-        }
-    except requests.exceptions.RequestException as e:
+        return _weather_summary(await weather_api_client.a_get_current_weather(zip_code))
+    except CircuitOpenError as e:
+        logger.warning(f"Skipping weather api call: {e}")
+        return {"error": "Weather service is temporarily unavailable."}
+    except (WeatherApiError, httpx.HTTPError, KeyError) as e:
         logger.error(f"Error fetching weather data: {e}")
         return {"error": "Failed to fetch weather data."}
@@ -4,20 +4,80 @@ server.py
 This module starts FastAPI server for multi agent system.
 Serves as an entry point for handling requests and routing
 them to appropriate agents.
+
+Only FastAPI and the request path are imported here. autogen and the LLM SDKs
+are imported by the agent warm up, which runs in the background once the server
+accepts requests, so "/" answers before the LLM stack is loaded.
 """
+
+import asyncio
 import os
 import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from mas_autogen.app.utils.config import load_environment_variables
-from mas_autogen.app.services.agent_service import router as chat
+from mas_autogen.app.utils.config import (
+    FINANCE_INVOICE_STORE,
+    PROFILER_ENABLED,
+    SERVER_WORKERS,
+    load_environment_variables,
+)
+from loguru import logger
+from mas_autogen.app.agents.agent_registry import validate_env_overrides
+from mas_autogen.app.data.invoice_store import check_invoice_store
+from mas_autogen.app.services.agent_service import (
+    router as chat,
+    chat_executor,
+    load_agent_modules,
+    warm_up_agent_pools,
+)
+from mas_autogen.app.services.batch_service import router as batch
+from mas_autogen.app.services.debug_service import router as debug
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.worker_metrics import start_metrics_server
+from mas_autogen.app.utils.worker_supervisor import resolve_worker_count, run_workers
 
 # Load environment variables
 load_environment_variables()
 
 PORT = os.getenv("PORT")
 
-app = FastAPI()
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+async def warm_up_agents():
+    """Builds the pooled agent graphs in the background, loading the LLM stack."""
+    try:
+        await asyncio.to_thread(warm_up_agent_pools)
+    except Exception as e:  # pylint: disable=broad-except
+        # The graphs are built on demand then.
+        logger.error(f"Agent warm up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Sets up observability and starts the agent warm up, stops the chat workers on exit.
+
+    Arguments:
+        _app -- The FastAPI app.
+
+    Raises:
+        AgentSpecError: If an agent override variable is invalid.
+        FileNotFoundError: If the mapped invoice store is configured but not converted.
+    """
+    # Fails the startup on invalid AGENT_<NAME>_<FIELD> variables.
+    validate_env_overrides()
+    # The finance tools would only fail on their first call.
+    check_invoice_store(FINANCE_INVOICE_STORE)
+    agent_observability_mas.setup_providers()
+    start_metrics_server()
+    warm_up = asyncio.create_task(warm_up_agents())
+    yield
+    warm_up.cancel()
+    chat_executor.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -32,12 +92,22 @@ async def health_check():
         content={"message": "Hello Again! Your Multi Agent System is up and running"}
     )
 
+
 app.include_router(chat)
+app.include_router(batch)
+if PROFILER_ENABLED:
+    # The timelines hold the user messages, the endpoint is only served on demand.
+    app.include_router(debug)
 
 if __name__ == "__main__":
     import uvicorn
 
-    if PORT is not None:
+    workers = resolve_worker_count(SERVER_WORKERS)
+    if workers > 1:
+        # Loads the LLM stack once before forking, the workers share it copy-on-write.
+        load_agent_modules()
+        run_workers(app, host="0.0.0.0", port=int(PORT or 8080), workers=workers)
+    elif PORT is not None:
         uvicorn.run("server:app", host="0.0.0.0", port=int(PORT), reload=False)
     else:
         uvicorn.run("server:app", host="0.0.0.0", port=8080, reload=False)
@@ -1,17 +1,172 @@
 """This module acts as a facade layer for the agents.
 """
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from loguru import logger
 from pydantic import BaseModel
-from mas_autogen.app.agents.finance_group_chat_agent import FinanceGroupChatAgent
-from mas_autogen.app.agents.weather_agent import WeatherAgent
+from mas_autogen.app.agents.agent_pool import AgentGraph, AgentPool, AgentPoolExhaustedError
+from mas_autogen.app.agents.agent_registry import agent_registry
+from mas_autogen.app.services.chat_coalescer import ChatCoalescer
+from mas_autogen.app.services.chat_executor import (
+    ChatExecutor,
+    ChatExecutorSaturatedError,
+    ChatTimeoutError,
+)
+from mas_autogen.app.services.chat_scheduler import (
+    ChatQueueFullError,
+    ChatQueueTimeoutError,
+    ChatScheduler,
+)
+from mas_autogen.app.services.session_store import build_session_message, session_store
 from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import CHAT_STREAM_HEARTBEAT_INTERVAL
+from mas_autogen.app.utils.conversation_context import (
+    conversation_context,
+    get_conversation_context,
+)
 
 router = APIRouter()
 
 agent_observability_mas = AgentObservability(service_name="mas_app")
 
+chat_executor = ChatExecutor()
+
+# Hands the conversations to the executor by priority, within the agent limits.
+chat_scheduler = ChatScheduler(max_concurrency=chat_executor.max_concurrency)
+
+chat_coalescer = ChatCoalescer()
+
+
+def load_agent_modules():
+    """Discovers the agents, importing their modules and with them autogen and the LLM SDKs."""
+    agent_registry.discover()
+
+
+def warm_up_agent_pools():
+    """Builds the agent graphs of every registered agent ahead of the first request."""
+    agent_registry.warm_up()
+
+
+def run_conversation(agent_pool: AgentPool, message: str) -> str:
+    """Runs a conversation on a pooled agent graph. Blocks until it finishes.
+
+    Arguments:
+        agent_pool -- The pool of the requested agent.
+        message -- The user message.
+
+    Returns:
+        The agent response.
+    """
+    with agent_pool.checkout() as agent_graph:
+        return agent_graph.agent.start_chat(
+            sender=agent_graph.sender, receiver=agent_graph.receiver, message=message
+        )
+
+
+async def _acquire_graph(agent_pool: AgentPool) -> AgentGraph:
+    """Checks out a graph on a worker thread without blocking the event loop.
+
+    A cancelled request can not stop the thread, so the graph it acquires after the
+    cancellation goes back to the pool instead of leaking.
+
+    Arguments:
+        agent_pool -- The pool of the requested agent.
+
+    Returns:
+        The agent graph.
+    """
+
+    def release_unused(acquiring: asyncio.Future):
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            agent_pool.release(acquiring.result())
+
+    acquiring = asyncio.ensure_future(asyncio.to_thread(agent_pool.acquire))
+    try:
+        return await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        acquiring.add_done_callback(release_unused)
+        raise
+
+
+async def a_run_conversation(agent_pool: AgentPool, message: str) -> str:
+    """Runs a conversation on a pooled agent graph through a_initiate_chat.
+
+    Arguments:
+        agent_pool -- The pool of the requested agent.
+        message -- The user message.
+
+    Returns:
+        The agent response.
+    """
+    agent_graph = await _acquire_graph(agent_pool)
+    try:
+        return await agent_graph.agent.a_start_chat(
+            sender=agent_graph.sender, receiver=agent_graph.receiver, message=message
+        )
+    finally:
+        agent_pool.release(agent_graph)
+
+
+async def execute_conversation(
+    agent_pool: AgentPool,
+    message: str,
+    session_id: str | None = None,
+    priority: str | None = None,
+) -> str:
+    """Runs a conversation with the configured chat execution mode once it is scheduled.
+
+    Arguments:
+        agent_pool -- The pool of the requested agent.
+        message -- The user message.
+
+    Keyword Arguments:
+        session_id -- The session id, sessions take turns in the queue (default: {None})
+        priority -- The priority class (default: {None} uses the priority of the agent)
+
+    Raises:
+        HTTPException: 429 when saturated, 503 when no agent is free, 504 on timeout.
+
+    Returns:
+        The agent response.
+    """
+    spec = agent_registry.get(agent_pool.agent_name)
+    deadline = time.monotonic() + spec.timeout
+    try:
+        async with chat_scheduler.slot(
+            spec.name,
+            spec.concurrency_limit,
+            session_id=session_id,
+            priority=priority or spec.priority,
+            timeout=spec.timeout,
+        ):
+            # The time waited for the slot counts towards the timeout of the agent.
+            timeout = max(0.0, deadline - time.monotonic())
+            if chat_executor.mode == "async":
+                response = await chat_executor.run_async(
+                    a_run_conversation, agent_pool, message, timeout=timeout
+                )
+            else:
+                response = await chat_executor.run(
+                    run_conversation, agent_pool, message, timeout=timeout
+                )
+    except (ChatExecutorSaturatedError, ChatQueueFullError) as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"}) from e
+    except AgentPoolExhaustedError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    except (ChatTimeoutError, ChatQueueTimeoutError) as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
+
+    context = get_conversation_context()
+    if context is not None:
+        agent_observability_mas.track_conversation_rounds(spec.name, context.rounds)
+    return response
+
+
 class ChatRequest(BaseModel):
     """Chat Request Base Model
 
@@ -24,33 +179,235 @@ class ChatRequest(BaseModel):
     session_id: str
 
 
-@router.post("/chat")
-@agent_observability_mas.metric_collector(endpoint="/chat")
-async def chat(request: ChatRequest):
-    """API endpoint to interact with AI agents dynamically.
+async def run_session_conversation(
+    agent_pool: AgentPool, session_id: str | None, message: str, priority: str | None = None
+) -> str:
+    """Runs a conversation with the session chat history and adds it to the session.
 
     Arguments:
-        request -- Base Model.
+        agent_pool -- The pool of the requested agent.
+        session_id -- The session id, or None for a conversation without a session.
+        message -- The user message.
+
+    Keyword Arguments:
+        priority -- The priority class (default: {None} uses the priority of the agent)
+
+    Raises:
+        HTTPException: 429 when saturated, 503 when no agent is free, 504 on timeout.
+
+    Returns:
+        The agent response.
+    """
+    use_session = session_store is not None and session_id is not None
+    history = session_store.get_history(session_id) if use_session else []
+    spec = agent_registry.get(agent_pool.agent_name)
+
+    with conversation_context(
+        session_id=session_id,
+        agent_name=agent_pool.agent_name,
+        session_history=history,
+        cacheable=spec.cacheable,
+        budget=spec.new_budget(),
+    ):
+        response = await execute_conversation(
+            agent_pool,
+            build_session_message(message, history),
+            session_id=session_id,
+            priority=priority,
+        )
+
+    if use_session:
+        session_store.add_exchange(session_id, agent_pool.agent_name, message, response)
+    return response
+
+
+async def converse(
+    agent_pool: AgentPool, session_id: str | None, message: str, priority: str | None = None
+) -> str:
+    """Answers a chat request, sharing the conversation of an identical request in flight.
+
+    Identical requests have the same agent, session and message. The session gets
+    the exchange once.
+
+    Arguments:
+        agent_pool -- The pool of the requested agent.
+        session_id -- The session id, or None for a conversation without a session.
+        message -- The user message.
+
+    Keyword Arguments:
+        priority -- The priority class (default: {None} uses the priority of the agent)
+
+    Raises:
+        HTTPException: 429 when saturated, 503 when no agent is free, 504 on timeout.
 
     Returns:
         The agent response.
     """
-    agent_name = request.agent_name
-    if agent_name.lower() == "weather":
-        agent_instance = WeatherAgent(agent_name=agent_name.lower())
-    elif agent_name.lower() == "finance":
-        agent_instance = FinanceGroupChatAgent(agent_name=agent_name.lower())
-    else:
+    return await chat_coalescer.run(
+        agent_pool.agent_name,
+        (agent_pool.agent_name, session_id, message),
+        lambda: run_session_conversation(agent_pool, session_id, message, priority=priority),
+        cacheable=agent_registry.get(agent_pool.agent_name).cacheable,
+    )
+
+
+async def get_agent_pool(agent_name: str) -> AgentPool:
+    """Returns the pool of the requested agent.
+
+    The agents are discovered off the event loop if the warm up has not done it yet.
+
+    Arguments:
+        agent_name -- The agent name of the request.
+
+    Raises:
+        HTTPException: 404 when the agent does not exist.
+
+    Returns:
+        The agent pool.
+    """
+    if not agent_registry.discovered:
+        await asyncio.to_thread(agent_registry.discover)
+
+    agent_pool = agent_registry.get_pool(agent_name)
+    if agent_pool is None:
         raise HTTPException(
             status_code=404, detail=f"Agent '{agent_name}', not available at this point."
         )
+    return agent_pool
 
-    sender_agent, receiver_agent = agent_instance.create_ai_agents()
 
-    response = agent_instance.start_chat(
-        sender=sender_agent, receiver=receiver_agent, message=request.message
-    )
+def format_sse(event: dict) -> str:
+    """Formats an event as a Server-Sent Event.
+
+    Arguments:
+        event -- The event with its type in "event".
+
+    Returns:
+        The event stream lines.
+    """
+    data = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_conversation(
+    http_request: Request, request: ChatRequest, agent_pool: AgentPool
+) -> AsyncIterator[str]:
+    """Runs a conversation and yields its events as they are produced.
+
+    The conversation is cancelled when the client disconnects.
+
+    Arguments:
+        http_request -- The HTTP request, to detect a disconnected client.
+        request -- The chat request.
+        agent_pool -- The pool of the requested agent.
+
+    Yields:
+        The Server-Sent Events of the conversation, ending with a final or an error event.
+    """
+    history = session_store.get_history(request.session_id) if session_store else []
+    message = build_session_message(request.message, history)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def event_sink(event: dict):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    spec = agent_registry.get(agent_pool.agent_name)
+    with conversation_context(
+        session_id=request.session_id,
+        agent_name=agent_pool.agent_name,
+        session_history=history,
+        cacheable=spec.cacheable,
+        budget=spec.new_budget(),
+        event_sink=event_sink,
+    ) as context:
+        # The task copies the current context, so the conversation sees the event sink.
+        conversation = asyncio.create_task(
+            execute_conversation(agent_pool, message, session_id=request.session_id)
+        )
+    # Queued after the events of the conversation, as they are put from the loop too.
+    conversation.add_done_callback(lambda _: events.put_nowait(None))
+
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=CHAT_STREAM_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    logger.info(f"Client of session '{request.session_id}' disconnected.")
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield format_sse(event)
+
+        try:
+            response = conversation.result()
+        except HTTPException as e:
+            yield format_sse({"event": "error", "status_code": e.status_code, "detail": e.detail})
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Streamed conversation of session '{request.session_id}' failed: {e}")
+            yield format_sse({"event": "error", "status_code": 500, "detail": str(e)})
+            return
+
+        if session_store is not None:
+            session_store.add_exchange(
+                request.session_id, agent_pool.agent_name, request.message, response
+            )
+        yield format_sse({"event": "final", "message": response})
+    finally:
+        if not conversation.done():
+            # A worker thread can not be interrupted, it stops at the next agent message.
+            context.cancel()
+            conversation.cancel()
+
+
+@router.post("/chat")
+@agent_observability_mas.metric_collector(endpoint="/chat")
+async def chat(request: ChatRequest):
+    """API endpoint to interact with AI agents dynamically.
+
+    The earlier messages of the session are passed to the agents along with the
+    user message, so follow-up questions can be answered from them.
+
+    Arguments:
+        request -- Base Model.
+
+    Returns:
+        The agent response.
+    """
+    agent_pool = await get_agent_pool(request.agent_name)
+    response = await converse(agent_pool, request.session_id, request.message)
 
     json_response = JSONResponse(content={"message": response})
 
     return json_response
+
+
+@router.post("/chat/stream")
+@agent_observability_mas.metric_collector(endpoint="/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """API endpoint streaming the conversation with an agent as Server-Sent Events.
+
+    The events are the agent messages ("message"), the functions called ("tool_call")
+    and their results ("tool_result"), the tokens of the completions ("token") and
+    finally the agent response ("final") or the failure ("error"). The conversation
+    is cancelled when the client disconnects.
+
+    Arguments:
+        request -- Base Model.
+        http_request -- The HTTP request.
+
+    Returns:
+        The event stream.
+    """
+    agent_pool = await get_agent_pool(request.agent_name)
+
+    return StreamingResponse(
+        stream_conversation(http_request, request, agent_pool),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,386 @@
+"""This module answers batches of chat requests for bulk offline workloads.
+
+A batch is JSONL, one request per line. A request holds the message and optionally
+request_id, agent_name and session_id. "body" is read when there is no "message",
+so files shaped like requests.jsonl can be replayed as they are.
+
+The conversations run with bounded concurrency at the "batch" priority, behind the
+requests of the chat endpoints, and identical requests without a session (same agent
+and message) are answered once. The requests of a session are answered one after
+another in input order, each with its own conversation, so each one sees the history
+of the earlier ones. The results are written as JSONL in the order of the requests,
+each one as soon as it and all earlier ones are answered, followed by a summary line.
+Run a batch file from the command line with:
+
+    PYTHONPATH=./ python -m mas_autogen.app.services.batch_service requests.jsonl -o results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Iterable, List
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from loguru import logger
+from mas_autogen.app.services.agent_service import (
+    chat_executor,
+    converse,
+    get_agent_pool,
+    warm_up_agent_pools,
+)
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_ITEMS,
+    BATCH_PROGRESS_INTERVAL,
+)
+from mas_autogen.app.utils.resilience import backoff_delays
+
+router = APIRouter()
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+# Saturated executor or agent pool, the item is retried after a backoff.
+RETRYABLE_STATUS_CODES = frozenset({429, 503})
+
+
+class BatchTooLargeError(Exception):
+    """Raised when a batch holds more than the allowed number of requests."""
+
+
+@dataclass
+class BatchItem:
+    """One request of a batch.
+
+    Arguments:
+        index -- The position of the request in the batch.
+        request_id -- The request id, the index if the request has none.
+        agent_name -- The requested agent.
+        message -- The user message.
+        session_id -- The session id, None to answer without a session.
+        error -- Why the request is invalid, None if it is valid.
+    """
+
+    index: int
+    request_id: str
+    agent_name: str | None
+    message: str | None
+    session_id: str | None = None
+    error: str | None = None
+
+    @property
+    def key(self) -> tuple:
+        """The key of identical requests.
+
+        A request of a session is identical to no other, as a repeated message, e.g. a
+        second "yes", is answered from the history the earlier requests left.
+        """
+        if self.session_id is not None:
+            return (str(self.agent_name).lower(), self.session_id, self.index)
+        return (str(self.agent_name).lower(), None, self.message)
+
+
+def parse_batch_items(
+    lines: Iterable[str], agent_name: str | None = None, max_items: int = BATCH_MAX_ITEMS
+) -> List[BatchItem]:
+    """Parses the requests of a JSONL batch. Invalid requests are kept with their error.
+
+    Arguments:
+        lines -- The JSONL lines, blank lines are skipped.
+
+    Keyword Arguments:
+        agent_name -- The agent of requests without agent_name (default: {None})
+        max_items -- Requests allowed in the batch (default: {BATCH_MAX_ITEMS})
+
+    Raises:
+        BatchTooLargeError: If the batch holds more than max_items requests.
+
+    Returns:
+        The batch items in input order.
+    """
+    items = []
+    for line in lines:
+        if not line.strip():
+            continue
+        index = len(items)
+        if index >= max_items:
+            raise BatchTooLargeError(f"A batch holds at most {max_items} requests.")
+
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+        except ValueError as e:
+            items.append(BatchItem(index, str(index), agent_name, None, error=f"Invalid JSON: {e}"))
+            continue
+
+        item = BatchItem(
+            index=index,
+            request_id=str(request.get("request_id", request.get("id", index))),
+            agent_name=request.get("agent_name", agent_name),
+            message=request.get("message", request.get("body")),
+            session_id=request.get("session_id"),
+        )
+        if not item.agent_name:
+            item.error = "No agent_name given."
+        elif not isinstance(item.message, str) or not item.message.strip():
+            item.error = "No message given."
+        items.append(item)
+    return items
+
+
+def batch_lanes(items: List[BatchItem]) -> List[List[BatchItem]]:
+    """Groups the valid distinct requests of a batch into lanes answered in order.
+
+    The requests of a session share a lane, every request without a session gets
+    its own. The lanes are ordered by their first request.
+
+    Arguments:
+        items -- The batch items.
+
+    Returns:
+        The lanes of batch items.
+    """
+    lanes = []
+    session_lanes: Dict[str, List[BatchItem]] = {}
+    keys = set()
+    for item in items:
+        if item.error is not None or item.key in keys:
+            continue
+        keys.add(item.key)
+        if item.session_id is None:
+            lanes.append([item])
+        elif item.session_id in session_lanes:
+            session_lanes[item.session_id].append(item)
+        else:
+            session_lanes[item.session_id] = [item]
+            lanes.append(session_lanes[item.session_id])
+    return lanes
+
+
+class BatchRunner:
+    """Answers the items of a batch with bounded concurrency."""
+
+    def __init__(
+        self,
+        max_concurrency: int = BATCH_MAX_CONCURRENCY,
+        retries: int = 2,
+        progress_interval: int = BATCH_PROGRESS_INTERVAL,
+    ):
+        """Creates the runner.
+
+        Keyword Arguments:
+            max_concurrency -- Conversations running at once (default: {BATCH_MAX_CONCURRENCY})
+            retries -- Retries of an item rejected with 429 or 503 (default: {2})
+            progress_interval -- Items between progress logs (default: {BATCH_PROGRESS_INTERVAL})
+        """
+        # More would only be rejected by the chat executor.
+        self.max_concurrency = max(1, min(max_concurrency, chat_executor.max_concurrency))
+        self.retries = retries
+        self.progress_interval = max(1, progress_interval)
+
+    async def _answer(self, item: BatchItem) -> dict:
+        """Runs the conversation of an item.
+
+        Returns:
+            The status with the agent response or the error, and the duration.
+        """
+        start_time = time.perf_counter()
+        delays = backoff_delays(self.retries, base=1, maximum=5)
+        while True:
+            try:
+                agent_pool = await get_agent_pool(item.agent_name)
+                response = await converse(
+                    agent_pool, item.session_id, item.message, priority="batch"
+                )
+                result = {"status": "ok", "message": response}
+            except HTTPException as e:
+                delay = next(delays, None)
+                if e.status_code in RETRYABLE_STATUS_CODES and delay is not None:
+                    await asyncio.sleep(delay)
+                    continue
+                result = {"status": "error", "status_code": e.status_code, "error": e.detail}
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error(f"Batch item '{item.request_id}' failed: {e}")
+                result = {"status": "error", "status_code": 500, "error": str(e)}
+            break
+        result["duration_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+        return result
+
+    async def _work(self, lanes: Deque[List[BatchItem]], answers: Dict[tuple, asyncio.Future]):
+        """Answers the items of the next lanes one after another, until no lane is left."""
+        while lanes:
+            for item in lanes.popleft():
+                answers[item.key].set_result(await self._answer(item))
+
+    async def run(self, items: List[BatchItem]) -> AsyncIterator[dict]:
+        """Answers the items and yields the results in input order.
+
+        Arguments:
+            items -- The batch items.
+
+        Yields:
+            One result per item, with request_id, index, status, the agent response or
+            the error, duration_ms, deduplicated and the completed and total item counts.
+            The last result is the summary of the batch.
+        """
+        start_time = time.perf_counter()
+        lanes = deque(batch_lanes(items))
+        loop = asyncio.get_running_loop()
+        answers = {item.key: loop.create_future() for lane in lanes for item in lane}
+        # One task per running conversation rather than per item.
+        workers = [
+            asyncio.create_task(self._work(lanes, answers))
+            for _ in range(min(self.max_concurrency, len(lanes)))
+        ]
+
+        counts = {"ok": 0, "error": 0, "deduplicated": 0}
+        answered = set()
+        try:
+            for completed, item in enumerate(items, start=1):
+                if item.error is not None:
+                    answer = {"status": "error", "status_code": 400, "error": item.error}
+                    deduplicated = False
+                else:
+                    answer = dict(await answers[item.key])
+                    deduplicated = item.key in answered
+                    answered.add(item.key)
+
+                counts[answer["status"]] += 1
+                if deduplicated:
+                    counts["deduplicated"] += 1
+                    answer.pop("duration_ms", None)
+                agent_observability_mas.track_batch_item(
+                    str(item.agent_name).lower(),
+                    "deduplicated" if deduplicated else answer["status"],
+                    answer.get("duration_ms"),
+                )
+
+                if completed % self.progress_interval == 0:
+                    logger.info(
+                        f"Batch progress: {completed}/{len(items)} items, "
+                        f"{counts['error']} failed."
+                    )
+                yield {
+                    "request_id": item.request_id,
+                    "index": item.index,
+                    **answer,
+                    "deduplicated": deduplicated,
+                    "completed": completed,
+                    "total": len(items),
+                }
+
+            duration = time.perf_counter() - start_time
+            summary = {
+                "total": len(items),
+                "succeeded": counts["ok"],
+                "failed": counts["error"],
+                "deduplicated": counts["deduplicated"],
+                "conversations": len(answers),
+                "duration_s": round(duration, 3),
+                "items_per_second": round(len(items) / duration, 2) if duration else None,
+            }
+            logger.info(f"Batch finished: {summary}")
+            yield {"summary": summary}
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+async def stream_batch_results(items: List[BatchItem], runner: BatchRunner) -> AsyncIterator[str]:
+    """Yields the results of a batch as JSONL lines.
+
+    Arguments:
+        items -- The batch items.
+        runner -- The batch runner.
+
+    Yields:
+        The JSONL lines.
+    """
+    async for result in runner.run(items):
+        yield json.dumps(result, default=str) + "\n"
+
+
+@router.post("/chat/batch")
+async def chat_batch(
+    http_request: Request,
+    agent_name: str | None = None,
+    max_concurrency: int = BATCH_MAX_CONCURRENCY,
+):
+    """API endpoint answering a JSONL batch of chat requests.
+
+    The results are streamed back as JSONL in the order of the requests, followed
+    by a summary line.
+
+    Arguments:
+        http_request -- The HTTP request, its body is the JSONL batch.
+
+    Keyword Arguments:
+        agent_name -- The agent of requests without agent_name (default: {None})
+        max_concurrency -- Conversations running at once (default: {BATCH_MAX_CONCURRENCY})
+
+    Returns:
+        The JSONL results.
+    """
+    body = await http_request.body()
+    try:
+        items = parse_batch_items(body.decode("utf-8").splitlines(), agent_name=agent_name)
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"The batch is not UTF-8: {e}") from e
+    except BatchTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e)) from e
+
+    return StreamingResponse(
+        stream_batch_results(items, BatchRunner(max_concurrency=max_concurrency)),
+        media_type="application/x-ndjson",
+    )
+
+
+async def run_batch_file(input_file, output_file, agent_name: str | None, runner: BatchRunner):
+    """Answers a JSONL batch file and writes the results to a JSONL file.
+
+    Arguments:
+        input_file -- The batch file.
+        output_file -- The results file.
+        agent_name -- The agent of requests without agent_name.
+        runner -- The batch runner.
+    """
+    items = parse_batch_items(input_file, agent_name=agent_name)
+    async for line in stream_batch_results(items, runner):
+        output_file.write(line)
+        output_file.flush()
+
+
+def main(argv: List[str] | None = None):
+    """Command line entry point answering a JSONL batch file in process.
+
+    Keyword Arguments:
+        argv -- The command line arguments (default: {None} reads sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Answer a JSONL batch of chat requests.")
+    parser.add_argument("input", help="JSONL batch file, - for stdin")
+    # Not stdout, the agents and the console exporters print there.
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file")
+    parser.add_argument("--agent-name", help="Agent of requests without agent_name")
+    parser.add_argument("--max-concurrency", type=int, default=BATCH_MAX_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    agent_observability_mas.setup_providers()
+    warm_up_agent_pools()
+    runner = BatchRunner(max_concurrency=args.max_concurrency)
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            asyncio.run(run_batch_file(input_file, output_file, args.agent_name, runner))
+    finally:
+        chat_executor.shutdown()
+        if input_file is not sys.stdin:
+            input_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""This module answers identical concurrent chat requests with one conversation.
+
+Dashboards and client retries send the same request (same agent, session and
+message) within milliseconds. The first one runs the conversation, the ones
+arriving while it runs wait for its result instead of starting their own. With
+CHAT_RESULT_CACHE_TTL set, the result also answers the repeats arriving within
+that many seconds after it finished, for agents registered as cacheable.
+
+The conversation runs in its own task, so a waiting request which goes away does
+not stop it for the others. It is only cancelled when no request waits anymore.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+from cachetools import TTLCache
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    CHAT_COALESCING,
+    CHAT_RESULT_CACHE_MAX_SIZE,
+    CHAT_RESULT_CACHE_TTL,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class _Flight:
+    """A conversation in flight and the number of requests waiting for it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ChatCoalescer:
+    """Single flight of identical chat requests with an optional short lived result cache.
+
+    Runs on the event loop, the requests are coalesced within one server process.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = CHAT_COALESCING,
+        result_ttl: float = CHAT_RESULT_CACHE_TTL,
+        result_max_size: int = CHAT_RESULT_CACHE_MAX_SIZE,
+    ):
+        """Creates the coalescer.
+
+        Keyword Arguments:
+            enabled -- Whether identical requests are coalesced (default: {CHAT_COALESCING})
+            result_ttl -- Seconds a result answers repeats (default: {CHAT_RESULT_CACHE_TTL})
+            result_max_size -- Results kept (default: {CHAT_RESULT_CACHE_MAX_SIZE})
+        """
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._results = (
+            TTLCache(maxsize=result_max_size, ttl=result_ttl) if result_ttl > 0 else None
+        )
+
+    def _finish(self, key: Hashable, task: asyncio.Task, cacheable: bool):
+        """Done callback of a conversation, keeps its result for the repeats."""
+        if self._flights.get(key) is not None and self._flights[key].task is task:
+            del self._flights[key]
+        if (
+            cacheable
+            and self._results is not None
+            and not task.cancelled()
+            and task.exception() is None
+        ):
+            self._results[key] = task.result()
+
+    async def run(
+        self,
+        agent_name: str,
+        key: Hashable,
+        conversation: Callable[[], Awaitable[str]],
+        cacheable: bool = True,
+    ) -> str:
+        """Runs the conversation of a request or joins the identical one in flight.
+
+        Arguments:
+            agent_name -- The agent name, for the metrics.
+            key -- Identifies identical requests.
+            conversation -- Runs the conversation of the request.
+
+        Keyword Arguments:
+            cacheable -- Whether the result may answer later repeats (default: {True})
+
+        Returns:
+            The agent response.
+        """
+        if not self.enabled:
+            agent_observability_mas.track_chat_coalescing(agent_name, "executed")
+            return await conversation()
+
+        if cacheable and self._results is not None:
+            response = self._results.get(key)
+            if response is not None:
+                agent_observability_mas.track_chat_coalescing(agent_name, "cached")
+                return response
+
+        flight = self._flights.get(key)
+        if flight is None:
+            # The task copies the context of the first request.
+            task = asyncio.ensure_future(conversation())
+            task.add_done_callback(lambda done: self._finish(key, done, cacheable))
+            flight = self._flights[key] = _Flight(task)
+            agent_observability_mas.track_chat_coalescing(agent_name, "executed")
+        else:
+            agent_observability_mas.track_chat_coalescing(agent_name, "coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
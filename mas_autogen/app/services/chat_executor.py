@@ -0,0 +1,185 @@
+"""This module runs agent conversations off the event loop.
+
+Conversations either run on a bounded thread pool ("thread" mode) or as
+coroutines through autogen's a_initiate_chat ("async" mode). In both modes the
+number of running plus queued conversations is bounded, and a request is
+rejected as soon as that bound is reached.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+from loguru import logger
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    CHAT_EXECUTION_MODE,
+    CHAT_MAX_CONCURRENCY,
+    CHAT_MAX_QUEUE_SIZE,
+    CHAT_TIMEOUT,
+)
+from mas_autogen.app.utils.conversation_context import get_conversation_context
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+EXECUTION_MODES = ("thread", "async")
+
+
+class ChatExecutorSaturatedError(Exception):
+    """Raised when all workers are busy and the queue is full."""
+
+
+class ChatTimeoutError(Exception):
+    """Raised when a conversation does not finish within the request timeout."""
+
+
+class ChatExecutor:
+    """Bounded executor for agent conversations."""
+
+    def __init__(
+        self,
+        mode: str = CHAT_EXECUTION_MODE,
+        max_concurrency: int = CHAT_MAX_CONCURRENCY,
+        max_queue_size: int = CHAT_MAX_QUEUE_SIZE,
+        timeout: float = CHAT_TIMEOUT,
+    ):
+        """Creates the executor.
+
+        Keyword Arguments:
+            mode -- "thread" or "async" (default: {CHAT_EXECUTION_MODE})
+            max_concurrency -- Conversations running at once (default: {CHAT_MAX_CONCURRENCY})
+            max_queue_size -- Conversations waiting for a worker (default: {CHAT_MAX_QUEUE_SIZE})
+            timeout -- Default per request timeout in seconds (default: {CHAT_TIMEOUT})
+        """
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Chat execution mode must be one of {EXECUTION_MODES}, not '{mode}'.")
+
+        self.mode = mode
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_size = max(0, max_queue_size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+        self._semaphore = None
+
+        if mode == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix="chat-worker"
+            )
+        else:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @property
+    def pending(self) -> int:
+        """Number of conversations running or queued."""
+        return self._pending
+
+    def _admit(self):
+        """Admits a conversation or rejects it when the executor is saturated."""
+        with self._lock:
+            if self._pending >= self.max_concurrency + self.max_queue_size:
+                agent_observability_mas.track_chat_execution(self.mode, "rejected")
+                raise ChatExecutorSaturatedError(
+                    f"{self._pending} conversations are already running or queued."
+                )
+            self._pending += 1
+        agent_observability_mas.track_chat_execution_pending(self.mode, 1)
+
+    def _release(self, *_):
+        """Releases the admission of a conversation."""
+        with self._lock:
+            self._pending -= 1
+        agent_observability_mas.track_chat_execution_pending(self.mode, -1)
+
+    async def run(self, func: Callable[..., Any], *args, timeout: float | None = None) -> Any:
+        """Runs a blocking conversation on the worker pool.
+
+        A thread cannot be interrupted, so a conversation that times out is cancelled
+        through its conversation context and stops at its next agent message or LLM
+        call. Until then it keeps its worker thread and its pooled agent graph, and its
+        admission is only released once it finishes.
+
+        Arguments:
+            func -- The blocking function running the conversation.
+
+        Keyword Arguments:
+            timeout -- Seconds to wait for the result (default: {None} uses the executor timeout)
+
+        Raises:
+            ChatExecutorSaturatedError: If all workers are busy and the queue is full.
+            ChatTimeoutError: If the conversation did not finish in time.
+
+        Returns:
+            The result of func.
+        """
+        self._admit()
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, func, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        timeout = self.timeout if timeout is None else timeout
+        outcome = "failed"
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            outcome = "completed"
+            return result
+        except asyncio.TimeoutError as e:
+            outcome = "timeout"
+            if future.cancel():
+                logger.warning("Conversation timed out before a worker picked it up.")
+            else:
+                logger.warning(f"Conversation still running after {timeout} seconds.")
+                conversation = get_conversation_context()
+                if conversation is not None:
+                    conversation.cancel()
+            raise ChatTimeoutError(f"Conversation did not finish within {timeout} seconds.") from e
+        finally:
+            agent_observability_mas.track_chat_execution(self.mode, outcome)
+
+    async def run_async(
+        self, func: Callable[..., Awaitable[Any]], *args, timeout: float | None = None
+    ) -> Any:
+        """Runs a conversation coroutine on the event loop.
+
+        Arguments:
+            func -- The coroutine function running the conversation.
+
+        Keyword Arguments:
+            timeout -- Seconds to wait for the result (default: {None} uses the executor timeout)
+
+        Raises:
+            ChatExecutorSaturatedError: If all slots are busy and the queue is full.
+            ChatTimeoutError: If the conversation did not finish in time.
+
+        Returns:
+            The result of func.
+        """
+
+        async def run_with_slot():
+            async with self._semaphore:
+                return await func(*args)
+
+        self._admit()
+        timeout = self.timeout if timeout is None else timeout
+        outcome = "failed"
+        try:
+            result = await asyncio.wait_for(run_with_slot(), timeout)
+            outcome = "completed"
+            return result
+        except asyncio.TimeoutError as e:
+            outcome = "timeout"
+            raise ChatTimeoutError(f"Conversation did not finish within {timeout} seconds.") from e
+        finally:
+            self._release()
+            agent_observability_mas.track_chat_execution(self.mode, outcome)
+
+    def shutdown(self):
+        """Stops accepting work and releases idle worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+"""This module schedules the conversations in front of the chat executor.
+
+A conversation waits for a slot before it is handed to the chat executor. There
+are as many slots as the executor runs conversations at once, and every agent
+type takes at most its own max_concurrency of them, so a burst of long finance
+group chats leaves slots to the quick weather lookups.
+
+A freed slot goes to the waiting conversation of the highest priority class,
+"interactive" before "standard" before "batch", whose agent is below its limit.
+Within a class the sessions take turns, so a session sending many requests does
+not hold back the others. The number of waiting conversations is bounded.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import CHAT_MAX_CONCURRENCY, CHAT_MAX_QUEUE_SIZE
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+# Highest priority first.
+PRIORITIES = ("interactive", "standard", "batch")
+
+
+class ChatQueueFullError(Exception):
+    """Raised when a conversation can not start and the queue is full."""
+
+
+class ChatQueueTimeoutError(Exception):
+    """Raised when a conversation did not get a slot in time."""
+
+
+@dataclass(eq=False)
+class _Waiter:
+    """A conversation waiting for a slot."""
+
+    agent_name: str
+    max_concurrency: int
+    session_id: str | None
+    priority: str
+    future: asyncio.Future
+
+
+class ChatScheduler:
+    """Priority scheduler of the conversations with per agent concurrency limits."""
+
+    def __init__(
+        self,
+        max_concurrency: int = CHAT_MAX_CONCURRENCY,
+        max_queue_size: int = CHAT_MAX_QUEUE_SIZE,
+    ):
+        """Creates the scheduler.
+
+        Keyword Arguments:
+            max_concurrency -- Conversations running at once (default: {CHAT_MAX_CONCURRENCY})
+            max_queue_size -- Conversations waiting for a slot (default: {CHAT_MAX_QUEUE_SIZE})
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue_size = max(0, max_queue_size)
+        self._running = 0
+        self._running_per_agent: Dict[str, int] = defaultdict(int)
+        # Per priority class, the waiting conversations of each session in turn order.
+        self._queues: Dict[str, OrderedDict[str | None, Deque[_Waiter]]] = {
+            priority: OrderedDict() for priority in PRIORITIES
+        }
+        self._queued = 0
+
+    @property
+    def running(self) -> int:
+        """Number of conversations holding a slot."""
+        return self._running
+
+    @property
+    def queued(self) -> int:
+        """Number of conversations waiting for a slot."""
+        return self._queued
+
+    def _can_start(self, waiter: _Waiter) -> bool:
+        """Whether a slot is free for the conversation."""
+        return (
+            self._running < self.max_concurrency
+            and self._running_per_agent[waiter.agent_name] < waiter.max_concurrency
+        )
+
+    def _enqueue(self, waiter: _Waiter):
+        """Adds a conversation to the queue of its session."""
+        self._queues[waiter.priority].setdefault(waiter.session_id, deque()).append(waiter)
+        self._queued += 1
+        agent_observability_mas.track_chat_queue_size(waiter.agent_name, waiter.priority, 1)
+
+    def _dequeue(self, waiter: _Waiter):
+        """Removes a conversation from the queue of its session, if it is still queued."""
+        sessions = self._queues[waiter.priority]
+        waiters = sessions.get(waiter.session_id)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        if not waiters:
+            del sessions[waiter.session_id]
+        self._queued -= 1
+        agent_observability_mas.track_chat_queue_size(waiter.agent_name, waiter.priority, -1)
+
+    def _start_next(self) -> bool:
+        """Gives a free slot to the next conversation.
+
+        Returns:
+            Whether a conversation was started.
+        """
+        for sessions in self._queues.values():
+            for session_id, waiters in sessions.items():
+                waiter = next((waiter for waiter in waiters if self._can_start(waiter)), None)
+                if waiter is None:
+                    continue
+
+                self._dequeue(waiter)
+                if session_id in sessions:
+                    # The session waits for its next turn behind the other sessions.
+                    sessions.move_to_end(session_id)
+                if waiter.future.done():
+                    # Its task was cancelled, the slot stays free.
+                    return True
+                self._running += 1
+                self._running_per_agent[waiter.agent_name] += 1
+                waiter.future.set_result(None)
+                return True
+        return False
+
+    def _dispatch(self):
+        """Gives the free slots to the waiting conversations."""
+        while self._running < self.max_concurrency and self._start_next():
+            pass
+
+    def _release(self, waiter: _Waiter):
+        """Frees the slot of a finished conversation."""
+        self._running -= 1
+        self._running_per_agent[waiter.agent_name] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        agent_name: str,
+        max_concurrency: int,
+        session_id: str | None = None,
+        priority: str = "standard",
+        timeout: float | None = None,
+    ) -> AsyncIterator[float]:
+        """Context manager holding a slot while a conversation runs.
+
+        Arguments:
+            agent_name -- The agent name.
+            max_concurrency -- Conversations of the agent running at once.
+
+        Keyword Arguments:
+            session_id -- The session taking turns with the other sessions (default: {None})
+            priority -- One of PRIORITIES (default: {"standard"})
+            timeout -- Seconds to wait for a slot (default: {None} waits without limit)
+
+        Raises:
+            ValueError: If the priority is unknown.
+            ChatQueueFullError: If no slot is free and the queue is full.
+            ChatQueueTimeoutError: If no slot became free in time.
+
+        Yields:
+            The seconds the conversation waited.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priority must be one of {PRIORITIES}, not '{priority}'.")
+
+        start_time = time.perf_counter()
+        waiter = _Waiter(
+            agent_name=agent_name,
+            max_concurrency=max(1, max_concurrency),
+            session_id=session_id,
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._enqueue(waiter)
+        self._dispatch()
+
+        outcome = "scheduled"
+        try:
+            if not waiter.future.done():
+                if self._queued > self.max_queue_size:
+                    outcome = "rejected"
+                    raise ChatQueueFullError(
+                        f"{self._queued - 1} conversations are already queued."
+                    )
+                await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError as e:
+            outcome = "timeout"
+            raise ChatQueueTimeoutError(
+                f"No '{agent_name}' conversation slot free after {timeout} seconds."
+            ) from e
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            wait_time = time.perf_counter() - start_time
+            if outcome != "scheduled":
+                started = waiter.future.done() and not waiter.future.cancelled()
+                if started:
+                    self._release(waiter)
+                else:
+                    self._dequeue(waiter)
+            agent_observability_mas.track_chat_queue(
+                agent_name, priority, outcome, wait_time * 1000
+            )
+
+        try:
+            yield wait_time
+        finally:
+            self._release(waiter)
@@ -0,0 +1,62 @@
+"""This module serves the timelines of the conversation profiler.
+
+/debug/conversations lists the recent slow or failed conversations of this server
+process, the latest first, and /debug/conversations/{conversation_id} returns the
+rounds of one of them with their LLM, tool and other time, and the sampled stacks
+when the sampling profiler is on.
+"""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from mas_autogen.app.utils.conversation_profiler import conversation_profiler
+
+router = APIRouter()
+
+
+def _profiler():
+    """Returns the conversation profiler.
+
+    Raises:
+        HTTPException: 404 when the profiler is disabled.
+    """
+    if conversation_profiler is None:
+        raise HTTPException(status_code=404, detail="The conversation profiler is disabled.")
+    return conversation_profiler
+
+
+@router.get("/debug/conversations")
+async def list_conversations():
+    """API endpoint listing the profiled slow or failed conversations.
+
+    Returns:
+        The totals of the kept conversations and the profiler settings.
+    """
+    profiler = _profiler()
+    return JSONResponse(
+        content={
+            "slow_conversation_ms": profiler.slow_conversation_ms,
+            "sampling_interval_ms": profiler.sampling_interval_ms,
+            "conversations": profiler.recent(),
+        }
+    )
+
+
+@router.get("/debug/conversations/{conversation_id}")
+async def get_conversation(conversation_id: str):
+    """API endpoint returning the timeline of a profiled conversation.
+
+    Arguments:
+        conversation_id -- The id listed by /debug/conversations.
+
+    Raises:
+        HTTPException: 404 when the conversation is not kept.
+
+    Returns:
+        The timeline of the conversation.
+    """
+    timeline = _profiler().get(conversation_id)
+    if timeline is None:
+        raise HTTPException(
+            status_code=404, detail=f"Conversation '{conversation_id}' is not kept."
+        )
+    return JSONResponse(content=timeline)
@@ -0,0 +1,282 @@
+"""This module keeps the message history of chat sessions.
+
+Every finished conversation adds the user message and the agent answer to its
+session. The history is bounded per session, idle sessions expire after a TTL and
+the least recently used sessions are evicted when the store is full. The history
+lives in memory by default or in a local SQLite database which survives restarts.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List
+from cachetools import TTLCache
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    SESSION_MAX_MESSAGE_CHARS,
+    SESSION_MAX_MESSAGES,
+    SESSION_MAX_SESSIONS,
+    SESSION_STORE_BACKEND,
+    SESSION_STORE_PATH,
+    SESSION_TTL,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class _EvictionCountingTTLCache(TTLCache):
+    """TTL cache reporting its evictions. Expired sessions are not counted."""
+
+    def popitem(self):
+        item = super().popitem()
+        agent_observability_mas.track_cache_eviction("session")
+        return item
+
+
+class MemorySessionBackend:
+    """In-process session history store."""
+
+    def __init__(self, ttl: float, max_sessions: int):
+        """Creates the store.
+
+        Arguments:
+            ttl -- Seconds an idle session is kept.
+            max_sessions -- Maximum number of sessions.
+        """
+        self._sessions = _EvictionCountingTTLCache(maxsize=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> List[dict]:
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                return []
+            # Setting the entry again restarts its TTL.
+            self._sessions[session_id] = turns
+            return list(turns)
+
+    def append(self, session_id: str, turns: List[dict], max_messages: int):
+        with self._lock:
+            history = self._sessions.get(session_id, []) + turns
+            self._sessions[session_id] = history[-max_messages:]
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SqliteSessionBackend:
+    """Local SQLite session history store."""
+
+    def __init__(self, ttl: float, max_sessions: int, path: str):
+        """Creates the store and its tables if missing.
+
+        Arguments:
+            ttl -- Seconds an idle session is kept.
+            max_sessions -- Maximum number of sessions.
+            path -- The SQLite database file.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.path = path
+        self._connect()
+        # A SQLite connection must not be used across fork, e.g. by the server workers.
+        os.register_at_fork(after_in_child=self._connect)
+
+        self._connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY, updated_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+            CREATE TABLE IF NOT EXISTS session_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,
+                agent_name TEXT, created_at REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS session_messages_session_id
+                ON session_messages (session_id, id);
+            """
+        )
+
+    def _connect(self):
+        """Opens the connection of this process."""
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+    def _delete_sessions(self, where: str, parameters: tuple) -> int:
+        """Deletes the sessions selected by the where clause with their messages."""
+        self._connection.execute(
+            "DELETE FROM session_messages WHERE session_id IN "
+            f"(SELECT session_id FROM sessions WHERE {where})",
+            parameters,
+        )
+        return self._connection.execute(f"DELETE FROM sessions WHERE {where}", parameters).rowcount
+
+    def get(self, session_id: str) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            updated = self._connection.execute(
+                "UPDATE sessions SET updated_at = ? WHERE session_id = ? AND updated_at > ?",
+                (now, session_id, now - self.ttl),
+            ).rowcount
+            if not updated:
+                return []
+            rows = self._connection.execute(
+                "SELECT role, content, agent_name, created_at FROM session_messages "
+                "WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        return [
+            {"role": role, "content": content, "agent_name": agent_name, "created_at": created}
+            for role, content, agent_name, created in rows
+        ]
+
+    def append(self, session_id: str, turns: List[dict], max_messages: int):
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._delete_sessions("updated_at <= ?", (now - self.ttl,))
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO sessions VALUES (?, ?)", (session_id, now)
+                )
+                self._connection.executemany(
+                    "INSERT INTO session_messages "
+                    "(session_id, role, content, agent_name, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (session_id, t["role"], t["content"], t.get("agent_name"), t["created_at"])
+                        for t in turns
+                    ],
+                )
+                self._connection.execute(
+                    "DELETE FROM session_messages WHERE session_id = ? AND id NOT IN ("
+                    "SELECT id FROM session_messages WHERE session_id = ? "
+                    "ORDER BY id DESC LIMIT ?)",
+                    (session_id, session_id, max_messages),
+                )
+                evicted = self._delete_sessions(
+                    "session_id IN (SELECT session_id FROM sessions "
+                    "ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_sessions,),
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        for _ in range(max(0, evicted)):
+            agent_observability_mas.track_cache_eviction("session")
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._delete_sessions("session_id = ?", (session_id,))
+
+
+class SessionStore:
+    """Bounded per-session message history."""
+
+    def __init__(
+        self,
+        backend,
+        max_messages: int = SESSION_MAX_MESSAGES,
+        max_message_chars: int = SESSION_MAX_MESSAGE_CHARS,
+    ):
+        """Creates the session store.
+
+        Arguments:
+            backend -- The session history store.
+
+        Keyword Arguments:
+            max_messages -- Messages kept per session (default: {SESSION_MAX_MESSAGES})
+            max_message_chars -- Characters kept per message (default: {SESSION_MAX_MESSAGE_CHARS})
+        """
+        self.backend = backend
+        self.max_messages = max(1, max_messages)
+        self.max_message_chars = max_message_chars
+
+    def get_history(self, session_id: str) -> List[dict]:
+        """Returns the history of a session.
+
+        Arguments:
+            session_id -- The session id.
+
+        Returns:
+            The turns of the session, oldest first. Each turn holds role, content,
+            agent_name and created_at.
+        """
+        history = self.backend.get(session_id)
+        agent_observability_mas.track_cache("session", "hit" if history else "miss")
+        return history
+
+    def add_exchange(self, session_id: str, agent_name: str, message: str, answer: str):
+        """Adds a user message and the agent answer to a session.
+
+        Arguments:
+            session_id -- The session id.
+            agent_name -- The agent which answered.
+            message -- The user message.
+            answer -- The agent answer.
+        """
+        now = time.time()
+        turns = [
+            {
+                "role": role,
+                "content": str(content)[: self.max_message_chars],
+                "agent_name": agent_name,
+                "created_at": now,
+            }
+            for role, content in (("user", message), ("assistant", answer))
+        ]
+        self.backend.append(session_id, turns, self.max_messages)
+
+    def delete(self, session_id: str):
+        """Deletes a session.
+
+        Arguments:
+            session_id -- The session id.
+        """
+        self.backend.delete(session_id)
+
+
+def build_session_message(message: str, history: List[dict]) -> str:
+    """Prepends the session chat history to the user message.
+
+    Arguments:
+        message -- The user message.
+        history -- The turns of the session, oldest first.
+
+    Returns:
+        The message for the agents.
+    """
+    if not history:
+        return message
+
+    lines = [f"{turn['role']}: {turn['content']}" for turn in history]
+    return "Session Chat History:\n" + "\n".join(lines) + f"\n\nUser Input: {message}"
+
+
+def create_session_store() -> SessionStore | None:
+    """Creates the session store configured by the environment.
+
+    Returns:
+        The session store, or None if SESSION_STORE_BACKEND is 'none'.
+    """
+    if SESSION_STORE_BACKEND == "none":
+        return None
+    if SESSION_STORE_BACKEND == "sqlite":
+        backend = SqliteSessionBackend(SESSION_TTL, SESSION_MAX_SESSIONS, SESSION_STORE_PATH)
+    elif SESSION_STORE_BACKEND == "memory":
+        backend = MemorySessionBackend(SESSION_TTL, SESSION_MAX_SESSIONS)
+    else:
+        raise ValueError(
+            f"Unknown SESSION_STORE_BACKEND '{SESSION_STORE_BACKEND}', "
+            "expected memory, sqlite or none."
+        )
+    return SessionStore(backend)
+
+
+session_store = create_session_store()
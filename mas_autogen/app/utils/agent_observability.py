@@ -1,31 +1,48 @@
 """This module is specifically created for observability.
+
+The instruments are created on the OpenTelemetry API meter and tracer at import,
+which is cheap. The SDK providers and exporters are only imported and set up by
+setup_providers, from the lifespan hook of the server. Until then the
+measurements and spans are dropped.
+
 Returns:
     The AgentObservability instance.
 """
 
 import time
 import asyncio
+import threading
 from functools import wraps
-from opentelemetry.sdk.resources import Resource
-from opentelemetry import trace
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.sdk.trace.export import (
-    SimpleSpanProcessor,
-    ConsoleSpanExporter,
-    BatchSpanProcessor,
+from opentelemetry import metrics, trace
+from opentelemetry.metrics import CallbackOptions, Observation
+from mas_autogen.app.utils.config import (
+    TELEMETRY_EXPORT_INTERVAL_MS,
+    TELEMETRY_OTLP_ENDPOINT,
+    TELEMETRY_OTLP_INSECURE,
+    TELEMETRY_PROFILE,
+    TELEMETRY_SPAN_BATCH_SIZE,
+    TELEMETRY_SPAN_QUEUE_SIZE,
+    TELEMETRY_TAIL_LATENCY_MS,
+    TELEMETRY_TAIL_MAX_TRACES,
+    TELEMETRY_TAIL_SAMPLE_RATIO,
+    TELEMETRY_TRACE_SAMPLE_RATIO,
 )
-from opentelemetry.sdk.metrics import MeterProvider
-from opentelemetry.metrics import set_meter_provider
-from opentelemetry.sdk.metrics.export import ConsoleMetricExporter, PeriodicExportingMetricReader
-from opentelemetry.exporter.prometheus import PrometheusMetricReader
-from prometheus_client import start_http_server
+from mas_autogen.app.utils.conversation_profiler import get_conversation_timeline
+
+TELEMETRY_PROFILES = ("development", "production", "metrics")
+
+# Histogram buckets in milliseconds of the requests and LLM calls, which take seconds.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 180000)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 131072)
+ROUND_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48)
 
 
 class AgentObservability:
     """This class contains methods for tracing agents."""
 
     _instances = {}  # singleton instances per service name
+    _providers_lock = threading.Lock()
+    _providers_ready = False  # the SDK providers are global to the process
 
     def __new__(cls, service_name="default_app"):
         """Ensures only one instance of AgentObservability"""
@@ -41,6 +58,7 @@ class AgentObservability:
             service_name -- The service name (default: {"default_app"})
         """
         if not hasattr(self, "resource"):
+            self.service_name = None
             self.resource = None
             self.tracer = None
             self.tracer_provider = None
@@ -48,6 +66,36 @@ class AgentObservability:
             self.meter = None
             self.request_counter = None
             self.request_size_histogram = None
+            self.request_duration_histogram = None
+            self.llm_call_counter = None
+            self.llm_call_duration_histogram = None
+            self.llm_tokens_histogram = None
+            self.tool_call_counter = None
+            self.tool_call_duration_histogram = None
+            self.conversation_rounds_histogram = None
+            self.conversation_budget_counter = None
+            self.agent_pool_size_counter = None
+            self.agent_pool_in_use_counter = None
+            self.agent_pool_warm_up_histogram = None
+            self.agent_pool_checkout_wait_histogram = None
+            self.agent_pool_exhausted_counter = None
+            self.chat_execution_pending_counter = None
+            self.chat_execution_counter = None
+            self.chat_queue_size_counter = None
+            self.chat_queue_wait_histogram = None
+            self.chat_queue_counter = None
+            self.chat_coalescing_counter = None
+            self.chat_coalescing_ratio_gauge = None
+            self.chat_coalescing_totals = None
+            self.entity_extraction_counter = None
+            self.cache_request_counter = None
+            self.cache_eviction_counter = None
+            self.circuit_breaker_counter = None
+            self.prompt_tokens_histogram = None
+            self.context_compaction_counter = None
+            self.speaker_selection_counter = None
+            self.batch_item_counter = None
+            self.batch_item_duration_histogram = None
 
     def init_observability(self, service_name="default_app"):
         """Initializes observability attributes
@@ -55,40 +103,14 @@ class AgentObservability:
         Keyword Arguments:
             service_name -- The service name (default: {"default_app"})
         """
-        # Create a resource
-        self.resource = Resource.create({"service.name": service_name})
-
-        # Set up OpenTelemetry Tracing
-        self.tracer_provider = TracerProvider(resource=self.resource)
-        trace.set_tracer_provider(self.tracer_provider)
-
-        # Export traces to console for debugging
-        self.tracer_provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
-
-        # Export traces to Grafana Tempo
-        otlp_exporter = OTLPSpanExporter(
-            endpoint="http://localhost:4327", insecure=True
-        )  # TBD: Remove insecure=True for production
-        self.tracer_provider.add_span_processor(BatchSpanProcessor(otlp_exporter))
+        self.service_name = service_name
+        self.resource = None
+        self.tracer_provider = None
+        self.meter_provider = None
 
-        # Tracer
+        # Instruments of the API proxies, bound to the SDK once setup_providers runs.
         self.tracer = trace.get_tracer(service_name)
-
-        # Set up OpenTelemetry Metrics
-        start_http_server(8000)  # Metrics endpoint http://localhost:8000/metrics
-        prometheus_reader = PrometheusMetricReader()
-        self.meter_provider = MeterProvider(
-            metric_readers=[
-                prometheus_reader,
-                PeriodicExportingMetricReader(ConsoleMetricExporter()),
-            ],
-            resource=self.resource,
-        )
-
-        set_meter_provider(self.meter_provider)
-
-        # Create a Meter
-        self.meter = self.meter_provider.get_meter(service_name)
+        self.meter = metrics.get_meter(service_name)
 
         # Define a counter metric
         self.request_counter = self.meter.create_counter(
@@ -103,20 +125,572 @@ class AgentObservability:
             unit="bytes",
         )
 
+        self.request_duration_histogram = self.meter.create_histogram(
+            name="http_request_duration",
+            description="Time to answer an HTTP request, until the response starts for streams",
+            unit="ms",
+            explicit_bucket_boundaries_advisory=LATENCY_BUCKETS_MS,
+        )
+
+        # LLM call metrics
+        self.llm_call_counter = self.meter.create_counter(
+            name="llm_call_count",
+            description="Counts the completions requested from the LLM by outcome",
+            unit="calls",
+        )
+
+        self.llm_call_duration_histogram = self.meter.create_histogram(
+            name="llm_call_duration",
+            description="Time an LLM completion took, cached completions excluded",
+            unit="ms",
+            explicit_bucket_boundaries_advisory=LATENCY_BUCKETS_MS,
+        )
+
+        self.llm_tokens_histogram = self.meter.create_histogram(
+            name="llm_tokens",
+            description="Prompt and completion tokens of an LLM completion, as billed",
+            unit="tokens",
+            explicit_bucket_boundaries_advisory=TOKEN_BUCKETS,
+        )
+
+        # Tool call metrics
+        self.tool_call_counter = self.meter.create_counter(
+            name="tool_call_count",
+            description="Counts the functions called by the agents by outcome",
+            unit="calls",
+        )
+
+        self.tool_call_duration_histogram = self.meter.create_histogram(
+            name="tool_call_duration",
+            description="Time a function called by an agent took",
+            unit="ms",
+            explicit_bucket_boundaries_advisory=LATENCY_BUCKETS_MS,
+        )
+
+        # Conversation metrics
+        self.conversation_rounds_histogram = self.meter.create_histogram(
+            name="conversation_rounds",
+            description="Messages the agents exchanged in a completed conversation",
+            unit="messages",
+            explicit_bucket_boundaries_advisory=ROUND_BUCKETS,
+        )
+
+        self.conversation_budget_counter = self.meter.create_counter(
+            name="conversation_budget_hit_count",
+            description="Counts the conversations stopped by a budget, by the limit hit",
+            unit="conversations",
+        )
+
+        # Agent pool metrics
+        self.agent_pool_size_counter = self.meter.create_up_down_counter(
+            name="agent_pool_size",
+            description="Number of agent graphs created by the agent pool",
+            unit="graphs",
+        )
+
+        self.agent_pool_in_use_counter = self.meter.create_up_down_counter(
+            name="agent_pool_in_use",
+            description="Number of agent graphs currently checked out of the agent pool",
+            unit="graphs",
+        )
+
+        self.agent_pool_warm_up_histogram = self.meter.create_histogram(
+            name="agent_pool_warm_up_time",
+            description="Time taken to build an agent graph",
+            unit="ms",
+        )
+
+        self.agent_pool_checkout_wait_histogram = self.meter.create_histogram(
+            name="agent_pool_checkout_wait_time",
+            description="Time spent waiting to check out an agent graph",
+            unit="ms",
+        )
+
+        self.agent_pool_exhausted_counter = self.meter.create_counter(
+            name="agent_pool_exhausted_count",
+            description="Counts the checkouts that timed out because the agent pool was exhausted",
+            unit="requests",
+        )
+
+        # Chat execution metrics
+        self.chat_execution_pending_counter = self.meter.create_up_down_counter(
+            name="chat_execution_pending",
+            description="Number of conversations running or queued for a worker",
+            unit="requests",
+        )
+
+        self.chat_execution_counter = self.meter.create_counter(
+            name="chat_execution_count",
+            description="Counts the conversations by outcome",
+            unit="requests",
+        )
+
+        # Chat scheduler metrics
+        self.chat_queue_size_counter = self.meter.create_up_down_counter(
+            name="chat_queue_size",
+            description="Number of conversations waiting for a scheduler slot",
+            unit="requests",
+        )
+
+        self.chat_queue_wait_histogram = self.meter.create_histogram(
+            name="chat_queue_wait",
+            description="Time a conversation waited for a scheduler slot",
+            unit="ms",
+        )
+
+        self.chat_queue_counter = self.meter.create_counter(
+            name="chat_queue_count",
+            description="Counts the scheduled conversations by outcome",
+            unit="requests",
+        )
+
+        # Chat coalescing metrics
+        self.chat_coalescing_counter = self.meter.create_counter(
+            name="chat_coalescing_count",
+            description="Counts the chat requests by how their conversation was run",
+            unit="requests",
+        )
+
+        # Per agent, the chat requests and those answered by another request's conversation.
+        self.chat_coalescing_totals = {}
+        self.chat_coalescing_ratio_gauge = self.meter.create_observable_gauge(
+            name="chat_coalescing_ratio",
+            callbacks=[self._observe_chat_coalescing_ratio],
+            description="Share of the chat requests answered by another request's conversation",
+            unit="1",
+        )
+
+        # Entity extraction metrics
+        self.entity_extraction_counter = self.meter.create_counter(
+            name="entity_extraction_count",
+            description="Counts the entity extractions by the tier which resolved them",
+            unit="extractions",
+        )
+
+        # Cache metrics
+        self.cache_request_counter = self.meter.create_counter(
+            name="cache_request_count",
+            description="Counts the cache lookups by result (hit, stale, similar, miss, coalesced)",
+            unit="requests",
+        )
+
+        self.cache_eviction_counter = self.meter.create_counter(
+            name="cache_eviction_count",
+            description="Counts the entries evicted from a full cache",
+            unit="entries",
+        )
+
+        # Upstream resilience metrics
+        self.circuit_breaker_counter = self.meter.create_counter(
+            name="circuit_breaker_state_change_count",
+            description="Counts the circuit breaker state changes by upstream and new state",
+            unit="changes",
+        )
+
+        # Context budget metrics
+        self.prompt_tokens_histogram = self.meter.create_histogram(
+            name="llm_prompt_tokens",
+            description="Prompt tokens per LLM round before (original) and after (sent) compaction",
+            unit="tokens",
+        )
+
+        self.context_compaction_counter = self.meter.create_counter(
+            name="context_compaction_count",
+            description="Counts the tool results pruned and the messages dropped from prompts",
+            unit="messages",
+        )
+
+        # Group chat metrics
+        self.speaker_selection_counter = self.meter.create_counter(
+            name="speaker_selection_count",
+            description="Counts the group chat speaker selections by the rule which decided",
+            unit="selections",
+        )
+
+        # Batch metrics
+        self.batch_item_counter = self.meter.create_counter(
+            name="batch_item_count",
+            description="Counts the batch items by status, deduplicated items included",
+            unit="items",
+        )
+
+        self.batch_item_duration_histogram = self.meter.create_histogram(
+            name="batch_item_duration",
+            description="Time to answer a batch item, deduplicated items excluded",
+            unit="ms",
+        )
+
+    def setup_providers(self, profile: str = TELEMETRY_PROFILE):
+        """Sets up the OpenTelemetry SDK providers and exporters once per process.
+
+        The profile selects the exporters:
+
+        - development -- the spans are also printed as they end, the metrics every minute.
+        - production -- the spans are only exported over OTLP, in batches.
+        - metrics -- no traces, only the Prometheus metrics.
+
+        The metrics are served to Prometheus in every profile. The OTLP spans are
+        head sampled, optionally tail sampled, and exported from a bounded queue on
+        a background thread, which drops spans when it is full.
+
+        Keyword Arguments:
+            profile -- The telemetry profile (default: {TELEMETRY_PROFILE})
+
+        Raises:
+            ValueError: If the profile is unknown.
+
+        Returns:
+            Whether this call set them up.
+        """
+        if profile not in TELEMETRY_PROFILES:
+            raise ValueError(
+                f"Telemetry profile must be one of {TELEMETRY_PROFILES}, not '{profile}'."
+            )
+
+        # pylint: disable=import-outside-toplevel
+        with AgentObservability._providers_lock:
+            if AgentObservability._providers_ready:
+                return False
+            AgentObservability._providers_ready = True
+
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.metrics import MeterProvider
+            from opentelemetry.sdk.metrics.export import (
+                ConsoleMetricExporter,
+                PeriodicExportingMetricReader,
+            )
+            from opentelemetry.exporter.prometheus import PrometheusMetricReader
+
+            # Create a resource
+            self.resource = Resource.create({"service.name": self.service_name})
+
+            if profile != "metrics":
+                self._setup_tracer_provider(console=profile == "development")
+
+            # Set up OpenTelemetry Metrics
+            # The metrics endpoint is started by the server, see worker_metrics.
+            metric_readers = [PrometheusMetricReader()]
+            if profile == "development":
+                metric_readers.append(PeriodicExportingMetricReader(ConsoleMetricExporter()))
+            self.meter_provider = MeterProvider(
+                metric_readers=metric_readers,
+                resource=self.resource,
+            )
+
+            metrics.set_meter_provider(self.meter_provider)
+            return True
+
+    def _setup_tracer_provider(self, console: bool):
+        """Sets up the sampled tracer provider exporting the spans over OTLP.
+
+        Arguments:
+            console -- Whether the spans are also printed as they end.
+        """
+        # pylint: disable=import-outside-toplevel
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.trace.export import (
+            SimpleSpanProcessor,
+            ConsoleSpanExporter,
+            BatchSpanProcessor,
+        )
+
+        # Set up OpenTelemetry Tracing, a trace is sampled when it starts
+        self.tracer_provider = TracerProvider(
+            resource=self.resource,
+            sampler=ParentBased(TraceIdRatioBased(TELEMETRY_TRACE_SAMPLE_RATIO)),
+        )
+        trace.set_tracer_provider(self.tracer_provider)
+
+        # Export traces to console for debugging
+        if console:
+            self.tracer_provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+
+        # Export traces to Grafana Tempo
+        otlp_exporter = OTLPSpanExporter(
+            endpoint=TELEMETRY_OTLP_ENDPOINT, insecure=TELEMETRY_OTLP_INSECURE
+        )
+        span_processor = BatchSpanProcessor(
+            otlp_exporter,
+            max_queue_size=TELEMETRY_SPAN_QUEUE_SIZE,
+            max_export_batch_size=min(TELEMETRY_SPAN_BATCH_SIZE, TELEMETRY_SPAN_QUEUE_SIZE),
+            schedule_delay_millis=TELEMETRY_EXPORT_INTERVAL_MS,
+        )
+        if TELEMETRY_TAIL_SAMPLE_RATIO < 1:
+            from mas_autogen.app.utils.trace_sampling import TailSamplingSpanProcessor
+
+            span_processor = TailSamplingSpanProcessor(
+                span_processor,
+                latency_ms=TELEMETRY_TAIL_LATENCY_MS,
+                sample_ratio=TELEMETRY_TAIL_SAMPLE_RATIO,
+                max_traces=TELEMETRY_TAIL_MAX_TRACES,
+            )
+        self.tracer_provider.add_span_processor(span_processor)
+
     def track_request(self, endpoint: str, request_size_in_bytes: int):
         """Tracks the requests.
 
         Arguments:
             endpoint -- API endpoint name.
+            request_size_in_bytes -- Size of the request payload.
+        """
+        attributes = {"endpoint": endpoint}
+        self.request_counter.add(1, attributes)
+        self.request_size_histogram.record(request_size_in_bytes, attributes)
+
+    def track_request_duration(self, endpoint: str, status_code: int, duration_ms: float):
+        """Tracks the time taken to answer a request.
+
+        Arguments:
+            endpoint -- API endpoint name.
+            status_code -- The HTTP status code of the response.
+            duration_ms -- Time to answer the request.
+        """
+        self.request_duration_histogram.record(
+            duration_ms, {"endpoint": endpoint, "status_code": str(status_code)}
+        )
+
+    def track_llm_call(
+        self,
+        agent_name: str | None,
+        model: str | None,
+        outcome: str,
+        duration_ms: float,
+        usage=None,
+    ):
+        """Tracks an LLM completion.
+
+        Arguments:
+            agent_name -- The agent name of the conversation, None outside of one.
+            model -- The model of the llm config.
+            outcome -- One of ok, failed or cancelled.
+            duration_ms -- Time the completion took.
+
+        Keyword Arguments:
+            usage -- The token usage of the completion (default: {None})
+        """
+        attributes = {"agent_name": agent_name or "none", "model": model or "unknown"}
+        self.llm_call_counter.add(1, {**attributes, "outcome": outcome})
+        self.llm_call_duration_histogram.record(duration_ms, attributes)
+        if usage is not None:
+            self.llm_tokens_histogram.record(
+                usage.prompt_tokens, {**attributes, "token_type": "prompt"}
+            )
+            self.llm_tokens_histogram.record(
+                usage.completion_tokens, {**attributes, "token_type": "completion"}
+            )
+
+    def track_tool_call(self, agent_name: str, tool_name: str, outcome: str, duration_ms: float):
+        """Tracks a function called by an agent.
+
+        Arguments:
+            agent_name -- The agent name.
+            tool_name -- The function name of the function map.
+            outcome -- One of ok, error (an error result) or failed (raised).
+            duration_ms -- Time the function took.
+        """
+        attributes = {"agent_name": agent_name, "tool": tool_name}
+        self.tool_call_counter.add(1, {**attributes, "outcome": outcome})
+        self.tool_call_duration_histogram.record(duration_ms, attributes)
+
+    def track_conversation_rounds(self, agent_name: str, rounds: int):
+        """Tracks the messages exchanged in a completed conversation.
+
+        Arguments:
+            agent_name -- The agent name.
+            rounds -- The number of messages.
+        """
+        self.conversation_rounds_histogram.record(rounds, {"agent_name": agent_name})
+
+    def track_budget_hit(self, agent_name: str, limit: str):
+        """Tracks a conversation stopped by its budget.
+
+        Arguments:
+            agent_name -- The agent name.
+            limit -- One of wall_time, tokens, rounds or repetition.
+        """
+        self.conversation_budget_counter.add(1, {"agent_name": agent_name, "limit": limit})
+
+    def track_agent_pool_size(self, agent_name: str, created: int = 0, in_use: int = 0):
+        """Tracks the size of an agent pool.
+
+        Arguments:
+            agent_name -- The agent name of the pool.
+
+        Keyword Arguments:
+            created -- Change in the number of graphs held by the pool (default: {0})
+            in_use -- Change in the number of graphs checked out (default: {0})
+        """
+        if created:
+            self.agent_pool_size_counter.add(created, {"agent_name": agent_name})
+        if in_use:
+            self.agent_pool_in_use_counter.add(in_use, {"agent_name": agent_name})
+
+    def track_agent_pool_warm_up(self, agent_name: str, warm_up_time_ms: float):
+        """Tracks the time taken to build an agent graph.
+
+        Arguments:
+            agent_name -- The agent name of the pool.
+            warm_up_time_ms -- The build time in milliseconds.
+        """
+        self.agent_pool_warm_up_histogram.record(warm_up_time_ms, {"agent_name": agent_name})
+
+    def track_agent_pool_checkout(self, agent_name: str, wait_time_ms: float, exhausted: bool):
+        """Tracks an agent pool checkout.
+
+        Arguments:
+            agent_name -- The agent name of the pool.
+            wait_time_ms -- The time spent waiting for a graph in milliseconds.
+            exhausted -- Whether the checkout timed out.
+        """
+        self.agent_pool_checkout_wait_histogram.record(wait_time_ms, {"agent_name": agent_name})
+        if exhausted:
+            self.agent_pool_exhausted_counter.add(1, {"agent_name": agent_name})
+
+    def track_chat_execution_pending(self, mode: str, pending: int):
+        """Tracks the conversations running or queued for a worker.
+
+        Arguments:
+            mode -- The chat execution mode.
+            pending -- Change in the number of pending conversations.
+        """
+        self.chat_execution_pending_counter.add(pending, {"mode": mode})
+
+    def track_chat_execution(self, mode: str, outcome: str):
+        """Tracks the outcome of a conversation.
+
+        Arguments:
+            mode -- The chat execution mode.
+            outcome -- One of completed, failed, rejected or timeout.
+        """
+        self.chat_execution_counter.add(1, {"mode": mode, "outcome": outcome})
+
+    def track_chat_queue_size(self, agent_name: str, priority: str, queued: int):
+        """Tracks the conversations waiting for a scheduler slot.
+
+        Arguments:
+            agent_name -- The agent name.
+            priority -- The priority class.
+            queued -- Change in the number of waiting conversations.
+        """
+        self.chat_queue_size_counter.add(queued, {"agent_name": agent_name, "priority": priority})
+
+    def track_chat_queue(self, agent_name: str, priority: str, outcome: str, wait_time_ms: float):
+        """Tracks the wait of a conversation for a scheduler slot.
+
+        Arguments:
+            agent_name -- The agent name.
+            priority -- The priority class.
+            outcome -- One of scheduled, rejected, timeout or cancelled.
+            wait_time_ms -- Time the conversation waited.
+        """
+        attributes = {"agent_name": agent_name, "priority": priority}
+        self.chat_queue_counter.add(1, {**attributes, "outcome": outcome})
+        if outcome == "scheduled":
+            self.chat_queue_wait_histogram.record(wait_time_ms, attributes)
+
+    def track_chat_coalescing(self, agent_name: str, result: str):
+        """Tracks whether a chat request ran its own conversation.
+
+        Arguments:
+            agent_name -- The agent name.
+            result -- One of executed, coalesced (joined one in flight) or cached.
+        """
+        self.chat_coalescing_counter.add(1, {"agent_name": agent_name, "result": result})
+        totals = self.chat_coalescing_totals.setdefault(agent_name, [0, 0])
+        totals[0] += 1
+        if result != "executed":
+            totals[1] += 1
+
+    def _observe_chat_coalescing_ratio(self, _options: CallbackOptions):
+        """Callback of the chat coalescing ratio gauge."""
+        for agent_name, (requests, shared) in list(self.chat_coalescing_totals.items()):
+            yield Observation(shared / requests, {"agent_name": agent_name})
+
+    def track_entity_extraction(self, extractor: str, tier: str):
+        """Tracks the tier which resolved an entity extraction.
+
+        Arguments:
+            extractor -- The extractor name.
+            tier -- One of pattern, session_history or llm.
         """
-        self.request_counter.add(1, {"endpoint": endpoint})
-        self.request_size_histogram.record(
-            request_size_in_bytes, {"request_size_in_bytes": request_size_in_bytes}
+        self.entity_extraction_counter.add(1, {"extractor": extractor, "tier": tier})
+
+    def track_cache(self, cache_name: str, result: str):
+        """Tracks a cache lookup.
+
+        Arguments:
+            cache_name -- The cache name.
+            result -- One of hit, stale, similar, miss or coalesced.
+        """
+        self.cache_request_counter.add(1, {"cache": cache_name, "result": result})
+
+    def track_cache_eviction(self, cache_name: str):
+        """Tracks an entry evicted from a full cache.
+
+        Arguments:
+            cache_name -- The cache name.
+        """
+        self.cache_eviction_counter.add(1, {"cache": cache_name})
+
+    def track_circuit_breaker(self, upstream: str, state: str):
+        """Tracks a circuit breaker state change.
+
+        Arguments:
+            upstream -- The upstream name of the circuit.
+            state -- One of closed, open or half_open.
+        """
+        self.circuit_breaker_counter.add(1, {"upstream": upstream, "state": state})
+
+    def track_context_budget(self, agent_name: str, stats: dict):
+        """Tracks the prompt size of an LLM round and its compaction.
+
+        Arguments:
+            agent_name -- The agent name of the context budget.
+            stats -- The statistics returned by ContextBudget.compact.
+        """
+        self.prompt_tokens_histogram.record(
+            stats["original_prompt_tokens"], {"agent_name": agent_name, "stage": "original"}
         )
+        self.prompt_tokens_histogram.record(
+            stats["prompt_tokens"], {"agent_name": agent_name, "stage": "sent"}
+        )
+        for action in ("pruned_tool_results", "dropped_messages"):
+            if stats[action]:
+                self.context_compaction_counter.add(
+                    stats[action], {"agent_name": agent_name, "action": action}
+                )
+
+    def track_speaker_selection(self, group_chat: str, rule: str):
+        """Tracks the rule which selected the next speaker of a group chat.
+
+        Arguments:
+            group_chat -- The group chat name.
+            rule -- One of intent, default or llm.
+        """
+        self.speaker_selection_counter.add(1, {"group_chat": group_chat, "rule": rule})
+
+    def track_batch_item(self, agent_name: str, status: str, duration_ms: float | None = None):
+        """Tracks an answered batch item.
+
+        Arguments:
+            agent_name -- The agent name.
+            status -- One of ok, error or deduplicated.
+
+        Keyword Arguments:
+            duration_ms -- Time the conversation took (default: {None})
+        """
+        self.batch_item_counter.add(1, {"agent_name": agent_name, "status": status})
+        if duration_ms is not None:
+            self.batch_item_duration_histogram.record(duration_ms, {"agent_name": agent_name})
 
     def metric_collector(self, endpoint: str):
         """Decorator to capture metrics.
 
+        The request is traced and counted, and the time taken to answer it is
+        recorded with its status code, 500 for an unexpected error.
+
         Arguments:
             endpoint -- The API endpoint name.
         """
@@ -126,7 +700,7 @@ class AgentObservability:
 
                 @wraps(func)
                 async def async_wrapper(*args, **kwargs):
-                    start_time = time.time()
+                    start_time = time.perf_counter()
 
                     request_payload = kwargs.get("request")
                     agent_name = getattr(request_payload, "agent_name", "NOT PROVIDED")
@@ -134,54 +708,122 @@ class AgentObservability:
                     request_json_dump = request_payload.model_dump_json()
                     request_size_in_bytes = len(request_json_dump.encode("utf-8"))
 
+                    status_code = 500
                     with self.tracer.start_as_current_span(
                         endpoint, kind=trace.SpanKind.SERVER
                     ) as span:
                         span.set_attribute("api_endpoint", endpoint)
                         span.set_attribute("request_size_in_bytes", request_size_in_bytes)
                         span.set_attribute("agent_name", agent_name)
-                        response = await func(*args, **kwargs)
-                        end_time = time.time()
-                        response_time = (end_time - start_time) * 1000
-                        self.track_request(
-                            endpoint,
-                            request_size_in_bytes=request_size_in_bytes,
-                        )
-                        span.set_attribute("response_time_ms", response_time)
-                        return response
+                        try:
+                            response = await func(*args, **kwargs)
+                            status_code = getattr(response, "status_code", 200)
+                            return response
+                        except Exception as e:
+                            status_code = getattr(e, "status_code", 500)
+                            raise
+                        finally:
+                            response_time = (time.perf_counter() - start_time) * 1000
+                            self.track_request(
+                                endpoint,
+                                request_size_in_bytes=request_size_in_bytes,
+                            )
+                            self.track_request_duration(endpoint, status_code, response_time)
+                            span.set_attribute("response_time_ms", response_time)
 
                 return async_wrapper
             else:
 
                 @wraps(func)
                 def sync_wrapper(*args, **kwargs):
-                    start_time = time.time()
+                    start_time = time.perf_counter()
                     request_payload = kwargs.get("request")
                     agent_name = getattr(request_payload, "agent_name", "NOT PROVIDED")
 
                     request_json_dump = request_payload.model_dump_json()
                     request_size_in_bytes = len(request_json_dump.encode("utf-8"))
 
+                    status_code = 500
                     with self.tracer.start_as_current_span(
                         endpoint, kind=trace.SpanKind.SERVER
                     ) as span:
                         span.set_attribute("api_endpoint", endpoint)
                         span.set_attribute("request_size_in_bytes", request_size_in_bytes)
                         span.set_attribute("agent_name", agent_name)
-                        response = func(*args, **kwargs)
-                        end_time = time.time()
-                        response_time = (end_time - start_time) * 1000
-                        self.track_request(
-                            endpoint,
-                            request_size_in_bytes=request_size_in_bytes,
-                        )
-                        span.set_attribute("response_time_ms", response_time)
-                        return response
+                        try:
+                            response = func(*args, **kwargs)
+                            status_code = getattr(response, "status_code", 200)
+                            return response
+                        except Exception as e:
+                            status_code = getattr(e, "status_code", 500)
+                            raise
+                        finally:
+                            response_time = (time.perf_counter() - start_time) * 1000
+                            self.track_request(
+                                endpoint,
+                                request_size_in_bytes=request_size_in_bytes,
+                            )
+                            self.track_request_duration(endpoint, status_code, response_time)
+                            span.set_attribute("response_time_ms", response_time)
 
                 return sync_wrapper
 
         return decorator
 
+    def tool_metric_collector(self, agent_name: str, function_map: dict) -> dict:
+        """Wraps the functions of a function map to capture their metrics.
+
+        The calls are also recorded on the timeline of the conversation, if it is profiled.
+
+        Arguments:
+            agent_name -- The agent name registering the functions.
+            function_map -- The function names and functions passed to register_function.
+
+        Returns:
+            The function map of the wrapped functions.
+        """
+
+        def record(tool_name, outcome, start_time):
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            self.track_tool_call(agent_name, tool_name, outcome, duration_ms)
+            timeline = get_conversation_timeline()
+            if timeline is not None:
+                timeline.record_tool_call(tool_name, outcome, duration_ms)
+
+        def response_outcome(response):
+            return "error" if isinstance(response, dict) and "error" in response else "ok"
+
+        def collect(tool_name, func):
+            if asyncio.iscoroutinefunction(func):
+
+                @wraps(func)
+                async def async_tool_wrapper(*args, **kwargs):
+                    start_time = time.perf_counter()
+                    outcome = "failed"
+                    try:
+                        response = await func(*args, **kwargs)
+                        outcome = response_outcome(response)
+                        return response
+                    finally:
+                        record(tool_name, outcome, start_time)
+
+                return async_tool_wrapper
+
+            @wraps(func)
+            def tool_wrapper(*args, **kwargs):
+                start_time = time.perf_counter()
+                outcome = "failed"
+                try:
+                    response = func(*args, **kwargs)
+                    outcome = response_outcome(response)
+                    return response
+                finally:
+                    record(tool_name, outcome, start_time)
+
+            return tool_wrapper
+
+        return {tool_name: collect(tool_name, func) for tool_name, func in function_map.items()}
+
     def trace_agent_function(self, function_name: str):
         """Decorator to create spans for agent functions under the API trace."""
 
@@ -190,16 +832,12 @@ class AgentObservability:
 
                 @wraps(func)
                 async def async_wrapper(*args, **kwargs):
-                    parent_span = trace.get_current_span()  # Fetch the current span
-                    print(parent_span)
-                    with self.tracer.start_as_current_span(
-                        function_name, context=trace.set_span_in_context(parent_span)
-                    ) as span:
+                    # The span is a child of the current, API trace span.
+                    with self.tracer.start_as_current_span(function_name) as span:
                         span.set_attribute("agent_function", function_name)
-                        start_time = time.time()
+                        start_time = time.perf_counter()
                         response = await func(*args, **kwargs)
-                        end_time = time.time()
-                        response_time = (end_time - start_time) * 1000
+                        response_time = (time.perf_counter() - start_time) * 1000
                         span.set_attribute("response_time_ms", response_time)
                         return response
 
@@ -208,16 +846,12 @@ class AgentObservability:
 
                 @wraps(func)
                 def sync_wrapper(*args, **kwargs):
-                    parent_span = trace.get_current_span()  # Get the API trace span
-                    print(parent_span)
-                    with self.tracer.start_as_current_span(
-                        function_name, context=trace.set_span_in_context(parent_span)
-                    ) as span:
+                    # The span is a child of the current, API trace span.
+                    with self.tracer.start_as_current_span(function_name) as span:
                         span.set_attribute("agent_function", function_name)
-                        start_time = time.time()
+                        start_time = time.perf_counter()
                         response = func(*args, **kwargs)
-                        end_time = time.time()
-                        response_time = (end_time - start_time) * 1000
+                        response_time = (time.perf_counter() - start_time) * 1000
                         span.set_attribute("response_time_ms", response_time)
                         return response
 
@@ -1,27 +1,230 @@
 """Gen AI Core Proxy Client
 """
 
+import time
+from functools import lru_cache
 from typing import Any, Dict
-from openai import OpenAI
+from openai import APITimeoutError, OpenAI
 from openai.types.chat import ChatCompletion
+from autogen.io.base import IOStream
 from autogen.oai.client import OpenAIClient
 from gen_ai_hub.proxy import GenAIHubProxyClient
 from gen_ai_hub.proxy.native.openai import OpenAI as OpenAIProxy
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.completion_cache import completion_cache
+from mas_autogen.app.utils.completion_cassette import completion_cassette
+from mas_autogen.app.utils.config import LLM_API_KEY, LLM_BASE_URL
+from mas_autogen.app.utils.context_budget import ContextBudget
+from mas_autogen.app.utils.conversation_budget import ConversationBudget
+from mas_autogen.app.utils.conversation_profiler import get_conversation_timeline
+from mas_autogen.app.utils.conversation_context import (
+    ConversationCancelledError,
+    ConversationContext,
+    get_conversation_context,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+@lru_cache(maxsize=1)
+def get_openai_proxy_client() -> OpenAI:
+    """Returns the OpenAI proxy client shared by all the agents of this process.
+
+    The proxy client holds the AI Core token and the HTTP connection pool, so it
+    is created once instead of once per agent graph. With LLM_BASE_URL set, a plain
+    OpenAI client of that server is returned instead, e.g. of a local stub for load tests.
+
+    Returns:
+        The OpenAI proxy client.
+    """
+    if LLM_BASE_URL:
+        return OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY)
+    return OpenAIProxy(proxy_client=GenAIHubProxyClient())
+
+
+class TokenEventStream:
+    """IOStream sending the tokens printed by a streamed completion as token events.
+
+    OpenAIClient prints the content deltas of a streamed completion to the default
+    IOStream, wrapped in terminal color codes which are dropped here.
+    """
+
+    def __init__(self, context: ConversationContext):
+        self.context = context
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False):
+        # pylint: disable=unused-argument
+        self.context.raise_if_cancelled()
+        text = sep.join(map(str, objects))
+        if text and not text.startswith("\033["):
+            self.context.emit("token", content=text)
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        raise NotImplementedError("A streamed conversation does not take human input.")
 
 
 class AICoreClient(OpenAIClient):
     """Gen AI Hub Core Client
 
+    The messages are compacted to the "context_budget" of the agent's llm config.
+    Completions are served from the completion cache unless the llm config of the
+    agent sets "completion_cache" to False or the agent is registered as not cacheable.
+
+    When the conversation is streamed to the client, the completion is requested as
+    a stream and its tokens are sent as token events, unless the llm config sets
+    "stream_tokens" to False. The content of a cached completion is sent as one token
+    event.
+
+    Every completion requested from the LLM is tracked with its latency and token
+    usage, labeled with the agent of the conversation and the model, and recorded on
+    the timeline of the conversation profiler. A conversation over its budget stops
+    before the call, and the call is given the time left in the budget as timeout.
+
+    With LLM_CASSETTE_MODE set, the completions are recorded to or replayed from the
+    cassette, see completion_cassette. Replayed completions are not tracked as LLM calls.
+
     Arguments:
         OpenAIClient -- Extends OpenAIClient
     """
 
     def __init__(self, kwargs, client: OpenAI | None = None):
         if client is None:
-            client = OpenAIProxy(proxy_client=GenAIHubProxyClient())
+            client = get_openai_proxy_client()
 
         super().__init__(client)
+        self.completion_cache = completion_cache if kwargs.get("completion_cache", True) else None
+        self.context_budget = ContextBudget.from_config(
+            kwargs.get("context_budget"), model=kwargs.get("model", "gpt-4o")
+        )
+        self.stream_tokens = kwargs.get("stream_tokens", True)
 
     def create(self, params: Dict[str, Any]) -> ChatCompletion:
         params.pop("model_client_cls", None)
-        return super().create(params)
+        params.pop("completion_cache", None)
+        params.pop("context_budget", None)
+        params.pop("stream_tokens", None)
+
+        if self.context_budget is not None:
+            self.context_budget.apply(params)
+
+        context = get_conversation_context()
+        create = super().create
+        use_cache = self.completion_cache is not None
+        streaming_tokens = False
+        if context is not None:
+            context.raise_if_cancelled()
+            if context.budget is not None:
+                self._apply_budget(context.budget, params)
+            use_cache = use_cache and context.cacheable
+            if context.streaming and self.stream_tokens:
+                params["stream"] = True
+                create = self._streamed_create(context)
+                streaming_tokens = True
+
+        create = self._tracked_create(create, context)
+        if completion_cassette is not None:
+            create = self._replayed_create(create)
+        try:
+            if not use_cache:
+                return create(params)
+
+            created = []
+
+            def create_on_miss() -> ChatCompletion:
+                created.append(True)
+                return create(params)
+
+            response = self.completion_cache.get_or_create(params, create_on_miss)
+            if streaming_tokens and not created:
+                # A cached completion was not streamed, its content is sent at once.
+                self._emit_tokens(context, response)
+            return response
+        except APITimeoutError:
+            if context is not None and context.budget is not None:
+                # The call was given the time left, it ran out with it.
+                context.budget.check()
+            raise
+
+    @staticmethod
+    def _emit_tokens(context: ConversationContext, response: ChatCompletion):
+        """Sends the content of a completion which was not streamed as one token event.
+
+        Arguments:
+            context -- The streamed conversation.
+            response -- The completion, e.g. served from the completion cache.
+        """
+        for choice in response.choices:
+            if choice.message.content:
+                context.emit("token", content=choice.message.content)
+
+    @staticmethod
+    def _apply_budget(budget: ConversationBudget, params: Dict[str, Any]):
+        """Stops the conversation before the call if it is over its budget.
+
+        Otherwise the call is given the seconds left as its timeout.
+
+        Arguments:
+            budget -- The budget of the conversation.
+            params -- The completion request parameters.
+
+        Raises:
+            ConversationBudgetExceededError: If the time or the tokens are spent.
+        """
+        budget.check()
+        remaining = budget.remaining_seconds()
+        if remaining is not None:
+            params["timeout"] = min(params.get("timeout") or remaining, remaining)
+
+    @staticmethod
+    def _tracked_create(create, context: ConversationContext | None):
+        """Returns the create function tracking the latency and tokens of the completion.
+
+        They are also recorded on the timeline of the conversation, if it is profiled,
+        and the tokens are spent from the budget of the conversation.
+        """
+        agent_name = context.agent_name if context is not None else None
+        timeline = get_conversation_timeline()
+        budget = context.budget if context is not None else None
+
+        def tracked_create(params: Dict[str, Any]) -> ChatCompletion:
+            start_time = time.perf_counter()
+            outcome = "failed"
+            usage = None
+            try:
+                response = create(params)
+                outcome = "ok"
+                usage = response.usage
+                return response
+            except ConversationCancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                duration_ms = (time.perf_counter() - start_time) * 1000
+                agent_observability_mas.track_llm_call(
+                    agent_name, params.get("model"), outcome, duration_ms, usage=usage
+                )
+                if timeline is not None:
+                    timeline.record_llm_call(duration_ms, usage=usage)
+                if budget is not None:
+                    budget.add_usage(usage)
+
+        return tracked_create
+
+    @staticmethod
+    def _replayed_create(create):
+        """Returns the create function replaying the completion from the cassette."""
+
+        def replayed_create(params: Dict[str, Any]) -> ChatCompletion:
+            return completion_cassette.play(params, lambda: create(params))
+
+        return replayed_create
+
+    def _streamed_create(self, context: ConversationContext):
+        """Returns the create function of OpenAIClient printing the tokens as events."""
+        create = super().create
+
+        def streamed_create(params: Dict[str, Any]) -> ChatCompletion:
+            with IOStream.set_default(TokenEventStream(context)):
+                return create(params)
+
+        return streamed_create
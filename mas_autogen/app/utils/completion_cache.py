@@ -0,0 +1,414 @@
+"""This module caches LLM chat completions.
+
+Completions are looked up by an exact key, the SHA-256 hash of the canonical request.
+Optionally a similarity tier reuses the completion of an earlier request which differs
+only in the wording of the last user message, when the embeddings of both messages are
+close enough. Entries expire after a TTL and the least recently used entries are evicted.
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List
+from cachetools import TTLCache
+from loguru import logger
+from openai.types.chat import ChatCompletion
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    COMPLETION_CACHE_BACKEND,
+    COMPLETION_CACHE_EMBEDDING_MODEL,
+    COMPLETION_CACHE_MAX_SIZE,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_SIMILARITY_THRESHOLD,
+    COMPLETION_CACHE_TTL,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+# Request parameters which do not change the completion.
+IGNORED_PARAMETERS = frozenset(
+    {
+        "stream",
+        "timeout",
+        "model_client_cls",
+        "completion_cache",
+        "context_budget",
+        "stream_tokens",
+    }
+)
+
+# Truncated or filtered completions are not cached.
+CACHEABLE_FINISH_REASONS = frozenset({"stop", "tool_calls", "function_call"})
+
+
+def _hash(payload: Any) -> str:
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _canonical(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in params.items() if k not in IGNORED_PARAMETERS}
+
+
+def completion_key(params: Dict[str, Any]) -> str:
+    """Returns the exact match key of a completion request.
+
+    Arguments:
+        params -- The completion request parameters.
+
+    Returns:
+        The SHA-256 hex digest of the canonical request.
+    """
+    return _hash(_canonical(params))
+
+
+class _EvictionCountingTTLCache(TTLCache):
+    """TTL cache reporting its evictions. Expired entries are not counted."""
+
+    def __init__(self, maxsize: int, ttl: float, on_evict: Callable[[], None]):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+class MemoryCompletionBackend:
+    """In-process TTL and LRU bounded completion store."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        """Creates the store.
+
+        Arguments:
+            name -- The cache name used in metrics.
+            ttl -- Seconds an entry is kept.
+            maxsize -- Maximum number of entries.
+        """
+        self.name = name
+        self._entries = _EvictionCountingTTLCache(maxsize, ttl, self._on_evict)
+        self._lock = threading.Lock()
+
+    def _on_evict(self):
+        agent_observability_mas.track_cache_eviction(self.name)
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCompletionBackend:
+    """On-disk completion store which survives restarts."""
+
+    def __init__(self, name: str, ttl: float, maxsize: int, path: str):
+        """Creates the store and its table if missing.
+
+        Arguments:
+            name -- The cache name used in metrics.
+            ttl -- Seconds an entry is kept.
+            maxsize -- Maximum number of entries.
+            path -- The SQLite database file.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path
+        self._connect()
+        # A SQLite connection must not be used across fork, e.g. by the server workers.
+        os.register_at_fork(after_in_child=self._connect)
+
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at)"
+        )
+
+    def _connect(self):
+        """Opens the connection of this process."""
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM completions WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?)", (key, value, now, now)
+            )
+            self._connection.execute(
+                "DELETE FROM completions WHERE created_at <= ?", (now - self.ttl,)
+            )
+            evicted = self._connection.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            ).rowcount
+
+        for _ in range(max(0, evicted)):
+            agent_observability_mas.track_cache_eviction(self.name)
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM completions")
+
+
+class CompletionCache:
+    """Exact match completion cache with an optional similarity tier."""
+
+    def __init__(
+        self,
+        name: str,
+        backend,
+        similarity_threshold: float = 0,
+        embed: Callable[[str], List[float]] | None = None,
+        similarity_max_entries: int = 64,
+    ):
+        """Creates the cache.
+
+        Arguments:
+            name -- The cache name used in metrics.
+            backend -- The completion store.
+
+        Keyword Arguments:
+            similarity_threshold -- Minimum cosine similarity of a similar hit (default: {0} off)
+            embed -- Returns the embedding of a text (default: {None} disables the tier)
+            similarity_max_entries -- Embeddings kept per conversation prefix (default: {64})
+        """
+        self.name = name
+        self.backend = backend
+        self.similarity_threshold = similarity_threshold if embed else 0
+        self.embed = embed
+        self.similarity_max_entries = similarity_max_entries
+        self._similarity_index = OrderedDict()
+        self._similarity_lock = threading.Lock()
+
+    def key(self, params: Dict[str, Any]) -> str:
+        """Returns the exact match key of a completion request, see completion_key."""
+        return completion_key(params)
+
+    @staticmethod
+    def is_cacheable(params: Dict[str, Any]) -> bool:
+        """Multi-choice completions are not cached.
+
+        Streamed completions are, OpenAIClient assembles the chunks into one completion.
+        """
+        return params.get("n", 1) == 1
+
+    def _similarity_prompt(self, params: Dict[str, Any]) -> tuple | None:
+        """Splits a request into the hash of its prefix and its last user message.
+
+        Returns:
+            The prefix hash and the user message, or None if the request does not end
+            with a user text message.
+        """
+        messages = params.get("messages") or []
+        if not messages or messages[-1].get("role") != "user":
+            return None
+        content = messages[-1].get("content")
+        if not isinstance(content, str) or not content.strip():
+            return None
+
+        prefix = _canonical(params)
+        prefix["messages"] = list(messages[:-1]) + [{**messages[-1], "content": None}]
+        return _hash(prefix), content
+
+    def _find_similar(self, prefix: str, vector: List[float]) -> str | None:
+        with self._similarity_lock:
+            candidates = list(self._similarity_index.get(prefix, ()))
+
+        best_key, best_score = None, self.similarity_threshold
+        for candidate_vector, candidate_key in candidates:
+            score = sum(a * b for a, b in zip(vector, candidate_vector))
+            if score >= best_score:
+                best_key, best_score = candidate_key, score
+        return best_key
+
+    def _remember_similar(self, prefix: str, vector: List[float], key: str):
+        with self._similarity_lock:
+            entries = self._similarity_index.pop(prefix, None)
+            if entries is None:
+                entries = deque(maxlen=self.similarity_max_entries)
+            entries.append((vector, key))
+            self._similarity_index[prefix] = entries
+            while len(self._similarity_index) > self.similarity_max_entries:
+                self._similarity_index.popitem(last=False)
+
+    def _embed(self, text: str) -> List[float] | None:
+        try:
+            vector = self.embed(text)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Embedding for the '{self.name}' cache failed: {e}")
+            return None
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _backend_get(self, key: str) -> ChatCompletion | None:
+        try:
+            value = self.backend.get(key)
+            return ChatCompletion.model_validate_json(value) if value is not None else None
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Reading the '{self.name}' cache failed: {e}")
+            return None
+
+    def _backend_set(self, key: str, response: ChatCompletion):
+        try:
+            self.backend.set(key, response.model_dump_json())
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning(f"Writing the '{self.name}' cache failed: {e}")
+
+    def get_or_create(
+        self, params: Dict[str, Any], create: Callable[[], ChatCompletion]
+    ) -> ChatCompletion:
+        """Returns the cached completion of the request or creates it.
+
+        Arguments:
+            params -- The completion request parameters.
+            create -- Creates the completion on a miss.
+
+        Returns:
+            The completion.
+        """
+        if not self.is_cacheable(params):
+            return create()
+
+        key = self.key(params)
+        response = self._backend_get(key)
+        if response is not None:
+            agent_observability_mas.track_cache(self.name, "hit")
+            return response
+
+        similarity_prompt = self._similarity_prompt(params) if self.similarity_threshold else None
+        vector = None
+        if similarity_prompt is not None:
+            prefix, user_message = similarity_prompt
+            vector = self._embed(user_message)
+            similar_key = self._find_similar(prefix, vector) if vector is not None else None
+            response = self._backend_get(similar_key) if similar_key is not None else None
+            if response is not None:
+                agent_observability_mas.track_cache(self.name, "similar")
+                return response
+
+        agent_observability_mas.track_cache(self.name, "miss")
+        response = create()
+        finish_reasons = {choice.finish_reason for choice in response.choices}
+        if finish_reasons and finish_reasons <= CACHEABLE_FINISH_REASONS:
+            self._backend_set(key, response)
+            if vector is not None:
+                self._remember_similar(similarity_prompt[0], vector, key)
+        return response
+
+    def clear(self):
+        """Removes all entries."""
+        self.backend.clear()
+        with self._similarity_lock:
+            self._similarity_index.clear()
+
+
+def embed_with_proxy(text: str) -> List[float]:
+    """Returns the embedding of a text from the AI Core proxy.
+
+    Arguments:
+        text -- The text.
+
+    Returns:
+        The embedding.
+    """
+    # Imported here as aicoreclient imports this module.
+    from mas_autogen.app.utils.aicoreclient import (  # pylint: disable=import-outside-toplevel
+        get_openai_proxy_client,
+    )
+
+    response = get_openai_proxy_client().embeddings.create(
+        model=COMPLETION_CACHE_EMBEDDING_MODEL, input=text
+    )
+    return response.data[0].embedding
+
+
+def create_completion_cache() -> CompletionCache | None:
+    """Creates the completion cache configured by the environment.
+
+    Returns:
+        The completion cache, or None if COMPLETION_CACHE_BACKEND is 'none'.
+    """
+    if COMPLETION_CACHE_BACKEND == "none":
+        return None
+
+    name = "completion"
+    if COMPLETION_CACHE_BACKEND == "sqlite":
+        backend = SqliteCompletionBackend(
+            name, COMPLETION_CACHE_TTL, COMPLETION_CACHE_MAX_SIZE, COMPLETION_CACHE_PATH
+        )
+    elif COMPLETION_CACHE_BACKEND == "memory":
+        backend = MemoryCompletionBackend(name, COMPLETION_CACHE_TTL, COMPLETION_CACHE_MAX_SIZE)
+    else:
+        raise ValueError(
+            f"Unknown COMPLETION_CACHE_BACKEND '{COMPLETION_CACHE_BACKEND}', "
+            "expected memory, sqlite or none."
+        )
+
+    return CompletionCache(
+        name,
+        backend,
+        similarity_threshold=COMPLETION_CACHE_SIMILARITY_THRESHOLD,
+        embed=embed_with_proxy if COMPLETION_CACHE_SIMILARITY_THRESHOLD > 0 else None,
+    )
+
+
+completion_cache = create_completion_cache()
+
+
+def create_cached_completion(create: Callable[..., ChatCompletion], **params) -> ChatCompletion:
+    """Creates a chat completion through the completion cache and the cassette, if configured.
+
+    Arguments:
+        create -- The completion create function, e.g. chat.completions.create.
+
+    Returns:
+        The completion.
+    """
+    # Imported here as completion_cassette imports this module.
+    # pylint: disable-next=import-outside-toplevel
+    from mas_autogen.app.utils.completion_cassette import completion_cassette
+
+    def create_completion() -> ChatCompletion:
+        if completion_cassette is None:
+            return create(**params)
+        return completion_cassette.play(params, lambda: create(**params))
+
+    if completion_cache is None:
+        return create_completion()
+    return completion_cache.get_or_create(params, create_completion)
@@ -0,0 +1,164 @@
+"""This module records LLM chat completions to a cassette and replays them.
+
+A cassette is a JSONL file with one completion per line, keyed by the hash of its
+canonical request, the exact match key of the completion cache. It is loaded into
+a request hash index in memory, so replayed completions cost no LLM call and no
+disk access. The modes of LLM_CASSETTE_MODE are:
+
+- record -- every completion is requested from the LLM and appended to the cassette.
+- replay -- every completion comes from the cassette, a request which was not
+  recorded fails with CassetteMissError. No LLM is called.
+- auto -- recorded requests are replayed, the others are requested and recorded.
+- off -- no cassette.
+
+A conversation replays as long as its requests are the same as when it was
+recorded, which also needs the same tool results. The finance data is local, the
+weather API results are not and change the prompts after the weather lookup.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Callable, Dict
+from loguru import logger
+from openai.types.chat import ChatCompletion
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.completion_cache import completion_key
+from mas_autogen.app.utils.config import LLM_CASSETTE_MODE, LLM_CASSETTE_PATH
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+CASSETTE_MODES = ("off", "record", "replay", "auto")
+
+
+class CassetteMissError(Exception):
+    """Raised in replay mode for a completion request which was not recorded."""
+
+
+class CompletionCassette:
+    """Append-only store of recorded completions with an in-memory request hash index."""
+
+    def __init__(self, path: str, mode: str = "auto"):
+        """Opens the cassette and loads its completions.
+
+        Arguments:
+            path -- The cassette JSONL file, created on the first recording.
+
+        Keyword Arguments:
+            mode -- One of record, replay or auto (default: {"auto"})
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in CASSETTE_MODES[1:]:
+            raise ValueError(f"Cassette mode must be one of {CASSETTE_MODES[1:]}, not '{mode}'.")
+        self.path = path
+        self.mode = mode
+        self._index: Dict[str, ChatCompletion] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _load(self):
+        """Reads the recorded completions, a later recording of a request wins."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    self._index[record["key"]] = ChatCompletion.model_validate(record["response"])
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(f"Skipping line {line_number} of cassette {self.path}: {e}")
+        logger.info(f"Loaded {len(self._index)} completions from cassette {self.path}.")
+
+    def replay(self, params: Dict[str, Any]) -> ChatCompletion | None:
+        """Returns the recorded completion of a request.
+
+        Arguments:
+            params -- The completion request parameters.
+
+        Raises:
+            CassetteMissError: In replay mode, if the request was not recorded.
+
+        Returns:
+            The recorded completion, None if it has to be requested.
+        """
+        if self.mode == "record":
+            return None
+        key = completion_key(params)
+        response = self._index.get(key)
+        agent_observability_mas.track_cache("cassette", "hit" if response is not None else "miss")
+        if response is None and self.mode == "replay":
+            raise CassetteMissError(
+                f"No completion recorded for request {key[:12]} in cassette {self.path}."
+            )
+        return response
+
+    def record(self, params: Dict[str, Any], response: ChatCompletion) -> ChatCompletion:
+        """Appends a completion to the cassette.
+
+        Arguments:
+            params -- The completion request parameters.
+            response -- The completion.
+
+        Returns:
+            The completion.
+        """
+        key = completion_key(params)
+        line = json.dumps(
+            {
+                "key": key,
+                "model": params.get("model"),
+                "response": response.model_dump(mode="json", exclude_none=True),
+            },
+            separators=(",", ":"),
+        )
+        with self._lock:
+            self._index[key] = response
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # One write per line, so the server workers can append to the same cassette.
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        return response
+
+    def play(self, params: Dict[str, Any], create: Callable[[], ChatCompletion]) -> ChatCompletion:
+        """Replays the completion of a request or creates and records it.
+
+        Arguments:
+            params -- The completion request parameters.
+            create -- Requests the completion from the LLM.
+
+        Raises:
+            CassetteMissError: In replay mode, if the request was not recorded.
+
+        Returns:
+            The completion.
+        """
+        response = self.replay(params)
+        if response is not None:
+            return response
+        return self.record(params, create())
+
+
+def create_completion_cassette() -> CompletionCassette | None:
+    """Creates the cassette configured by the environment.
+
+    Raises:
+        ValueError: If LLM_CASSETTE_MODE is unknown.
+
+    Returns:
+        The cassette, or None if LLM_CASSETTE_MODE is 'off'.
+    """
+    if LLM_CASSETTE_MODE == "off":
+        return None
+    return CompletionCassette(LLM_CASSETTE_PATH, mode=LLM_CASSETTE_MODE)
+
+
+completion_cassette = create_completion_cassette()
@@ -26,3 +26,111 @@ WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
 
 # API URLS
 WEATHER_API_URL = os.getenv("WEATHER_API_URL")
+
+# LLM endpoint, an OpenAI compatible server used instead of the AI Core proxy when set
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_API_KEY = os.getenv("LLM_API_KEY", "unused")
+
+# Server
+SERVER_WORKERS = os.getenv("SERVER_WORKERS", "1").lower()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+
+# Telemetry
+TELEMETRY_PROFILE = os.getenv("TELEMETRY_PROFILE", "development").lower()
+TELEMETRY_OTLP_ENDPOINT = os.getenv("TELEMETRY_OTLP_ENDPOINT", "http://localhost:4327")
+TELEMETRY_OTLP_INSECURE = os.getenv("TELEMETRY_OTLP_INSECURE", "true").lower() == "true"
+TELEMETRY_TRACE_SAMPLE_RATIO = float(os.getenv("TELEMETRY_TRACE_SAMPLE_RATIO", "1"))
+TELEMETRY_TAIL_SAMPLE_RATIO = float(os.getenv("TELEMETRY_TAIL_SAMPLE_RATIO", "1"))
+TELEMETRY_TAIL_LATENCY_MS = float(os.getenv("TELEMETRY_TAIL_LATENCY_MS", "2000"))
+TELEMETRY_TAIL_MAX_TRACES = int(os.getenv("TELEMETRY_TAIL_MAX_TRACES", "1024"))
+TELEMETRY_SPAN_QUEUE_SIZE = int(os.getenv("TELEMETRY_SPAN_QUEUE_SIZE", "2048"))
+TELEMETRY_SPAN_BATCH_SIZE = int(os.getenv("TELEMETRY_SPAN_BATCH_SIZE", "512"))
+TELEMETRY_EXPORT_INTERVAL_MS = int(os.getenv("TELEMETRY_EXPORT_INTERVAL_MS", "5000"))
+
+# Agent pool
+AGENT_POOL_MAX_SIZE = int(os.getenv("AGENT_POOL_MAX_SIZE", "4"))
+AGENT_POOL_WARM_UP_SIZE = int(os.getenv("AGENT_POOL_WARM_UP_SIZE", "1"))
+AGENT_POOL_CHECKOUT_TIMEOUT = float(os.getenv("AGENT_POOL_CHECKOUT_TIMEOUT", "30"))
+
+# Chat execution
+CHAT_EXECUTION_MODE = os.getenv("CHAT_EXECUTION_MODE", "thread").lower()
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+CHAT_MAX_QUEUE_SIZE = int(os.getenv("CHAT_MAX_QUEUE_SIZE", "32"))
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "180"))
+CHAT_STREAM_HEARTBEAT_INTERVAL = float(os.getenv("CHAT_STREAM_HEARTBEAT_INTERVAL", "15"))
+
+# Conversation budgets, the defaults of the agents, 0 turns a limit off
+CONVERSATION_MAX_DURATION = float(os.getenv("CONVERSATION_MAX_DURATION", "120"))
+CONVERSATION_MAX_TOKENS = int(os.getenv("CONVERSATION_MAX_TOKENS", "100000"))
+CONVERSATION_MAX_ROUNDS = int(os.getenv("CONVERSATION_MAX_ROUNDS", "16"))
+CONVERSATION_MAX_REPEATS = int(os.getenv("CONVERSATION_MAX_REPEATS", "2"))
+
+# Chat coalescing
+CHAT_COALESCING = os.getenv("CHAT_COALESCING", "true").lower() in ("1", "true", "yes")
+CHAT_RESULT_CACHE_TTL = float(os.getenv("CHAT_RESULT_CACHE_TTL", "0"))
+CHAT_RESULT_CACHE_MAX_SIZE = int(os.getenv("CHAT_RESULT_CACHE_MAX_SIZE", "1024"))
+
+# Batch chat
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+BATCH_PROGRESS_INTERVAL = int(os.getenv("BATCH_PROGRESS_INTERVAL", "100"))
+
+# Finance data
+FINANCE_DATA_RELOAD_INTERVAL = float(os.getenv("FINANCE_DATA_RELOAD_INTERVAL", "1"))
+FINANCE_INVOICE_STORE = os.getenv("FINANCE_INVOICE_STORE", "auto").lower()
+
+# Weather cache
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "600"))
+WEATHER_CACHE_MAX_SIZE = int(os.getenv("WEATHER_CACHE_MAX_SIZE", "1024"))
+
+# Weather API client
+WEATHER_API_TIMEOUT = float(os.getenv("WEATHER_API_TIMEOUT", "5"))
+WEATHER_API_MAX_RETRIES = int(os.getenv("WEATHER_API_MAX_RETRIES", "2"))
+WEATHER_API_BACKOFF_BASE = float(os.getenv("WEATHER_API_BACKOFF_BASE", "0.2"))
+WEATHER_API_BACKOFF_MAX = float(os.getenv("WEATHER_API_BACKOFF_MAX", "2"))
+WEATHER_API_POOL_SIZE = int(os.getenv("WEATHER_API_POOL_SIZE", "10"))
+WEATHER_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("WEATHER_CIRCUIT_FAILURE_THRESHOLD", "5"))
+WEATHER_CIRCUIT_RESET_TIMEOUT = float(os.getenv("WEATHER_CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Completion cache
+COMPLETION_CACHE_BACKEND = os.getenv("COMPLETION_CACHE_BACKEND", "none").lower()
+COMPLETION_CACHE_TTL = float(os.getenv("COMPLETION_CACHE_TTL", "3600"))
+COMPLETION_CACHE_MAX_SIZE = int(os.getenv("COMPLETION_CACHE_MAX_SIZE", "2048"))
+COMPLETION_CACHE_PATH = os.getenv("COMPLETION_CACHE_PATH", ".completion_cache/completions.sqlite3")
+COMPLETION_CACHE_SIMILARITY_THRESHOLD = float(
+    os.getenv("COMPLETION_CACHE_SIMILARITY_THRESHOLD", "0")
+)
+COMPLETION_CACHE_EMBEDDING_MODEL = os.getenv(
+    "COMPLETION_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"
+)
+
+# Conversation profiler, also serves /debug/conversations when enabled
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_SLOW_CONVERSATION_MS = float(os.getenv("PROFILER_SLOW_CONVERSATION_MS", "10000"))
+PROFILER_BUFFER_SIZE = int(os.getenv("PROFILER_BUFFER_SIZE", "50"))
+PROFILER_SAMPLING_INTERVAL_MS = float(os.getenv("PROFILER_SAMPLING_INTERVAL_MS", "0"))
+
+# LLM record and replay
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", ".cassettes/completions.jsonl")
+
+# Session store
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory").lower()
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", ".session_store/sessions.sqlite3")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "20"))
+SESSION_MAX_MESSAGE_CHARS = int(os.getenv("SESSION_MAX_MESSAGE_CHARS", "2000"))
+
+# Context budget
+CONTEXT_BUDGET_MAX_PROMPT_TOKENS = int(os.getenv("CONTEXT_BUDGET_MAX_PROMPT_TOKENS", "6000"))
+CONTEXT_BUDGET_MAX_TOOL_RESULT_TOKENS = int(
+    os.getenv("CONTEXT_BUDGET_MAX_TOOL_RESULT_TOKENS", "1000")
+)
+
+# Group chat
+FINANCE_SPEAKER_SELECTION = os.getenv("FINANCE_SPEAKER_SELECTION", "rules").lower()
+
+# Tool execution
+PARALLEL_TOOL_MAX_WORKERS = int(os.getenv("PARALLEL_TOOL_MAX_WORKERS", "8"))
@@ -0,0 +1,273 @@
+"""This module keeps the prompts of the agents within a token budget.
+
+Every round of a conversation resends the full transcript, so the prompt grows with
+each round. Before a completion is created the messages are compacted in two steps:
+
+1. Tool results of earlier rounds larger than max_tool_result_tokens are truncated.
+   The results of the latest round are kept whole, the model is about to use them.
+2. While the prompt exceeds max_prompt_tokens, the oldest turns are dropped. The
+   system messages and the first user message (the task) are always kept, and a
+   tool call is always dropped together with its results so the transcript stays valid.
+"""
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from loguru import logger
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.config import (
+    CONTEXT_BUDGET_MAX_PROMPT_TOKENS,
+    CONTEXT_BUDGET_MAX_TOOL_RESULT_TOKENS,
+)
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+TOOL_RESULT_ROLES = ("tool", "function")
+
+# Rough characters per token when no tiktoken encoding is available.
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Returns the tiktoken encoding of the model, or None if it can not be loaded.
+
+    tiktoken downloads its encodings on first use, which fails without internet access.
+    """
+    try:
+        import tiktoken  # pylint: disable=import-outside-toplevel
+
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(f"Token counts are estimated, no tiktoken encoding for '{model}': {e}")
+        return None
+
+
+def count_text_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Counts the tokens of a text.
+
+    Arguments:
+        text -- The text.
+
+    Keyword Arguments:
+        model -- The model whose tokenizer is used (default: {"gpt-4o"})
+
+    Returns:
+        The number of tokens.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(message: Dict[str, Any], model: str = "gpt-4o") -> int:
+    """Counts the tokens of a chat message including its tool calls.
+
+    Arguments:
+        message -- The chat message.
+
+    Keyword Arguments:
+        model -- The model whose tokenizer is used (default: {"gpt-4o"})
+
+    Returns:
+        The number of tokens.
+    """
+    tokens = 3
+    for value in message.values():
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            value = json.dumps(value, default=str)
+        tokens += count_text_tokens(value, model)
+    return tokens
+
+
+def truncate_text_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """Truncates a text to a number of tokens.
+
+    Arguments:
+        text -- The text.
+        max_tokens -- Tokens to keep.
+
+    Keyword Arguments:
+        model -- The model whose tokenizer is used (default: {"gpt-4o"})
+
+    Returns:
+        The text, truncated with a note of the tokens removed if it was longer.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        removed = count_text_tokens(text, model) - max_tokens
+        kept = text[: max_tokens * CHARS_PER_TOKEN]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        removed = len(tokens) - max_tokens
+        kept = encoding.decode(tokens[:max_tokens])
+
+    if removed <= 0:
+        return text
+    return f"{kept}\n... [{removed} tokens truncated]"
+
+
+@dataclass
+class ContextBudget:
+    """Token budget of the prompts of one agent.
+
+    Arguments:
+        name -- The agent name used in metrics.
+        max_prompt_tokens -- Tokens a prompt may use.
+        max_tool_result_tokens -- Tokens an earlier tool result may use.
+        model -- The model whose tokenizer is used.
+    """
+
+    name: str
+    max_prompt_tokens: int = CONTEXT_BUDGET_MAX_PROMPT_TOKENS
+    max_tool_result_tokens: int = CONTEXT_BUDGET_MAX_TOOL_RESULT_TOKENS
+    model: str = "gpt-4o"
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any] | None, model: str = "gpt-4o"):
+        """Creates the budget from the "context_budget" entry of an llm config.
+
+        Arguments:
+            config -- The budget settings, or None to turn budgeting off.
+
+        Keyword Arguments:
+            model -- The model of the agent (default: {"gpt-4o"})
+
+        Returns:
+            The context budget, or None.
+        """
+        if not config:
+            return None
+        return cls(model=model, **config)
+
+    def _prune_tool_results(self, messages: List[dict]) -> Tuple[List[dict], int]:
+        """Truncates the large tool results of earlier rounds."""
+        latest_round = len(messages)
+        while latest_round > 0 and messages[latest_round - 1].get("role") in TOOL_RESULT_ROLES:
+            latest_round -= 1
+
+        pruned = 0
+        compacted = []
+        for index, message in enumerate(messages):
+            content = message.get("content")
+            if (
+                index < latest_round
+                and message.get("role") in TOOL_RESULT_ROLES
+                and isinstance(content, str)
+                and count_text_tokens(content, self.model) > self.max_tool_result_tokens
+            ):
+                message = {
+                    **message,
+                    "content": truncate_text_to_tokens(
+                        content, self.max_tool_result_tokens, self.model
+                    ),
+                }
+                pruned += 1
+            compacted.append(message)
+        return compacted, pruned
+
+    @staticmethod
+    def _split_turns(messages: List[dict]) -> Tuple[List[dict], List[List[dict]]]:
+        """Splits the messages into the pinned head and the droppable turns.
+
+        The head holds the leading system messages and the first user message. Every
+        other turn is a message together with the tool results answering it.
+        """
+        head_size = 0
+        while head_size < len(messages) and messages[head_size].get("role") == "system":
+            head_size += 1
+        if head_size < len(messages) and messages[head_size].get("role") == "user":
+            head_size += 1
+
+        turns = []
+        for message in messages[head_size:]:
+            if turns and message.get("role") in TOOL_RESULT_ROLES:
+                turns[-1].append(message)
+            else:
+                turns.append([message])
+        return messages[:head_size], turns
+
+    @staticmethod
+    def _omitted_note(dropped_messages: int) -> dict:
+        """Returns the system message standing in for the dropped messages."""
+        return {
+            "role": "system",
+            "content": f"[{dropped_messages} earlier messages omitted to fit the context.]",
+        }
+
+    def compact(self, messages: List[dict]) -> Tuple[List[dict], Dict[str, int]]:
+        """Compacts the messages to fit the budget.
+
+        Arguments:
+            messages -- The chat messages, oldest first.
+
+        Returns:
+            The compacted messages and the statistics of the compaction:
+            original_prompt_tokens, prompt_tokens, pruned_tool_results and dropped_messages.
+        """
+        original_tokens = sum(count_message_tokens(m, self.model) for m in messages)
+        stats = {
+            "original_prompt_tokens": original_tokens,
+            "prompt_tokens": original_tokens,
+            "pruned_tool_results": 0,
+            "dropped_messages": 0,
+        }
+        if original_tokens <= self.max_prompt_tokens:
+            return messages, stats
+
+        messages, stats["pruned_tool_results"] = self._prune_tool_results(messages)
+        head, turns = self._split_turns(messages)
+
+        head_tokens = sum(count_message_tokens(m, self.model) for m in head)
+        turn_tokens = [sum(count_message_tokens(m, self.model) for m in turn) for turn in turns]
+        total = head_tokens + sum(turn_tokens)
+
+        # The latest turn is always kept, the model has to answer it. The note replacing
+        # the dropped turns counts towards the budget as well.
+        dropped_turns = 0
+        dropped_messages = 0
+        note_tokens = 0
+        while total + note_tokens > self.max_prompt_tokens and dropped_turns < len(turns) - 1:
+            total -= turn_tokens[dropped_turns]
+            dropped_messages += len(turns[dropped_turns])
+            dropped_turns += 1
+            note_tokens = count_message_tokens(self._omitted_note(dropped_messages), self.model)
+
+        if dropped_turns:
+            note = self._omitted_note(dropped_messages)
+            total += note_tokens
+            kept = [message for turn in turns[dropped_turns:] for message in turn]
+            messages = head + [note] + kept
+            stats["dropped_messages"] = dropped_messages
+
+        stats["prompt_tokens"] = total
+        return messages, stats
+
+    def apply(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Compacts the messages of a completion request in place and records metrics.
+
+        Arguments:
+            params -- The completion request parameters.
+
+        Returns:
+            The completion request parameters.
+        """
+        messages = params.get("messages")
+        if not messages:
+            return params
+
+        params["messages"], stats = self.compact(messages)
+        agent_observability_mas.track_context_budget(self.name, stats)
+        if stats["prompt_tokens"] < stats["original_prompt_tokens"]:
+            logger.debug(
+                f"Compacted '{self.name}' prompt from {stats['original_prompt_tokens']} "
+                f"to {stats['prompt_tokens']} tokens."
+            )
+        return params
@@ -0,0 +1,152 @@
+"""This module holds the budget limiting what a conversation may spend.
+
+A conversation gets the budget of its agent type when the request starts, and is
+stopped when it hits one of the limits, 0 turns a limit off:
+
+- wall_time -- the seconds since the request started, including the time queued.
+  The LLM calls get the remaining seconds as their timeout. The limit stays below
+  the request timeout of the agent, see max_duration_within.
+- tokens -- the prompt and completion tokens of the LLM calls.
+- rounds -- the messages the agents sent.
+- repetition -- the times an agent sends the same message, an early sign of a loop.
+
+The budget is checked before every LLM call and every agent message, the points
+where a conversation can stop, and the conversation answers with the best partial
+answer so far instead, see SuperAgent.start_chat.
+"""
+
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict
+from mas_autogen.app.utils.config import (
+    CONVERSATION_MAX_DURATION,
+    CONVERSATION_MAX_REPEATS,
+    CONVERSATION_MAX_ROUNDS,
+    CONVERSATION_MAX_TOKENS,
+)
+
+# Seconds between the wall time limit and the request timeout, to answer with what
+# the conversation has before the request fails. At most a quarter of the timeout.
+TIMEOUT_MARGIN = 5.0
+
+
+class ConversationBudgetExceededError(Exception):
+    """Raised inside a conversation which hit a limit of its budget."""
+
+    def __init__(self, limit: str, detail: str, pending_message: Dict | None = None):
+        """Creates the error.
+
+        Arguments:
+            limit -- One of wall_time, tokens, rounds or repetition.
+            detail -- What was spent.
+
+        Keyword Arguments:
+            pending_message -- The message held back by the limit (default: {None})
+        """
+        super().__init__(f"Conversation budget exceeded ({limit}): {detail}.")
+        self.limit = limit
+        self.pending_message = pending_message
+
+
+def max_duration_within(max_duration: float, timeout: float) -> float:
+    """Returns the wall time limit of a conversation which must answer within a timeout.
+
+    Arguments:
+        max_duration -- The configured limit in seconds, 0 for none.
+        timeout -- The request timeout in seconds, 0 for none.
+
+    Returns:
+        The limit, capped to end TIMEOUT_MARGIN seconds before the timeout.
+    """
+    if not timeout or timeout <= 0:
+        return max_duration
+    deadline = timeout - min(TIMEOUT_MARGIN, timeout / 4)
+    return min(max_duration, deadline) if max_duration else deadline
+
+
+def _fingerprint(sender: str, message: Dict[str, Any]) -> str:
+    """Returns what makes a message the same as another: its text and the functions called."""
+    calls = [message.get("function_call")] + [
+        call.get("function") for call in message.get("tool_calls") or []
+    ]
+    called = [f"{call.get('name')}({call.get('arguments')})" for call in calls if call]
+    text = re.sub(r"\s+", " ", str(message.get("content") or "")).strip().lower()
+    return f"{sender}|{text}|{';'.join(called)}"
+
+
+@dataclass
+class ConversationBudget:
+    """The limits of a conversation and what it spent so far.
+
+    Arguments:
+        max_duration -- Seconds the conversation may take.
+        max_tokens -- Tokens of the LLM calls.
+        max_rounds -- Messages the agents may send.
+        max_repeats -- Times an agent may send the same message.
+    """
+
+    max_duration: float = CONVERSATION_MAX_DURATION
+    max_tokens: int = CONVERSATION_MAX_TOKENS
+    max_rounds: int = CONVERSATION_MAX_ROUNDS
+    max_repeats: int = CONVERSATION_MAX_REPEATS
+    tokens: int = 0
+    started: float = field(default_factory=time.monotonic)
+    _messages: Counter = field(default_factory=Counter, repr=False)
+
+    def remaining_seconds(self) -> float | None:
+        """Returns the seconds left, None without a wall time limit."""
+        if not self.max_duration:
+            return None
+        return max(0.0, self.max_duration - (time.monotonic() - self.started))
+
+    def add_usage(self, usage: Any):
+        """Adds the tokens of an LLM call.
+
+        Arguments:
+            usage -- The usage of the completion, may be None.
+        """
+        if usage is not None:
+            self.tokens += (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+
+    def check(self, pending_message: Dict | None = None):
+        """Stops the conversation if it is out of time or tokens.
+
+        Keyword Arguments:
+            pending_message -- The message about to be sent (default: {None})
+
+        Raises:
+            ConversationBudgetExceededError: If the time or the tokens are spent.
+        """
+        if self.remaining_seconds() == 0.0:
+            raise ConversationBudgetExceededError(
+                "wall_time", f"{self.max_duration:g} seconds", pending_message
+            )
+        if self.max_tokens and self.tokens >= self.max_tokens:
+            raise ConversationBudgetExceededError(
+                "tokens", f"{self.tokens} of {self.max_tokens} tokens", pending_message
+            )
+
+    def check_message(self, sender: str, message: Dict[str, Any], rounds: int):
+        """Stops the conversation before an agent message which exceeds the budget.
+
+        Arguments:
+            sender -- The agent sending the message.
+            message -- The message.
+            rounds -- The messages the agents sent before.
+
+        Raises:
+            ConversationBudgetExceededError: If a limit is hit, with the message.
+        """
+        self.check(pending_message=message)
+        if self.max_rounds and rounds >= self.max_rounds:
+            raise ConversationBudgetExceededError(
+                "rounds", f"{rounds} of {self.max_rounds} messages", message
+            )
+        fingerprint = _fingerprint(sender, message)
+        self._messages[fingerprint] += 1
+        if self.max_repeats and self._messages[fingerprint] > self.max_repeats:
+            raise ConversationBudgetExceededError(
+                "repetition", f"{sender} sent the same message {self.max_repeats + 1} times"
+            )
@@ -0,0 +1,111 @@
+"""This module holds the context of the conversation running in the current thread or task.
+
+The context is a context variable, so it follows the conversation into the chat
+executor threads and asyncio tasks and lets tool functions see the session of the
+request without passing it through the agents.
+
+A streamed request also sets an event sink on the context, which receives the
+agent messages, tool results and completion tokens of the conversation, and
+cancels the conversation through it when the client goes away. The budget of the
+conversation is checked at the same points where a cancelled conversation stops.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List
+from mas_autogen.app.utils.conversation_budget import ConversationBudget
+
+
+class ConversationCancelledError(Exception):
+    """Raised inside a conversation whose request was cancelled."""
+
+
+@dataclass
+class ConversationContext:
+    """The request level state of a running conversation.
+
+    Arguments:
+        session_id -- The session id of the request.
+        agent_name -- The requested agent.
+        session_history -- Earlier turns of the session, oldest first.
+        cacheable -- Whether the completions may be served from the completion cache.
+        event_sink -- Receives the events of a streamed conversation, None otherwise.
+        cancelled -- Set when the conversation has to stop.
+        rounds -- Messages the agents sent so far.
+        budget -- The limits of the conversation, None for no limits.
+    """
+
+    session_id: str | None = None
+    agent_name: str | None = None
+    session_history: List[dict] = field(default_factory=list)
+    cacheable: bool = True
+    event_sink: Callable[[Dict[str, Any]], None] | None = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    rounds: int = 0
+    budget: ConversationBudget | None = None
+
+    def user_messages(self) -> List[str]:
+        """Returns the earlier user messages of the session, oldest first."""
+        return [turn["content"] for turn in self.session_history if turn.get("role") == "user"]
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the events of the conversation are streamed to the client."""
+        return self.event_sink is not None
+
+    def emit(self, event_type: str, **data):
+        """Sends an event to the event sink of a streamed conversation.
+
+        Arguments:
+            event_type -- The event type, e.g. "message", "tool_result" or "token".
+
+        Keyword Arguments:
+            data -- The event payload.
+        """
+        if self.event_sink is not None:
+            self.event_sink({"event": event_type, **data})
+
+    def cancel(self):
+        """Asks the conversation to stop at its next agent message or LLM call."""
+        self.cancelled.set()
+
+    def raise_if_cancelled(self):
+        """Stops the conversation if it was cancelled.
+
+        Raises:
+            ConversationCancelledError: If the conversation was cancelled.
+        """
+        if self.cancelled.is_set():
+            raise ConversationCancelledError(
+                f"Conversation of session '{self.session_id}' was cancelled."
+            )
+
+
+_current_conversation: ContextVar[ConversationContext | None] = ContextVar(
+    "current_conversation", default=None
+)
+
+
+def get_conversation_context() -> ConversationContext | None:
+    """Returns the context of the current conversation, if any."""
+    return _current_conversation.get()
+
+
+@contextmanager
+def conversation_context(**kwargs) -> Iterator[ConversationContext]:
+    """Context manager making a new conversation context current.
+
+    Keyword Arguments:
+        kwargs -- The ConversationContext fields.
+
+    Yields:
+        The conversation context.
+    """
+    context = ConversationContext(**kwargs)
+    token = _current_conversation.set(context)
+    try:
+        yield context
+    finally:
+        _current_conversation.reset(token)
@@ -0,0 +1,317 @@
+"""This module records the timeline of the conversations to find where a slow one spent its time.
+
+SuperAgent.start_chat profiles the conversation it runs. The LLM calls of
+AICoreClient and the tool functions record their time and the tokens on the
+timeline of the current conversation, and every agent message closes a round of
+the timeline, attributed to the agent which sent it. A round reports:
+
+- llm_ms -- the time waited for completions, e.g. of the speaker selection and the reply.
+- tool_ms -- the time of the tool functions, including their API calls and data loading.
+- other_ms -- the rest, the time of autogen and the agents themselves.
+
+The timelines of the recent slow or failed conversations, including those stopped
+by their budget, are kept in a ring buffer served by /debug/conversations. With
+PROFILER_SAMPLING_INTERVAL_MS set, a sampling profiler also records the stacks of
+the conversation threads, and the timeline of a slow conversation gets its most
+frequent stacks. Each server process keeps its own buffer.
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List
+from mas_autogen.app.utils.config import (
+    PROFILER_BUFFER_SIZE,
+    PROFILER_ENABLED,
+    PROFILER_SAMPLING_INTERVAL_MS,
+    PROFILER_SLOW_CONVERSATION_MS,
+)
+from mas_autogen.app.utils.conversation_budget import ConversationBudgetExceededError
+from mas_autogen.app.utils.conversation_context import ConversationCancelledError
+
+# Deepest stack recorded by the sampling profiler, and the stacks kept per timeline.
+MAX_STACK_DEPTH = 64
+MAX_PROFILE_STACKS = 25
+
+
+@dataclass
+class TimelineRound:
+    """The calls made in a round of a conversation, until its agent sent its message."""
+
+    start_ms: float
+    speaker: str | None = None
+    duration_ms: float = 0.0
+    llm_calls: int = 0
+    llm_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tool_calls: List[dict] = field(default_factory=list)
+    tool_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the round with its time outside of LLM and tool calls."""
+        return {
+            "speaker": self.speaker,
+            "start_ms": round(self.start_ms, 1),
+            "duration_ms": round(self.duration_ms, 1),
+            "llm_calls": self.llm_calls,
+            "llm_ms": round(self.llm_ms, 1),
+            "tool_ms": round(self.tool_ms, 1),
+            "other_ms": round(max(0.0, self.duration_ms - self.llm_ms - self.tool_ms), 1),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tool_calls": self.tool_calls,
+        }
+
+
+class ConversationTimeline:
+    """The rounds of a conversation with their LLM and tool calls."""
+
+    def __init__(self, agent_name: str | None, session_id: str | None, thread_id: int | None):
+        """Starts the timeline.
+
+        Arguments:
+            agent_name -- The agent of the conversation.
+            session_id -- The session id of the request.
+            thread_id -- The thread running the conversation, None if it is not sampled.
+        """
+        self.conversation_id = uuid.uuid4().hex[:16]
+        self.agent_name = agent_name
+        self.session_id = session_id
+        self.thread_id = thread_id
+        self.started_at = time.time()
+        self.outcome = "running"
+        self.duration_ms = 0.0
+        self.rounds: List[TimelineRound] = []
+        self.samples: Counter = Counter()
+        self._start = time.perf_counter()
+        self._round = TimelineRound(start_ms=0.0)
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def record_llm_call(self, duration_ms: float, usage: Any = None):
+        """Adds a completion to the current round.
+
+        Arguments:
+            duration_ms -- The time waited for the completion.
+
+        Keyword Arguments:
+            usage -- The token usage of the completion (default: {None})
+        """
+        with self._lock:
+            self._round.llm_calls += 1
+            self._round.llm_ms += duration_ms
+            if usage is not None:
+                self._round.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+                self._round.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    def record_tool_call(self, tool_name: str, outcome: str, duration_ms: float):
+        """Adds a tool call to the current round.
+
+        Arguments:
+            tool_name -- The registered function name.
+            outcome -- ok, error or failed, as tracked by the tool metrics.
+            duration_ms -- The time of the function.
+        """
+        with self._lock:
+            self._round.tool_calls.append(
+                {"name": tool_name, "outcome": outcome, "duration_ms": round(duration_ms, 1)}
+            )
+            self._round.tool_ms += duration_ms
+
+    def end_round(self, speaker: str | None):
+        """Closes the current round with the message of its agent.
+
+        Arguments:
+            speaker -- The agent which sent the message, None at the end of the conversation.
+        """
+        with self._lock:
+            now_ms = self._elapsed_ms()
+            self._round.speaker = speaker
+            self._round.duration_ms = now_ms - self._round.start_ms
+            self.rounds.append(self._round)
+            self._round = TimelineRound(start_ms=now_ms)
+
+    def add_sample(self, stack: str):
+        """Counts a stack of the conversation thread."""
+        with self._lock:
+            self.samples[stack] += 1
+
+    def finish(self, outcome: str):
+        """Ends the timeline, keeping the calls made after the last message as a round."""
+        if self._round.llm_calls or self._round.tool_calls:
+            self.end_round(None)
+        self.duration_ms = self._elapsed_ms()
+        self.outcome = outcome
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the totals of the conversation."""
+        return {
+            "conversation_id": self.conversation_id,
+            "agent_name": self.agent_name,
+            "session_id": self.session_id,
+            "started_at": self.started_at,
+            "outcome": self.outcome,
+            "duration_ms": round(self.duration_ms, 1),
+            "rounds": len(self.rounds),
+            "llm_ms": round(sum(r.llm_ms for r in self.rounds), 1),
+            "tool_ms": round(sum(r.tool_ms for r in self.rounds), 1),
+            "tokens": sum(r.prompt_tokens + r.completion_tokens for r in self.rounds),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the totals, the rounds and the sampled stacks of the conversation."""
+        timeline = {**self.summary(), "timeline": [r.to_dict() for r in self.rounds]}
+        if self.samples:
+            timeline["profile"] = {
+                "samples": sum(self.samples.values()),
+                "stacks": [
+                    {"stack": stack, "samples": count}
+                    for stack, count in self.samples.most_common(MAX_PROFILE_STACKS)
+                ],
+            }
+        return timeline
+
+
+def _folded_stack(frame) -> str:
+    """Returns a stack in the folded format of flame graphs, outermost frame first."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = code.co_filename.rsplit("/", 1)[-1].removesuffix(".py")
+        names.append(f"{module}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class ConversationProfiler:
+    """Profiles the conversations and keeps the timelines of the recent slow ones."""
+
+    def __init__(
+        self,
+        buffer_size: int = 50,
+        slow_conversation_ms: float = 10000.0,
+        sampling_interval_ms: float = 0.0,
+    ):
+        """Creates the profiler.
+
+        Keyword Arguments:
+            buffer_size -- Timelines kept, the oldest are dropped (default: {50})
+            slow_conversation_ms -- Duration from which a timeline is kept (default: {10000.0})
+            sampling_interval_ms -- Interval of the stack samples, 0 for none (default: {0.0})
+        """
+        self.slow_conversation_ms = slow_conversation_ms
+        self.sampling_interval_ms = sampling_interval_ms
+        self._recent: deque = deque(maxlen=buffer_size)
+        self._active: Dict[str, ConversationTimeline] = {}
+        self._lock = threading.Lock()
+        self._conversations_running = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    @contextmanager
+    def profile(
+        self, agent_name: str | None, session_id: str | None, sampled: bool = True
+    ) -> Iterator[ConversationTimeline]:
+        """Context manager recording the timeline of the conversation run inside it.
+
+        Arguments:
+            agent_name -- The agent of the conversation.
+            session_id -- The session id of the request.
+
+        Keyword Arguments:
+            sampled -- Whether the thread may be sampled, not for the event loop (default: {True})
+
+        Yields:
+            The timeline.
+        """
+        sampled = sampled and self.sampling_interval_ms > 0
+        timeline = ConversationTimeline(
+            agent_name, session_id, threading.get_ident() if sampled else None
+        )
+        with self._lock:
+            self._active[timeline.conversation_id] = timeline
+            if sampled:
+                self._start_sampler()
+                self._conversations_running.set()
+
+        token = _current_timeline.set(timeline)
+        outcome = "failed"
+        try:
+            yield timeline
+            outcome = "ok"
+        except ConversationCancelledError:
+            outcome = "cancelled"
+            raise
+        except ConversationBudgetExceededError as e:
+            outcome = f"budget_{e.limit}"
+            raise
+        finally:
+            _current_timeline.reset(token)
+            timeline.finish(outcome)
+            with self._lock:
+                del self._active[timeline.conversation_id]
+                if not any(t.thread_id is not None for t in self._active.values()):
+                    self._conversations_running.clear()
+                if outcome not in ("ok", "cancelled") or (
+                    timeline.duration_ms >= self.slow_conversation_ms
+                ):
+                    self._recent.append(timeline)
+
+    def _start_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(
+                target=self._sample, name="conversation-profiler", daemon=True
+            )
+            self._sampler.start()
+
+    def _sample(self):
+        """Samples the stacks of the running conversation threads, while there are any."""
+        while True:
+            self._conversations_running.wait()
+            time.sleep(self.sampling_interval_ms / 1000)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self._lock:
+                timelines = [t for t in self._active.values() if t.thread_id is not None]
+            for timeline in timelines:
+                frame = frames.get(timeline.thread_id)
+                if frame is not None:
+                    timeline.add_sample(_folded_stack(frame))
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Returns the totals of the kept conversations, the latest first."""
+        with self._lock:
+            return [timeline.summary() for timeline in reversed(self._recent)]
+
+    def get(self, conversation_id: str) -> Dict[str, Any] | None:
+        """Returns the timeline of a kept conversation, None if it is not kept."""
+        with self._lock:
+            timeline = next((t for t in self._recent if t.conversation_id == conversation_id), None)
+        return timeline.to_dict() if timeline is not None else None
+
+
+_current_timeline: ContextVar[ConversationTimeline | None] = ContextVar(
+    "current_timeline", default=None
+)
+
+
+def get_conversation_timeline() -> ConversationTimeline | None:
+    """Returns the timeline of the current conversation, if it is profiled."""
+    return _current_timeline.get()
+
+
+conversation_profiler = (
+    ConversationProfiler(
+        buffer_size=PROFILER_BUFFER_SIZE,
+        slow_conversation_ms=PROFILER_SLOW_CONVERSATION_MS,
+        sampling_interval_ms=PROFILER_SAMPLING_INTERVAL_MS,
+    )
+    if PROFILER_ENABLED
+    else None
+)
@@ -1,131 +1,195 @@
 """Hold the llm config for the agents
+
+"cache_seed": None turns off the autogen disk cache, completions are cached by the
+completion cache of AICoreClient instead. "completion_cache": False opts an agent out.
+"context_budget" sets the token budget the prompts of an agent are compacted to.
+"stream_tokens": False keeps the tokens of an agent out of streamed responses.
 """
 
+from mas_autogen.app.utils.config import CONTEXT_BUDGET_MAX_PROMPT_TOKENS
+
 
-llm_config_for_group_chat_manager = {"model": "gpt-4o", "model_client_cls": "AICoreClient"}
+llm_config_for_group_chat_manager = {
+    "model": "gpt-4o",
+    "model_client_cls": "AICoreClient",
+    "cache_seed": None,
+    # Speaker selection only needs the latest turns.
+    "context_budget": {
+        "name": "group_chat_manager",
+        "max_prompt_tokens": CONTEXT_BUDGET_MAX_PROMPT_TOKENS // 2,
+    },
+    # The speaker names are no answer for the client.
+    "stream_tokens": False,
+}
 
 llm_config_for_weather_agent = {
     "model": "gpt-4o",
     "model_client_cls": "AICoreClient",
-    "functions": [
+    "cache_seed": None,
+    "tools": [
         {
-            "name": "extract_zip_code",
-            "description": "Extract the ZIP code from the given text.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "user_input": {
-                        "type": "string",
-                        "description": "User-provided text from which to extract the ZIP code.",
-                    }
+            "type": "function",
+            "function": {
+                "name": "extract_zip_code",
+                "description": "Extract the ZIP code from the given text.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "user_input": {
+                            "type": "string",
+                            "description": "User-provided text from which to extract the ZIP code.",
+                        }
+                    },
+                    "required": ["user_input"],
                 },
-                "required": ["user_input"],
             },
         },
         {
-            "name": "fetch_weather_data",
-            "description": "Fetch the current weather for a given ZIP code.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "zip_code": {
-                        "type": "string",
-                        "description": "The 5-digit ZIP code for which to retrieve weather.",
-                    }
+            "type": "function",
+            "function": {
+                "name": "fetch_weather_data",
+                "description": "Fetch the current weather for a given ZIP code.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "zip_code": {
+                            "type": "string",
+                            "description": "The 5-digit ZIP code for which to retrieve weather.",
+                        }
+                    },
+                    "required": ["zip_code"],
                 },
-                "required": ["zip_code"],
             },
         },
     ],
     "timeout": 120,
+    "context_budget": {"name": "weather_agent"},
 }
 
 llm_config_for_csr_agent = {
     "model": "gpt-4o",
     "model_client_cls": "AICoreClient",
-    "functions": [
+    "cache_seed": None,
+    "completion_cache": False,
+    "tools": [
         {
-            "name": "send_text_message",
-            "description": "Sends text message to the customer contact using his phone number.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "phone_number": {
-                        "type": "string",
-                        "description": "Phone number of the customer.",
-                    },
-                    "message": {
-                        "type": "string",
-                        "description": "Message for the customer.",
+            "type": "function",
+            "function": {
+                "name": "send_text_message",
+                "description": "Sends text message to the customer contact using his phone number.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "phone_number": {
+                            "type": "string",
+                            "description": "Phone number of the customer.",
+                        },
+                        "message": {
+                            "type": "string",
+                            "description": "Message for the customer.",
+                        },
                     },
+                    "required": ["phone_number", "message"],
                 },
-                "required": ["phone_number", "message"],
             },
         }
     ],
     "timeout": 120,
+    "context_budget": {"name": "csr_agent"},
 }
 
 llm_config_for_finance_agent = {
     "model": "gpt-4o",
     "model_client_cls": "AICoreClient",
-    "functions": [
+    "cache_seed": None,
+    "tools": [
         {
-            "name": "extract_customer_id",
-            "description": "Extract the customer id from the given text.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "user_input": {
-                        "type": "string",
-                        "description": "User-provided text from which to extract the customer id.",
-                    }
+            "type": "function",
+            "function": {
+                "name": "extract_customer_id",
+                "description": "Extract the customer id from the given text.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "user_input": {
+                            "type": "string",
+                            "description": "User-provided text from which to extract the customer id.",
+                        }
+                    },
+                    "required": ["user_input"],
                 },
-                "required": ["user_input"],
             },
         },
         {
-            "name": "fetch_customer_details",
-            "description": "Fetch customer details with the given customer id.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "The customer id to retrieve details",
-                    }
+            "type": "function",
+            "function": {
+                "name": "fetch_customer_details",
+                "description": "Fetch customer details with the given customer id.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "customer_id": {
+                            "type": "string",
+                            "description": "The customer id to retrieve details",
+                        }
+                    },
+                    "required": ["customer_id"],
+                },
+            },
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "fetch_customer_balance",
+                "description": "Fetch customer balance with the given customer id.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "customer_id": {
+                            "type": "string",
+                            "description": "The customer id to retrieve customer balance",
+                        }
+                    },
+                    "required": ["customer_id"],
                 },
-                "required": ["customer_id"],
             },
         },
         {
-            "name": "fetch_customer_balance",
-            "description": "Fetch customer balance with the given customer id.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "The customer id to retrieve customer balance",
-                    }
+            "type": "function",
+            "function": {
+                "name": "fetch_invoices",
+                "description": "Fetch customer invoices with the given customer id.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "customer_id": {
+                            "type": "string",
+                            "description": "The customer id to retrieve customer invoices",
+                        }
+                    },
+                    "required": ["customer_id"],
                 },
-                "required": ["customer_id"],
             },
         },
         {
-            "name": "fetch_invoices",
-            "description": "Fetch customer invoices with the given customer id.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "customer_id": {
-                        "type": "string",
-                        "description": "The customer id to retrieve customer invoices",
-                    }
+            "type": "function",
+            "function": {
+                "name": "fetch_customer_overview",
+                "description": "Fetch customer details, balance and invoices with the given "
+                "customer id in one call.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "customer_id": {
+                            "type": "string",
+                            "description": "The customer id to retrieve the overview",
+                        }
+                    },
+                    "required": ["customer_id"],
                 },
-                "required": ["customer_id"],
             },
         },
     ],
     "timeout": 120,
+    "context_budget": {"name": "finance_agent"},
 }
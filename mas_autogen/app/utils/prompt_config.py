@@ -37,10 +37,20 @@ FINANCE_AGENT_PROMPT = """
                    Do not state 'TERMINATE.' at the end of your response if user is asking to send 
                    communication or reminder or text message to the customer.
                 
+                6. If the user asks for more than one of customer details, balance and invoices,
+                   for example "Get me the details, balance and invoices for CUST002",
+                   call fetch_customer_overview once instead of the single functions.
+                   Independent function calls can be requested together in one response.
+
                 7. If the user asks for customer details, customer balance, invoices or contact information,
                    Once the data is retrieved, you will return the response and reply 'TERMINATE.'.
                    You must explicitly state 'TERMINATE.' at the end of your response. 
                 
+                8. The user input may follow a 'Session Chat History' of earlier messages.
+                   If the history already holds the data asked for in a follow-up question,
+                   answer from it without calling the functions again and reply 'TERMINATE.'.
+                   Use the customer id mentioned last in the history if the user input has none.
+
                 You will provide suggestions to the user about the next possible steps.
                 """
 
@@ -74,4 +84,8 @@ WEATHER_AGENT_PROMPT = """
                 You must explicitly state 'TERMINATE.' at the end of your response. 
                 If the user says, 'Thanks' or 'Done' or 'Bye', respond professionally and 
                 explicitly state 'TERMINATE.' at the end of your response.
+                The user input may follow a 'Session Chat History' of earlier messages. If the
+                history already answers a follow-up question, answer from it without calling the
+                functions again. Use the ZIP code mentioned last in the history if the user input
+                has none.
                 """
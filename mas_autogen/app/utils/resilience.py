@@ -0,0 +1,116 @@
+"""This module holds the retry and circuit breaker helpers for upstream HTTP calls.
+"""
+
+import random
+import threading
+import time
+from typing import Iterator
+from loguru import logger
+from mas_autogen.app.utils.agent_observability import AgentObservability
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker.
+
+    The circuit opens after failure_threshold consecutive failures and rejects
+    calls for reset_timeout seconds. Then one trial call is let through
+    (half open); its success closes the circuit, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30):
+        """Creates a closed circuit breaker.
+
+        Arguments:
+            name -- The upstream name used in logs and metrics.
+
+        Keyword Arguments:
+            failure_threshold -- Consecutive failures opening the circuit (default: {5})
+            reset_timeout -- Seconds the circuit stays open (default: {30})
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """The current circuit state."""
+        return self._state
+
+    def _transition(self, state: str):
+        """Changes the state. Must be called with the lock held."""
+        if state != self._state:
+            logger.warning(f"Circuit '{self.name}' changed from {self._state} to {state}")
+            self._state = state
+            agent_observability_mas.track_circuit_breaker(self.name, state)
+
+    def before_call(self):
+        """Checks whether a call may go through.
+
+        Raises:
+            CircuitOpenError: If the circuit is open or its trial call is in flight.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open.")
+                self._transition(self.HALF_OPEN)
+
+            if self._state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError(f"Circuit '{self.name}' is waiting for a trial call.")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        """Records a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._transition(self.CLOSED)
+
+    def abort_call(self):
+        """Records a call which ended without an answer of the upstream, e.g. cancelled.
+
+        It neither closes nor opens the circuit, but frees the trial call of a half
+        open circuit, so that the next call can be the trial.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Records a failed call."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+
+def backoff_delays(retries: int, base: float, maximum: float) -> Iterator[float]:
+    """Yields exponential backoff delays with full jitter.
+
+    Arguments:
+        retries -- Number of delays, one per retry.
+        base -- Delay ceiling of the first retry in seconds.
+        maximum -- Upper bound of any delay ceiling in seconds.
+
+    Yields:
+        The delays in seconds.
+    """
+    for attempt in range(retries):
+        yield random.uniform(0, min(maximum, base * (2**attempt)))
@@ -0,0 +1,83 @@
+"""This module samples the traces once they finished, keeping the slow and failed ones.
+
+Head sampling decides when a trace starts, before its latency is known. The tail
+sampler holds the ended spans of a trace in memory until its local root span
+ends, then exports all of them if the root took at least the latency threshold
+or a span failed, and only a share of the other traces.
+
+The held traces are bounded. When the bound is reached the oldest trace is
+dropped, so a burst of requests costs spans, not memory. This module imports
+the OpenTelemetry SDK and is only imported by AgentObservability.setup_providers.
+"""
+
+import random
+import threading
+from collections import OrderedDict
+from typing import List
+from opentelemetry.context import Context
+from opentelemetry.sdk.trace import ReadableSpan, Span, SpanProcessor
+from opentelemetry.trace import StatusCode
+
+
+class TailSamplingSpanProcessor(SpanProcessor):
+    """Span processor passing the spans of the kept traces on to another processor."""
+
+    def __init__(
+        self,
+        processor: SpanProcessor,
+        latency_ms: float,
+        sample_ratio: float,
+        max_traces: int = 1024,
+    ):
+        """Creates the tail sampler.
+
+        Arguments:
+            processor -- The processor exporting the kept spans, e.g. a BatchSpanProcessor.
+            latency_ms -- Traces whose root took at least this long are kept.
+            sample_ratio -- Share of the other traces kept, between 0 and 1.
+
+        Keyword Arguments:
+            max_traces -- Unfinished traces held, the oldest are dropped (default: {1024})
+        """
+        self.processor = processor
+        self.latency_ms = latency_ms
+        self.sample_ratio = sample_ratio
+        self.max_traces = max(1, max_traces)
+        self.dropped_traces = 0
+        self._traces: OrderedDict[int, List[ReadableSpan]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span, parent_context: Context | None = None):
+        self.processor.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span: ReadableSpan):
+        trace_id = span.context.trace_id
+        local_root = span.parent is None or span.parent.is_remote
+
+        with self._lock:
+            if not local_root:
+                self._traces.setdefault(trace_id, []).append(span)
+                if len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+                    self.dropped_traces += 1
+                return
+            spans = self._traces.pop(trace_id, [])
+        spans.append(span)
+
+        if self._keep(span, spans):
+            for ended_span in spans:
+                self.processor.on_end(ended_span)
+
+    def _keep(self, root: ReadableSpan, spans: List[ReadableSpan]) -> bool:
+        """Decides whether a finished trace is exported."""
+        if (root.end_time - root.start_time) / 1e6 >= self.latency_ms:
+            return True
+        if any(span.status.status_code is StatusCode.ERROR for span in spans):
+            return True
+        return random.random() < self.sample_ratio
+
+    def shutdown(self):
+        self.processor.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return self.processor.force_flush(timeout_millis)
@@ -0,0 +1,207 @@
+"""This module holds an in-process TTL cache with stale-while-revalidate and request coalescing.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable
+from cachetools import LRUCache
+from loguru import logger
+from mas_autogen.app.utils.agent_observability import AgentObservability
+
+agent_observability_mas = AgentObservability(service_name="mas_app")
+
+
+class _EvictionCountingLRUCache(LRUCache):
+    """LRU cache reporting its evictions."""
+
+    def __init__(self, maxsize: int, on_evict: Callable[[], None]):
+        super().__init__(maxsize=maxsize)
+        self._on_evict = on_evict
+
+    def popitem(self):
+        item = super().popitem()
+        self._on_evict()
+        return item
+
+
+class StaleWhileRevalidateCache:
+    """Thread-safe LRU cache with a fresh TTL and a stale window.
+
+    Within the TTL a value is served as is. Within the stale window after the
+    TTL the stale value is served while one background refresh runs. Older
+    values are loaded again. Concurrent loads of the same key are coalesced
+    into one call of the loader. a_get_or_load takes a coroutine function as
+    loader and awaits it, and its refreshes, on the event loop.
+    """
+
+    _refresh_executor = None
+    _refresh_executor_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0,
+        maxsize: int = 1024,
+        should_cache: Callable[[Any], bool] | None = None,
+    ):
+        """Creates the cache.
+
+        Arguments:
+            name -- The cache name used in metrics.
+            ttl -- Seconds a value is fresh.
+
+        Keyword Arguments:
+            stale_ttl -- Seconds a value may be served stale after the TTL (default: {0})
+            maxsize -- Maximum number of entries (default: {1024})
+            should_cache -- Decides whether a loaded value is stored (default: {None} stores all)
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.should_cache = should_cache or (lambda value: True)
+        self._entries = _EvictionCountingLRUCache(maxsize, self._on_evict)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        # Keeps the background refreshes of the event loop referenced until they finish.
+        self._refreshes = set()
+
+    def _on_evict(self):
+        agent_observability_mas.track_cache_eviction(self.name)
+
+    @classmethod
+    def _get_refresh_executor(cls) -> ThreadPoolExecutor:
+        """Returns the executor shared by the background refreshes of all caches."""
+        with cls._refresh_executor_lock:
+            if cls._refresh_executor is None:
+                cls._refresh_executor = ThreadPoolExecutor(
+                    max_workers=2, thread_name_prefix="cache-refresh"
+                )
+            return cls._refresh_executor
+
+    def _settle(self, key: Hashable, future: Future, value: Any = None, error: Exception = None):
+        """Stores the loaded value of the key and completes its in-flight future."""
+        with self._lock:
+            if error is None and self.should_cache(value):
+                self._entries[key] = (value, time.monotonic())
+            self._in_flight.pop(key, None)
+        if error is None:
+            future.set_result(value)
+        else:
+            future.set_exception(error)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future):
+        """Runs the loader for the in-flight future of the key and stores the value."""
+        try:
+            value = loader()
+        except Exception as e:  # pylint: disable=broad-except
+            self._settle(key, future, error=e)
+            return
+        self._settle(key, future, value)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], future: Future):
+        """Background refresh of a stale entry. Errors keep the stale value."""
+        self._load(key, loader, future)
+        if future.exception() is not None:
+            logger.warning(f"Refreshing '{self.name}' cache entry failed: {future.exception()}")
+
+    def _lookup(self, key: Hashable, start_refresh: Callable[[Future], None]):
+        """Looks the key up and registers the load or the refresh it needs.
+
+        Returns:
+            The lookup result, the cached value and the future of the load.
+        """
+        future = None
+        with self._lock:
+            entry = self._entries.get(key)
+            age = time.monotonic() - entry[1] if entry is not None else None
+
+            if entry is not None and age < self.ttl:
+                result, value = "hit", entry[0]
+            elif entry is not None and age < self.ttl + self.stale_ttl:
+                result, value = "stale", entry[0]
+                if key not in self._in_flight:
+                    refresh = Future()
+                    self._in_flight[key] = refresh
+                    start_refresh(refresh)
+            elif key in self._in_flight:
+                result, value = "coalesced", None
+                future = self._in_flight[key]
+            else:
+                result, value = "miss", None
+                future = Future()
+                self._in_flight[key] = future
+
+        agent_observability_mas.track_cache(self.name, result)
+        return result, value, future
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value of the key or loads it.
+
+        Arguments:
+            key -- The cache key.
+            loader -- Loads the value on a miss.
+
+        Returns:
+            The value.
+        """
+        result, value, future = self._lookup(
+            key,
+            lambda refresh: self._get_refresh_executor().submit(
+                self._refresh, key, loader, refresh
+            ),
+        )
+        if result in ("hit", "stale"):
+            return value
+        if result == "miss":
+            self._load(key, loader, future)
+        return future.result()
+
+    async def _a_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], future: Future):
+        """Async counterpart of _load, awaiting the loader."""
+        try:
+            value = await loader()
+        except Exception as e:  # pylint: disable=broad-except
+            self._settle(key, future, error=e)
+            return
+        except BaseException as e:
+            # Cancelled, the coalesced loads of the key must not wait forever.
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, value)
+
+    async def _a_refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]], future: Future):
+        """Background refresh of a stale entry on the event loop. Errors keep the stale value."""
+        await self._a_load(key, loader, future)
+        if future.exception() is not None:
+            logger.warning(f"Refreshing '{self.name}' cache entry failed: {future.exception()}")
+
+    async def a_get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Returns the cached value of the key or loads it without blocking the event loop.
+
+        Arguments:
+            key -- The cache key.
+            loader -- Coroutine function loading the value on a miss.
+
+        Returns:
+            The value.
+        """
+
+        def start_refresh(refresh: Future):
+            task = asyncio.ensure_future(self._a_refresh(key, loader, refresh))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+
+        result, value, future = self._lookup(key, start_refresh)
+        if result in ("hit", "stale"):
+            return value
+        if result == "miss":
+            await self._a_load(key, loader, future)
+        return await asyncio.wrap_future(future)
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
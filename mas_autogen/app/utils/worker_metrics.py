@@ -0,0 +1,195 @@
+"""This module serves the Prometheus metrics of one or several server processes.
+
+A single server process serves its metrics on METRICS_PORT. With several workers,
+every worker serves its metrics on a free port and records the port in the
+registry directory of the supervisor. The supervisor serves the metrics of all the
+workers on METRICS_PORT: the counters and histograms summed per metric and labels,
+the gauges and info metrics of every worker with its process id as worker label.
+
+A worker which is replaced takes its counts with it, and its successor starts from
+zero, so the summed counters drop. Prometheus reads any drop as a counter reset:
+rate() and increase() stay right apart from the scrape interval of the restart,
+in which they count the totals of the other workers once more.
+"""
+
+import os
+import threading
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict
+from loguru import logger
+from prometheus_client import CONTENT_TYPE_LATEST, start_http_server
+from prometheus_client.parser import text_string_to_metric_families
+from mas_autogen.app.utils.config import METRICS_PORT
+
+# Seconds to wait for the metrics of a worker.
+WORKER_SCRAPE_TIMEOUT = 2
+
+# Per process creation timestamps, a sum of them means nothing.
+SKIPPED_SAMPLE_SUFFIXES = ("_created",)
+
+# Metric types summed over the workers, the samples of the others are kept per worker.
+SUMMED_METRIC_TYPES = ("counter", "histogram")
+
+# Label of the samples kept per worker, the process id of the worker.
+WORKER_LABEL = "worker"
+
+_registry_dir = None
+_metrics_port = None
+_lock = threading.Lock()
+
+
+def set_worker_registry(directory: str | None):
+    """Makes the metrics servers started afterwards register in a supervisor's directory.
+
+    Arguments:
+        directory -- The registry directory, None for a single server process.
+    """
+    global _registry_dir  # pylint: disable=global-statement
+    _registry_dir = directory
+
+
+def start_metrics_server() -> int:
+    """Starts the metrics endpoint of this process once.
+
+    Returns:
+        The port of the metrics endpoint.
+    """
+    global _metrics_port  # pylint: disable=global-statement
+    with _lock:
+        if _metrics_port is not None:
+            return _metrics_port
+
+        if _registry_dir is None:
+            start_http_server(METRICS_PORT)  # Metrics endpoint http://localhost:8000/metrics
+            _metrics_port = METRICS_PORT
+        else:
+            server, _ = start_http_server(0, addr="127.0.0.1")
+            _metrics_port = server.server_port
+            path = os.path.join(_registry_dir, f"{os.getpid()}.port")
+            with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                file.write(str(_metrics_port))
+            os.replace(f"{path}.tmp", path)
+
+        logger.info(f"Serving metrics of process {os.getpid()} on port {_metrics_port}.")
+        return _metrics_port
+
+
+def unregister_worker(registry_dir: str, pid: int):
+    """Removes the metrics port of a worker which exited.
+
+    Arguments:
+        registry_dir -- The registry directory.
+        pid -- The process id of the worker.
+    """
+    try:
+        os.remove(os.path.join(registry_dir, f"{pid}.port"))
+    except FileNotFoundError:
+        pass
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value of the text exposition format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def merge_expositions(expositions: Dict[str, str]) -> str:
+    """Merges the Prometheus text expositions of several workers.
+
+    The samples of counters and histograms are summed per metric and labels. The
+    samples of gauges, e.g. the agent pool size or a ratio, and of info metrics,
+    e.g. target_info, are kept per worker with a worker label, as their sum means
+    nothing or hides the imbalance between the workers.
+
+    Arguments:
+        expositions -- The text expositions by worker.
+
+    Returns:
+        The merged text exposition.
+    """
+    families = OrderedDict()
+    for worker, exposition in expositions.items():
+        for family in text_string_to_metric_families(exposition):
+            merged = families.setdefault(
+                family.name,
+                {"type": family.type, "documentation": family.documentation, "samples": {}},
+            )
+            summed = family.type in SUMMED_METRIC_TYPES
+            for sample in family.samples:
+                if sample.name.endswith(SKIPPED_SAMPLE_SUFFIXES):
+                    continue
+                labels = sample.labels if summed else {**sample.labels, WORKER_LABEL: worker}
+                key = (sample.name, tuple(sorted(labels.items())))
+                merged["samples"][key] = merged["samples"].get(key, 0.0) + sample.value
+
+    lines = []
+    for name, family in families.items():
+        if not family["samples"]:
+            # E.g. the _created families of the counters, all of their samples are skipped.
+            continue
+        # The parser strips _total from counter names, the text format keeps it.
+        if family["type"] == "counter":
+            name = f"{name}_total"
+        lines.append(f"# HELP {name} {family['documentation']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for (sample_name, labels), value in family["samples"].items():
+            label_text = ",".join(f'{key}="{_escape(label)}"' for key, label in labels)
+            lines.append(f"{sample_name}{{{label_text}}} {value!r}")
+    return "\n".join(lines) + "\n"
+
+
+def collect_worker_metrics(registry_dir: str) -> str:
+    """Scrapes the metrics of the registered workers and merges them.
+
+    Arguments:
+        registry_dir -- The registry directory.
+
+    Returns:
+        The merged text exposition.
+    """
+    expositions: Dict[str, str] = {}
+    for file_name in sorted(os.listdir(registry_dir)):
+        if not file_name.endswith(".port"):
+            continue
+        try:
+            with open(os.path.join(registry_dir, file_name), encoding="utf-8") as file:
+                port = int(file.read())
+            url = f"http://127.0.0.1:{port}/metrics"
+            with urllib.request.urlopen(url, timeout=WORKER_SCRAPE_TIMEOUT) as response:
+                expositions[file_name.removesuffix(".port")] = response.read().decode("utf-8")
+        except (OSError, ValueError) as e:
+            # The worker may have exited since it registered.
+            logger.warning(f"Skipping metrics of worker '{file_name}': {e}")
+    return merge_expositions(expositions)
+
+
+def start_aggregated_metrics_server(registry_dir: str) -> ThreadingHTTPServer:
+    """Serves the merged metrics of the workers on METRICS_PORT in a daemon thread.
+
+    Arguments:
+        registry_dir -- The registry directory.
+
+    Returns:
+        The HTTP server.
+    """
+
+    class AggregatedMetricsHandler(BaseHTTPRequestHandler):
+        """Serves the merged metrics on every path, like start_http_server."""
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            body = collect_worker_metrics(registry_dir).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_LATEST)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), AggregatedMetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving the merged metrics of the workers on port {METRICS_PORT}.")
+    return server
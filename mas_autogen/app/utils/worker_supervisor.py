@@ -0,0 +1,189 @@
+"""This module serves the app with several worker processes on one host.
+
+The supervisor imports the app once, binds the listening socket and then forks
+the workers, so the modules are loaded once and shared copy-on-write. Every
+worker builds its own agent pools, chat workers and connections on startup,
+nothing is shared at runtime. The kernel spreads the connections over the
+workers accepting on the shared socket. A worker which dies is replaced.
+
+As the next request of a session may land on another worker, several workers
+refuse to start with the in-memory session store.
+"""
+
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from loguru import logger
+from mas_autogen.app.utils.config import SESSION_STORE_BACKEND
+from mas_autogen.app.utils.worker_metrics import (
+    set_worker_registry,
+    start_aggregated_metrics_server,
+    unregister_worker,
+)
+
+# A worker exiting sooner after its start is replaced only after this delay.
+MIN_WORKER_LIFETIME = 1.0
+
+
+def resolve_worker_count(workers: str) -> int:
+    """Returns the number of worker processes.
+
+    Arguments:
+        workers -- A number, or "auto" for one worker per CPU core.
+
+    Returns:
+        The number of workers, at least 1.
+    """
+    if workers == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def check_session_store(workers: int, session_store_backend: str = SESSION_STORE_BACKEND):
+    """Rejects several workers keeping the session histories in their own memory.
+
+    Arguments:
+        workers -- The number of worker processes.
+
+    Keyword Arguments:
+        session_store_backend -- The session store backend (default: {SESSION_STORE_BACKEND})
+
+    Raises:
+        ValueError: If several workers would use the in-memory session store.
+    """
+    if workers > 1 and session_store_backend == "memory":
+        raise ValueError(
+            f"{workers} workers can not share the in-memory session store, a session would "
+            "lose its history when its next request lands on another worker. "
+            "Set SESSION_STORE_BACKEND=sqlite, or none for no session history."
+        )
+
+
+class WorkerSupervisor:
+    """Forks and supervises the worker processes of a preloaded app."""
+
+    def __init__(self, app, host: str, port: int, workers: int):
+        """Creates the supervisor.
+
+        Arguments:
+            app -- The ASGI app, imported before the workers are forked.
+            host -- The host to listen on.
+            port -- The port to listen on.
+            workers -- The number of worker processes.
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.socket = None
+        self.registry_dir = None
+        self.metrics_server = None
+        self.stopping = False
+        self._children = {}
+
+    def _bind(self) -> socket.socket:
+        """Binds the listening socket shared by the workers."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _run_worker(self):
+        """Runs the app in a forked worker. Never returns."""
+        import uvicorn  # pylint: disable=import-outside-toplevel
+
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self.metrics_server.socket.close()
+            set_worker_registry(self.registry_dir)
+            config = uvicorn.Config(self.app, host=self.host, port=self.port, reload=False)
+            uvicorn.Server(config).run(sockets=[self.socket])
+        except BaseException as e:  # pylint: disable=broad-except
+            logger.error(f"Worker {os.getpid()} failed: {e}")
+            exit_code = 1
+        finally:
+            os._exit(exit_code)  # pylint: disable=protected-access
+
+    def _spawn(self):
+        """Forks a worker."""
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}.")
+
+    def _stop(self, signum, _frame):
+        """Signal handler stopping the workers."""
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Stopping {len(self._children)} worker(s) on signal {signum}.")
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Starts the workers and replaces the ones which die until a stop signal."""
+        self.socket = self._bind()
+        self.registry_dir = tempfile.mkdtemp(prefix="mas-metrics-")
+        self.metrics_server = start_aggregated_metrics_server(self.registry_dir)
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        logger.info(f"Serving on {self.host}:{self.port} with {self.workers} worker(s).")
+
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+
+            while self._children:
+                try:
+                    pid, status = os.wait()
+                except ChildProcessError:
+                    break
+                started = self._children.pop(pid, None)
+                unregister_worker(self.registry_dir, pid)
+                if self.stopping or started is None:
+                    continue
+
+                logger.warning(f"Worker {pid} exited with status {status}, replacing it.")
+                if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                    time.sleep(MIN_WORKER_LIFETIME)
+                if not self.stopping:
+                    self._spawn()
+        finally:
+            self.metrics_server.shutdown()
+            self.socket.close()
+            shutil.rmtree(self.registry_dir, ignore_errors=True)
+
+
+def run_workers(app, host: str, port: int, workers: int):
+    """Serves a preloaded app with several worker processes.
+
+    Falls back to a single process where fork is not available.
+
+    Arguments:
+        app -- The ASGI app.
+        host -- The host to listen on.
+        port -- The port to listen on.
+        workers -- The number of worker processes.
+
+    Raises:
+        ValueError: If several workers would use the in-memory session store.
+    """
+    if workers > 1 and hasattr(os, "fork"):
+        check_session_store(workers)
+        WorkerSupervisor(app, host, port, workers).run()
+        return
+
+    import uvicorn  # pylint: disable=import-outside-toplevel
+
+    uvicorn.run(app, host=host, port=port, reload=False)
@@ -0,0 +1,112 @@
+"""Tests of the telemetry profiles selecting the span and metric exporters."""
+
+from unittest import mock
+import pytest
+from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.metrics.export import InMemoryMetricReader, PeriodicExportingMetricReader
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from mas_autogen.app.utils import agent_observability
+from mas_autogen.app.utils.agent_observability import AgentObservability
+from mas_autogen.app.utils.trace_sampling import TailSamplingSpanProcessor
+
+
+@pytest.fixture
+def observability():
+    """Sets up the providers without touching the global ones, spans and metrics go to memory.
+
+    Yields the instance, the OTLP and console span exporters and the MeterProvider class.
+    """
+    exporter, console = InMemorySpanExporter(), InMemorySpanExporter()
+    with mock.patch.object(AgentObservability, "_providers_ready", False), mock.patch.object(
+        agent_observability.trace, "set_tracer_provider"
+    ), mock.patch.object(agent_observability.metrics, "set_meter_provider"), mock.patch(
+        "opentelemetry.exporter.prometheus.PrometheusMetricReader", InMemoryMetricReader
+    ), mock.patch(
+        "opentelemetry.exporter.otlp.proto.grpc.trace_exporter.OTLPSpanExporter",
+        lambda **_: exporter,
+    ), mock.patch(
+        "opentelemetry.sdk.trace.export.ConsoleSpanExporter", lambda: console
+    ):
+        instance = AgentObservability(service_name="test_profiles")
+        instance.tracer_provider = instance.meter_provider = None
+        with mock.patch("opentelemetry.sdk.metrics.MeterProvider", wraps=MeterProvider) as meters:
+            yield instance, exporter, console, meters
+        if instance.tracer_provider is not None:
+            instance.tracer_provider.shutdown()
+        if instance.meter_provider is not None:
+            instance.meter_provider.shutdown()
+
+
+def _span_processors(instance) -> list:
+    # pylint: disable=protected-access
+    return list(instance.tracer_provider._active_span_processor._span_processors)
+
+
+def _metric_readers(meter_provider) -> list:
+    return meter_provider.call_args.kwargs["metric_readers"]
+
+
+def _export_span(instance):
+    instance.tracer_provider.get_tracer(__name__).start_span("request").end()
+    instance.tracer_provider.force_flush()
+
+
+def test_development_profile_prints_spans_and_metrics(observability):
+    instance, exporter, console, meters = observability
+    assert instance.setup_providers("development")
+
+    processors = _span_processors(instance)
+    assert [type(processor) for processor in processors] == [
+        SimpleSpanProcessor,
+        BatchSpanProcessor,
+    ]
+    assert any(isinstance(r, PeriodicExportingMetricReader) for r in _metric_readers(meters))
+
+    _export_span(instance)
+    assert [span.name for span in console.get_finished_spans()] == ["request"]
+    assert [span.name for span in exporter.get_finished_spans()] == ["request"]
+
+
+def test_production_profile_only_exports_over_otlp(observability):
+    instance, exporter, console, meters = observability
+    assert instance.setup_providers("production")
+
+    assert [type(processor) for processor in _span_processors(instance)] == [BatchSpanProcessor]
+    assert [type(reader) for reader in _metric_readers(meters)] == [InMemoryMetricReader]
+
+    _export_span(instance)
+    assert not console.get_finished_spans()
+    assert [span.name for span in exporter.get_finished_spans()] == ["request"]
+
+
+def test_metrics_profile_sets_up_no_traces(observability):
+    instance, _, _, meters = observability
+    assert instance.setup_providers("metrics")
+    assert instance.tracer_provider is None
+    agent_observability.trace.set_tracer_provider.assert_not_called()
+    assert [type(reader) for reader in _metric_readers(meters)] == [InMemoryMetricReader]
+
+
+def test_tail_sampling_wraps_the_otlp_export(observability):
+    instance, *_ = observability
+    with mock.patch.object(agent_observability, "TELEMETRY_TAIL_SAMPLE_RATIO", 0.1):
+        instance.setup_providers("production")
+    (processor,) = _span_processors(instance)
+    assert isinstance(processor, TailSamplingSpanProcessor)
+    assert isinstance(processor.processor, BatchSpanProcessor)
+    assert processor.sample_ratio == 0.1
+
+
+def test_providers_are_set_up_once(observability):
+    instance, *_ = observability
+    assert instance.setup_providers("metrics")
+    assert not instance.setup_providers("production")
+    assert instance.tracer_provider is None
+
+
+def test_unknown_profile_is_rejected(observability):
+    instance, *_ = observability
+    with pytest.raises(ValueError, match="development"):
+        instance.setup_providers("verbose")
+    assert not AgentObservability._providers_ready  # pylint: disable=protected-access
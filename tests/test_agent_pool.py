@@ -0,0 +1,123 @@
+"""Tests of the checkout, exhaustion and discard of pooled agent graphs."""
+
+import threading
+import time
+from unittest import mock
+import pytest
+from mas_autogen.app.agents.agent_pool import AgentPool, AgentPoolExhaustedError
+
+
+class FakeAgent:
+    """Builds agent graphs without autogen, counting the builds and resets."""
+
+    built = 0
+    fail_reset = False
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        FakeAgent.built += 1
+
+    def create_ai_agents(self):
+        return mock.Mock(name="sender"), mock.Mock(name="receiver")
+
+    def get_ai_agents(self, sender, receiver):
+        return [sender, receiver]
+
+    def reset_ai_agents(self, sender, receiver):
+        if FakeAgent.fail_reset:
+            raise RuntimeError("reset failed")
+
+
+@pytest.fixture(autouse=True)
+def fake_agents():
+    FakeAgent.built = 0
+    FakeAgent.fail_reset = False
+    with mock.patch("mas_autogen.app.agents.conversation_events.register_conversation_events"):
+        yield
+
+
+def test_graphs_are_reused():
+    pool = AgentPool(FakeAgent, "weather", max_size=2)
+    with pool.checkout() as graph:
+        assert pool.stats()["in_use"] == 1
+    with pool.checkout() as second:
+        assert second is graph
+    assert FakeAgent.built == 1
+    assert pool.stats() == {
+        "agent_name": "weather",
+        "max_size": 2,
+        "size": 1,
+        "idle": 1,
+        "in_use": 0,
+    }
+
+
+def test_warm_up_builds_idle_graphs_up_to_the_max_size():
+    pool = AgentPool(FakeAgent, "weather", max_size=2)
+    assert pool.warm_up(3) == 2
+    assert pool.stats()["idle"] == 2
+    assert pool.warm_up(3) == 0
+
+
+def test_exhausted_pool_raises_after_the_timeout():
+    pool = AgentPool(FakeAgent, "weather", max_size=1)
+    graph = pool.acquire()
+    start_time = time.time()
+    with pytest.raises(AgentPoolExhaustedError):
+        pool.acquire(timeout=0.1)
+    assert time.time() - start_time >= 0.1
+
+    pool.release(graph)
+    assert pool.acquire(timeout=0) is graph
+
+
+def test_waiter_gets_the_released_graph():
+    pool = AgentPool(FakeAgent, "weather", max_size=1, checkout_timeout=5)
+    graph = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.release(graph)
+    waiter.join(timeout=1)
+    assert acquired == [graph]
+
+
+def test_graph_failing_its_reset_is_discarded():
+    pool = AgentPool(FakeAgent, "weather", max_size=1)
+    graph = pool.acquire()
+    FakeAgent.fail_reset = True
+    pool.release(graph)
+    assert pool.stats()["size"] == 0
+    assert pool.stats()["idle"] == 0
+
+    FakeAgent.fail_reset = False
+    assert pool.acquire(timeout=0) is not graph
+    assert FakeAgent.built == 2
+
+
+def test_waiter_builds_a_graph_when_one_is_discarded():
+    pool = AgentPool(FakeAgent, "weather", max_size=1, checkout_timeout=5)
+    graph = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+
+    FakeAgent.fail_reset = True
+    start_time = time.time()
+    pool.release(graph)
+    waiter.join(timeout=1)
+
+    assert time.time() - start_time < 1
+    assert len(acquired) == 1 and acquired[0] is not graph
+    assert pool.stats()["size"] == 1
+
+
+def test_failed_build_frees_its_slot():
+    pool = AgentPool(FakeAgent, "weather", max_size=1)
+    with mock.patch.object(FakeAgent, "create_ai_agents", side_effect=RuntimeError("no llm")):
+        with pytest.raises(RuntimeError):
+            pool.acquire()
+    assert pool.stats()["size"] == 0
+    assert pool.acquire(timeout=0) is not None
@@ -0,0 +1,104 @@
+"""Tests of the agent specs, their environment overrides and the agent discovery."""
+
+import sys
+from importlib.metadata import EntryPoint
+from unittest import mock
+import pytest
+from mas_autogen.app.agents import agent_registry as agent_registry_module
+from mas_autogen.app.agents.agent_registry import (
+    AgentRegistry,
+    AgentSpec,
+    AgentSpecError,
+    validate_env_overrides,
+)
+from mas_autogen.app.agents.super_agent import SuperAgent
+
+
+def test_env_overrides_are_parsed_by_field_type(monkeypatch):
+    monkeypatch.setenv("AGENT_WEATHER_POOL_SIZE", "8")
+    monkeypatch.setenv("AGENT_WEATHER_TIMEOUT", "30")
+    monkeypatch.setenv("AGENT_WEATHER_CACHEABLE", "no")
+    monkeypatch.setenv("AGENT_WEATHER_MAX_CONCURRENCY", "2")
+    spec = AgentSpec(name="weather", agent_cls=SuperAgent).with_env_overrides()
+    assert (spec.pool_size, spec.timeout, spec.cacheable, spec.max_concurrency) == (
+        8,
+        30.0,
+        False,
+        2,
+    )
+    validate_env_overrides()
+
+
+@pytest.mark.parametrize(
+    "variable, value",
+    [
+        ("AGENT_WEATHER_POOL_SIZE", "4.5"),
+        ("AGENT_WEATHER_POOL_SIZE", "0"),
+        ("AGENT_WEATHER_TIMEOUT", "soon"),
+        ("AGENT_WEATHER_CACHEABLE", "maybe"),
+        ("AGENT_WEATHER_PRIORITY", "urgent"),
+        ("AGENT_WEATHER_MAX_TOKENS", "-1"),
+    ],
+)
+def test_invalid_env_override_fails_loudly(monkeypatch, variable, value):
+    monkeypatch.setenv(variable, value)
+    with pytest.raises(AgentSpecError, match=variable):
+        AgentSpec(name="weather", agent_cls=SuperAgent).with_env_overrides()
+    with pytest.raises(AgentSpecError, match=variable):
+        validate_env_overrides()
+
+
+def test_invalid_registration_is_rejected():
+    with pytest.raises(AgentSpecError, match="priority"):
+        AgentSpec(name="weather", agent_cls=SuperAgent, priority="urgent")
+
+
+def test_pool_is_a_reserved_agent_name(monkeypatch):
+    with pytest.raises(AgentSpecError, match="reserved"):
+        AgentSpec(name="Pool", agent_cls=SuperAgent)
+
+    # The global pool settings are no overrides of an agent named "pool".
+    monkeypatch.setenv("AGENT_POOL_WARM_UP_SIZE", "0")
+    monkeypatch.setenv("AGENT_POOL_CHECKOUT_TIMEOUT", "-1")
+    validate_env_overrides()
+
+
+@pytest.fixture
+def agents_package(tmp_path, monkeypatch):
+    """Creates an empty agents package and returns its directory."""
+    package = tmp_path / "plugin_agents"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield package
+    for name in [name for name in sys.modules if name.startswith("plugin_agents")]:
+        del sys.modules[name]
+
+
+def test_failing_agent_module_fails_the_discovery(agents_package):
+    (agents_package / "broken_agent.py").write_text("import missing_llm_sdk\n")
+    registry = AgentRegistry(package="plugin_agents", entry_point_group="none")
+    with pytest.raises(ModuleNotFoundError, match="missing_llm_sdk"):
+        registry.discover()
+    assert not registry.discovered
+
+
+def _entry_point(name: str, value: str) -> EntryPoint:
+    return EntryPoint(name=name, value=value, group="mas_autogen.agents")
+
+
+def test_failing_plugin_of_another_package_is_skipped(agents_package):
+    plugins = [_entry_point("translator", "missing_plugin.agent:TranslatorAgent")]
+    registry = AgentRegistry(package="plugin_agents")
+    with mock.patch.object(agent_registry_module, "entry_points", return_value=plugins):
+        registry.discover()
+    assert registry.discovered
+    assert registry.get("translator") is None
+
+
+def test_failing_plugin_of_the_agents_package_fails_the_discovery(agents_package):
+    plugins = [_entry_point("translator", "plugin_agents.missing:TranslatorAgent")]
+    registry = AgentRegistry(package="plugin_agents")
+    with mock.patch.object(agent_registry_module, "entry_points", return_value=plugins):
+        with pytest.raises(ModuleNotFoundError):
+            registry.discover()
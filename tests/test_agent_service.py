@@ -0,0 +1,123 @@
+"""Tests of running conversations on pooled agent graphs."""
+
+import asyncio
+import json
+import threading
+from unittest import mock
+import pytest
+from mas_autogen.app.agents.agent_registry import AgentSpec
+from mas_autogen.app.agents.super_agent import SuperAgent
+from mas_autogen.app.services import agent_service
+from mas_autogen.app.services.agent_service import (
+    ChatRequest,
+    a_run_conversation,
+    stream_conversation,
+)
+from mas_autogen.app.utils.conversation_context import get_conversation_context
+
+
+class _SlowPool:
+    """Pool whose acquire blocks until it is let through."""
+
+    def __init__(self):
+        self.let_through = threading.Event()
+        self.released = []
+
+    def acquire(self):
+        self.let_through.wait(timeout=5)
+        return "graph"
+
+    def release(self, graph):
+        self.released.append(graph)
+
+
+def test_graph_acquired_after_cancellation_goes_back_to_the_pool():
+    async def scenario():
+        pool = _SlowPool()
+        request = asyncio.create_task(a_run_conversation(pool, "hello"))
+        await asyncio.sleep(0.01)
+        request.cancel()
+        await asyncio.gather(request, return_exceptions=True)
+        assert request.cancelled()
+
+        pool.let_through.set()
+        for _ in range(100):
+            if pool.released:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.released == ["graph"]
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def streamed_agent():
+    """Serves a registered "weather" agent with a short heartbeat and no session store."""
+    spec = AgentSpec(name="weather", agent_cls=SuperAgent)
+    with mock.patch.object(
+        agent_service, "CHAT_STREAM_HEARTBEAT_INTERVAL", 0.05
+    ), mock.patch.object(agent_service, "session_store", None), mock.patch.object(
+        agent_service.agent_registry, "get", return_value=spec
+    ):
+        yield mock.Mock(agent_name="weather")
+
+
+def _stream(http_request, agent_pool):
+    request = ChatRequest(agent_name="weather", message="weather in 95014", session_id="s1")
+    return stream_conversation(http_request, request, agent_pool)
+
+
+def test_stream_sends_heartbeats_until_the_final_event(streamed_agent):
+    async def conversation(agent_pool, message, session_id=None):
+        get_conversation_context().emit("message", sender="weather_agent")
+        await asyncio.sleep(0.18)
+        return "Sunny"
+
+    async def scenario():
+        http_request = mock.Mock(is_disconnected=mock.AsyncMock(return_value=False))
+        return [chunk async for chunk in _stream(http_request, streamed_agent)]
+
+    with mock.patch.object(agent_service, "execute_conversation", conversation):
+        chunks = asyncio.run(scenario())
+
+    assert chunks[0] == 'event: message\ndata: {"sender": "weather_agent"}\n\n'
+    assert chunks[-1] == f"event: final\ndata: {json.dumps({'message': 'Sunny'})}\n\n"
+    assert 2 <= chunks.count(": keep-alive\n\n") == len(chunks) - 2
+
+
+def test_stream_cancels_the_conversation_when_the_client_disconnects(streamed_agent):
+    cancelled = []
+
+    async def conversation(agent_pool, message, session_id=None):
+        context = get_conversation_context()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(context.cancelled.is_set())
+            raise
+
+    async def scenario():
+        http_request = mock.Mock(is_disconnected=mock.AsyncMock(side_effect=[False, True]))
+        chunks = [chunk async for chunk in _stream(http_request, streamed_agent)]
+        await asyncio.sleep(0.01)
+        return chunks
+
+    with mock.patch.object(agent_service, "execute_conversation", conversation):
+        chunks = asyncio.run(scenario())
+
+    assert chunks == [": keep-alive\n\n"]
+    assert cancelled == [True]
+
+
+def test_stream_reports_a_failed_conversation(streamed_agent):
+    async def conversation(agent_pool, message, session_id=None):
+        raise RuntimeError("llm down")
+
+    async def scenario():
+        http_request = mock.Mock(is_disconnected=mock.AsyncMock(return_value=False))
+        return [chunk async for chunk in _stream(http_request, streamed_agent)]
+
+    with mock.patch.object(agent_service, "execute_conversation", conversation):
+        chunks = asyncio.run(scenario())
+
+    assert chunks == ['event: error\ndata: {"status_code": 500, "detail": "llm down"}\n\n']
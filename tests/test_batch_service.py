@@ -0,0 +1,97 @@
+"""Tests of parsing and answering chat request batches."""
+
+import asyncio
+import json
+from unittest import mock
+from mas_autogen.app.services import batch_service
+from mas_autogen.app.services.batch_service import BatchRunner, batch_lanes, parse_batch_items
+
+
+def _items(*requests: dict):
+    return parse_batch_items([json.dumps(request) for request in requests], agent_name="finance")
+
+
+def test_invalid_requests_are_kept_with_their_error():
+    items = parse_batch_items(["[1]", "", '{"agent_name": "finance"}', '{"message": "hi"}'])
+    assert [item.error for item in items] == [
+        "Invalid JSON: a request must be a JSON object",
+        "No message given.",
+        "No agent_name given.",
+    ]
+
+
+def test_session_requests_share_a_lane_in_input_order():
+    items = _items(
+        {"message": "one", "session_id": "a"},
+        {"message": "two"},
+        {"message": "three", "session_id": "a"},
+        {"message": "one", "session_id": "a"},
+        {"message": "four", "session_id": "b"},
+    )
+    assert [[item.message for item in lane] for lane in batch_lanes(items)] == [
+        ["one", "three", "one"],
+        ["two"],
+        ["four"],
+    ]
+
+
+def test_only_requests_without_a_session_are_deduplicated():
+    items = _items(
+        {"message": "yes", "session_id": "a"},
+        {"message": "hi"},
+        {"message": "yes", "session_id": "a"},
+        {"message": "hi"},
+        {"message": "yes", "session_id": "b"},
+    )
+    assert [[item.index for item in lane] for lane in batch_lanes(items)] == [[0, 2], [1], [4]]
+
+
+def test_batch_answers_sessions_in_order_with_bounded_workers():
+    running, answered = set(), []
+    max_running = 0
+
+    async def converse(agent_pool, session_id, message, priority):
+        nonlocal max_running
+        assert session_id is None or session_id not in running
+        running.add(session_id or message)
+        max_running = max(max_running, len(running))
+        await asyncio.sleep(0.01)
+        running.discard(session_id or message)
+        answered.append(message)
+        return message.upper()
+
+    items = _items(
+        *({"message": f"a{i}", "session_id": "a"} for i in range(3)),
+        *({"message": f"single{i}"} for i in range(4)),
+        {"message": "a0", "session_id": "a"},
+        {"message": "single0"},
+    )
+
+    async def scenario():
+        with mock.patch.object(batch_service, "converse", converse), mock.patch.object(
+            batch_service, "get_agent_pool", mock.AsyncMock()
+        ):
+            return [result async for result in BatchRunner(max_concurrency=2).run(items)]
+
+    results = asyncio.run(scenario())
+    assert [result.get("message") for result in results[:-1]] == [
+        "A0",
+        "A1",
+        "A2",
+        "SINGLE0",
+        "SINGLE1",
+        "SINGLE2",
+        "SINGLE3",
+        "A0",
+        "SINGLE0",
+    ]
+    assert [result.get("deduplicated") for result in results[:-1]] == [False] * 8 + [True]
+    assert results[-1]["summary"]["conversations"] == 8
+    assert results[-1]["summary"]["deduplicated"] == 1
+    assert max_running == 2
+    assert [message for message in answered if message.startswith("a")] == [
+        "a0",
+        "a1",
+        "a2",
+        "a0",
+    ]
@@ -0,0 +1,89 @@
+"""Tests of the single flight of identical chat requests."""
+
+import asyncio
+from mas_autogen.app.services.chat_coalescer import ChatCoalescer
+
+
+class _Conversation:
+    """Counts its runs and answers once released."""
+
+    def __init__(self):
+        self.runs = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.runs += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"answer {self.runs}"
+
+
+def test_identical_requests_share_one_conversation():
+    async def scenario():
+        coalescer = ChatCoalescer(enabled=True, result_ttl=0)
+        conversation = _Conversation()
+        requests = [
+            asyncio.create_task(coalescer.run("agent", "key", conversation)) for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        conversation.release.set()
+        assert await asyncio.gather(*requests) == ["answer 1"] * 3
+        assert conversation.runs == 1
+
+        # Without a result cache, a later repeat runs again.
+        assert await coalescer.run("agent", "key", conversation) == "answer 2"
+
+    asyncio.run(scenario())
+
+
+def test_result_answers_repeats_only_when_cacheable():
+    async def scenario():
+        coalescer = ChatCoalescer(enabled=True, result_ttl=60)
+        conversation = _Conversation()
+        conversation.release.set()
+        assert await coalescer.run("agent", "key", conversation) == "answer 1"
+        assert await coalescer.run("agent", "key", conversation) == "answer 1"
+        assert await coalescer.run("agent", "other", conversation, cacheable=False) == "answer 2"
+        assert await coalescer.run("agent", "other", conversation, cacheable=False) == "answer 3"
+
+    asyncio.run(scenario())
+
+
+def test_conversation_runs_until_the_last_waiter_leaves():
+    async def scenario():
+        coalescer = ChatCoalescer(enabled=True, result_ttl=0)
+        conversation = _Conversation()
+        first = asyncio.create_task(coalescer.run("agent", "key", conversation))
+        second = asyncio.create_task(coalescer.run("agent", "key", conversation))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        assert conversation.cancelled == 0
+        conversation.release.set()
+        assert await second == "answer 1"
+
+        conversation.release.clear()
+        third = asyncio.create_task(coalescer.run("agent", "key", conversation))
+        await asyncio.sleep(0)
+        third.cancel()
+        await asyncio.gather(third, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert conversation.cancelled == 1
+
+    asyncio.run(scenario())
+
+
+def test_disabled_coalescer_runs_every_request():
+    async def scenario():
+        coalescer = ChatCoalescer(enabled=False)
+        conversation = _Conversation()
+        conversation.release.set()
+        await asyncio.gather(*(coalescer.run("agent", "key", conversation) for _ in range(2)))
+        assert conversation.runs == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,31 @@
+"""Tests of the bounded executor running the conversations."""
+
+import asyncio
+import threading
+import pytest
+from mas_autogen.app.services.chat_executor import ChatExecutor, ChatTimeoutError
+from mas_autogen.app.utils.conversation_context import conversation_context
+
+
+def test_timed_out_thread_conversation_is_cancelled_through_its_context():
+    started = threading.Event()
+
+    def conversation(context):
+        started.set()
+        return context.cancelled.wait(timeout=5)
+
+    async def scenario():
+        executor = ChatExecutor(mode="thread", max_concurrency=1, max_queue_size=0)
+        with conversation_context(session_id="s1") as context:
+            with pytest.raises(ChatTimeoutError):
+                await executor.run(conversation, context, timeout=0.1)
+        assert started.is_set()
+        for _ in range(100):
+            if executor.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert context.cancelled.is_set()
+        assert executor.pending == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,130 @@
+"""Tests of the conversation slots of the chat scheduler."""
+
+import asyncio
+import pytest
+from mas_autogen.app.services.chat_scheduler import (
+    ChatQueueFullError,
+    ChatQueueTimeoutError,
+    ChatScheduler,
+)
+
+
+async def _hold(scheduler: ChatScheduler, started: list, release: asyncio.Event, name: str, **kw):
+    async with scheduler.slot(kw.pop("agent_name", "agent"), kw.pop("max_concurrency", 10), **kw):
+        started.append(name)
+        await release.wait()
+
+
+def test_agent_limit_leaves_slots_to_other_agents():
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=3, max_queue_size=10)
+        started, release = [], asyncio.Event()
+        tasks = [
+            asyncio.create_task(
+                _hold(
+                    scheduler,
+                    started,
+                    release,
+                    f"finance{i}",
+                    agent_name="finance",
+                    max_concurrency=2,
+                )
+            )
+            for i in range(3)
+        ]
+        tasks.append(
+            asyncio.create_task(_hold(scheduler, started, release, "weather", agent_name="weather"))
+        )
+        await asyncio.sleep(0)
+        assert sorted(started) == ["finance0", "finance1", "weather"]
+        assert scheduler.queued == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.running == 0 and scheduler.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_freed_slot_goes_to_the_highest_priority():
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=1, max_queue_size=10)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, started, release, "first"))]
+        await asyncio.sleep(0)
+        for priority in ("batch", "standard", "interactive"):
+            tasks.append(
+                asyncio.create_task(_hold(scheduler, started, release, priority, priority=priority))
+            )
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["first", "interactive", "standard", "batch"]
+
+    asyncio.run(scenario())
+
+
+def test_sessions_take_turns():
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=1, max_queue_size=10)
+        started, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(_hold(scheduler, started, release, "first"))]
+        await asyncio.sleep(0)
+        for name, session_id in (("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")):
+            tasks.append(
+                asyncio.create_task(_hold(scheduler, started, release, name, session_id=session_id))
+            )
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert started == ["first", "a1", "b1", "a2", "a3"]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_and_wait_times_out():
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=1, max_queue_size=1)
+        started, release = [], asyncio.Event()
+        running = asyncio.create_task(_hold(scheduler, started, release, "first"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(ChatQueueTimeoutError):
+            async with scheduler.slot("agent", 10, timeout=0.01):
+                pass
+        waiting = asyncio.create_task(_hold(scheduler, started, release, "second"))
+        await asyncio.sleep(0)
+        with pytest.raises(ChatQueueFullError):
+            async with scheduler.slot("agent", 10):
+                pass
+
+        release.set()
+        await asyncio.gather(running, waiting)
+        assert started == ["first", "second"]
+        assert scheduler.running == 0 and scheduler.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_take_a_slot():
+    async def scenario():
+        scheduler = ChatScheduler(max_concurrency=1, max_queue_size=10)
+        started, release = [], asyncio.Event()
+        running = asyncio.create_task(_hold(scheduler, started, release, "first"))
+        await asyncio.sleep(0)
+        cancelled = asyncio.create_task(_hold(scheduler, started, release, "cancelled"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        assert scheduler.queued == 0
+
+        release.set()
+        await running
+        async with scheduler.slot("agent", 10) as wait_time:
+            assert wait_time >= 0
+        assert started == ["first"]
+        assert scheduler.running == 0
+
+    asyncio.run(scenario())
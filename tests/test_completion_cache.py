@@ -0,0 +1,142 @@
+"""Tests of the LLM completion cache."""
+
+import time
+from unittest import mock
+from openai.types.chat import ChatCompletion
+from mas_autogen.app.utils.completion_cache import (
+    CompletionCache,
+    MemoryCompletionBackend,
+    SqliteCompletionBackend,
+    completion_key,
+)
+from mas_autogen.app.utils.conversation_context import conversation_context
+
+PARAMS = {"model": "gpt-4o", "messages": [{"role": "user", "content": "What is my balance?"}]}
+
+
+def _completion(content: str, finish_reason: str = "stop") -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": finish_reason,
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+
+
+def _memory_cache(**kwargs) -> CompletionCache:
+    return CompletionCache("test", MemoryCompletionBackend("test", ttl=60, maxsize=16), **kwargs)
+
+
+def _ask(cache: CompletionCache, params: dict, content: str = "Your balance is 100.") -> str:
+    response = cache.get_or_create(params, lambda: _completion(content))
+    return response.choices[0].message.content
+
+
+def test_key_ignores_the_transport_parameters():
+    transport = {
+        "stream": True,
+        "timeout": 12.5,
+        "model_client_cls": "AICoreClient",
+        "completion_cache": True,
+        "context_budget": 4000,
+        "stream_tokens": False,
+    }
+    assert completion_key({**PARAMS, **transport}) == completion_key(PARAMS)
+    assert completion_key({**PARAMS, "temperature": 0}) != completion_key(PARAMS)
+    assert completion_key({**PARAMS, "model": "gpt-4o-mini"}) != completion_key(PARAMS)
+
+
+def test_identical_request_is_answered_from_the_cache():
+    cache = _memory_cache()
+    assert _ask(cache, PARAMS) == "Your balance is 100."
+    assert _ask(cache, {**PARAMS, "stream": True}, "created again") == "Your balance is 100."
+    other = {**PARAMS, "messages": [{"role": "user", "content": "What are my invoices?"}]}
+    assert _ask(cache, other, "Two invoices.") == "Two invoices."
+
+
+def test_truncated_and_multi_choice_completions_are_not_cached():
+    cache = _memory_cache()
+    cache.get_or_create(PARAMS, lambda: _completion("Your bal", finish_reason="length"))
+    assert _ask(cache, PARAMS, "created again") == "created again"
+
+    several = {**PARAMS, "n": 2, "messages": [{"role": "user", "content": "Hi"}]}
+    _ask(cache, several, "first")
+    assert _ask(cache, several, "second") == "second"
+
+
+def test_similarity_tier_reuses_the_answer_of_a_reworded_message():
+    vectors = {
+        "What is my balance?": [1.0, 0.0],
+        "what's my balance": [0.99, 0.1],
+        "What are my invoices?": [0.0, 1.0],
+    }
+    cache = _memory_cache(similarity_threshold=0.95, embed=vectors.__getitem__)
+    _ask(cache, PARAMS)
+
+    def reworded(content: str, system: str | None = None) -> dict:
+        messages = [{"role": "user", "content": content}]
+        if system is not None:
+            messages.insert(0, {"role": "system", "content": system})
+        return {**PARAMS, "messages": messages}
+
+    assert _ask(cache, reworded("what's my balance"), "created") == "Your balance is 100."
+    assert _ask(cache, reworded("What are my invoices?"), "Two invoices.") == "Two invoices."
+    # A different conversation prefix never shares answers.
+    assert _ask(cache, reworded("what's my balance", "Be brief."), "Short.") == "Short."
+
+
+def test_failing_embedding_falls_back_to_the_exact_key():
+    cache = _memory_cache(similarity_threshold=0.5, embed=mock.Mock(side_effect=OSError("down")))
+    assert _ask(cache, PARAMS) == "Your balance is 100."
+    assert _ask(cache, PARAMS, "created again") == "Your balance is 100."
+
+
+def test_sqlite_backend_survives_a_restart_and_expires_entries(tmp_path):
+    path = str(tmp_path / "completions.sqlite3")
+    _ask(CompletionCache("test", SqliteCompletionBackend("test", 60, 16, path)), PARAMS)
+    restarted = CompletionCache("test", SqliteCompletionBackend("test", 60, 16, path))
+    assert _ask(restarted, PARAMS, "created again") == "Your balance is 100."
+
+    expiring = CompletionCache("test", SqliteCompletionBackend("test", 0.1, 16, path))
+    time.sleep(0.2)
+    assert _ask(expiring, PARAMS, "created again") == "created again"
+
+
+def test_sqlite_backend_evicts_the_least_recently_used(tmp_path):
+    backend = SqliteCompletionBackend("test", 60, 2, str(tmp_path / "completions.sqlite3"))
+    backend.set("a", "1")
+    time.sleep(0.01)
+    backend.set("b", "2")
+    time.sleep(0.01)
+    assert backend.get("a") == "1"
+    time.sleep(0.01)
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+
+
+def test_cached_completion_of_a_streamed_conversation_is_sent_as_a_token_event():
+    # pylint: disable-next=import-outside-toplevel
+    from mas_autogen.app.utils.aicoreclient import AICoreClient
+
+    client = AICoreClient({"model": "gpt-4o"}, client=mock.Mock())
+    client.completion_cache = _memory_cache()
+    client.completion_cache.get_or_create(
+        {**PARAMS, "stream": True}, lambda: _completion("Your balance is 100.")
+    )
+
+    events = []
+    with conversation_context(session_id="s1", event_sink=events.append):
+        response = client.create(dict(PARAMS))
+    assert response.choices[0].message.content == "Your balance is 100."
+    assert events == [{"event": "token", "content": "Your balance is 100."}]
+    client._oai_client.chat.completions.create.assert_not_called()
@@ -0,0 +1,68 @@
+"""Tests of recording and replaying LLM completions."""
+
+import pytest
+from openai.types.chat import ChatCompletion
+from mas_autogen.app.utils.completion_cassette import CassetteMissError, CompletionCassette
+
+PARAMS = {"model": "gpt-4o", "messages": [{"role": "user", "content": "What is my balance?"}]}
+
+
+def _completion(content: str) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+
+
+def test_recorded_completion_is_replayed_from_the_file(tmp_path):
+    path = str(tmp_path / "cassettes" / "completions.jsonl")
+    recorder = CompletionCassette(path, mode="record")
+    recorder.play(PARAMS, lambda: _completion("Your balance is 100."))
+
+    player = CompletionCassette(path, mode="replay")
+    assert len(player) == 1
+    response = player.play(PARAMS, lambda: pytest.fail("The LLM must not be called."))
+    assert response.choices[0].message.content == "Your balance is 100."
+
+
+def test_replay_miss_raises(tmp_path):
+    player = CompletionCassette(str(tmp_path / "completions.jsonl"), mode="replay")
+    with pytest.raises(CassetteMissError):
+        player.play(PARAMS, lambda: _completion("unused"))
+
+
+def test_auto_mode_records_only_the_misses(tmp_path):
+    cassette = CompletionCassette(str(tmp_path / "completions.jsonl"), mode="auto")
+    calls = []
+
+    def create():
+        calls.append(1)
+        return _completion("recorded")
+
+    cassette.play(PARAMS, create)
+    cassette.play(PARAMS, create)
+    assert len(calls) == 1
+
+
+def test_corrupt_lines_are_skipped(tmp_path):
+    path = tmp_path / "completions.jsonl"
+    CompletionCassette(str(path), mode="record").record(PARAMS, _completion("kept"))
+    with open(path, "a", encoding="utf-8") as file:
+        file.write("{not json\n\n")
+    assert len(CompletionCassette(str(path), mode="replay")) == 1
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CompletionCassette(str(tmp_path / "completions.jsonl"), mode="off")
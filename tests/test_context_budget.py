@@ -0,0 +1,146 @@
+"""Tests of the compaction of agent prompts to a token budget."""
+
+from unittest import mock
+import pytest
+from mas_autogen.app.utils import context_budget
+from mas_autogen.app.utils.context_budget import (
+    CHARS_PER_TOKEN,
+    ContextBudget,
+    _get_encoding,
+    count_message_tokens,
+    count_text_tokens,
+    truncate_text_to_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens():
+    """Counts tokens with the characters per token estimate, tiktoken may be offline."""
+    with mock.patch.object(context_budget, "_get_encoding", return_value=None):
+        yield
+
+
+def _tool_call(call_id: str) -> dict:
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "f"}}],
+    }
+
+
+def _tool_result(call_id: str, content: str) -> dict:
+    return {"role": "tool", "tool_call_id": call_id, "content": content}
+
+
+def test_tokens_are_estimated_without_tiktoken():
+    assert CHARS_PER_TOKEN == 4
+    assert count_text_tokens("") == 0
+    assert count_text_tokens("abcd") == 1
+    assert count_text_tokens("abcde") == 2
+    # 3 tokens of message overhead, "user" and "abcdefgh", the None name is skipped.
+    assert count_message_tokens({"role": "user", "content": "abcdefgh", "name": None}) == 6
+
+    truncated = truncate_text_to_tokens("x" * 40, 2)
+    assert truncated == "xxxxxxxx\n... [8 tokens truncated]"
+    assert truncate_text_to_tokens("x" * 8, 2) == "x" * 8
+
+
+def test_missing_tiktoken_encoding_falls_back_to_the_estimate():
+    with mock.patch("tiktoken.encoding_for_model", side_effect=OSError("offline")):
+        assert _get_encoding.__wrapped__("gpt-4o") is None
+
+
+def test_prompts_within_the_budget_are_left_alone():
+    messages = [{"role": "user", "content": "hello"}]
+    compacted, stats = ContextBudget("agent", max_prompt_tokens=100).compact(messages)
+    assert compacted is messages
+    assert stats["prompt_tokens"] == stats["original_prompt_tokens"]
+    assert stats["pruned_tool_results"] == stats["dropped_messages"] == 0
+
+
+def test_tool_results_of_earlier_rounds_are_pruned():
+    earlier, latest = "e" * 400, "l" * 400
+    messages = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "task"},
+        _tool_call("1"),
+        _tool_result("1", earlier),
+        _tool_call("2"),
+        _tool_result("2", latest),
+    ]
+    budget = ContextBudget("agent", max_prompt_tokens=200, max_tool_result_tokens=10)
+    compacted, stats = budget.compact(messages)
+
+    assert stats["pruned_tool_results"] == 1
+    assert stats["dropped_messages"] == 0
+    assert compacted[3]["content"] == "e" * 40 + "\n... [90 tokens truncated]"
+    assert compacted[3]["tool_call_id"] == "1"
+    # The model is about to use the results of the latest round, they stay whole.
+    assert compacted[5]["content"] == latest
+    assert messages[3]["content"] == earlier
+    assert stats["prompt_tokens"] < stats["original_prompt_tokens"]
+
+
+def test_oldest_turns_are_dropped_and_the_head_is_kept():
+    system = {"role": "system", "content": "sys"}
+    task = {"role": "user", "content": "task"}
+    turns = [{"role": "assistant" if i % 2 else "user", "content": "m" * 40} for i in range(6)]
+    messages = [system, task, *turns]
+    budget = ContextBudget("agent", max_prompt_tokens=60)
+    compacted, stats = budget.compact(messages)
+
+    note = {"role": "system", "content": "[4 earlier messages omitted to fit the context.]"}
+    assert compacted == [system, task, note, turns[4], turns[5]]
+    assert stats["dropped_messages"] == 4
+    assert stats["prompt_tokens"] == sum(count_message_tokens(m) for m in compacted)
+    assert stats["prompt_tokens"] <= 60
+
+
+def test_tool_calls_are_dropped_together_with_their_results():
+    task = {"role": "user", "content": "task"}
+    messages = [
+        task,
+        _tool_call("1"),
+        _tool_result("1", "r" * 40),
+        _tool_result("1", "s" * 40),
+        {"role": "assistant", "content": "a" * 40},
+        {"role": "user", "content": "u" * 40},
+    ]
+    budget = ContextBudget("agent", max_prompt_tokens=50, max_tool_result_tokens=100)
+    compacted, stats = budget.compact(messages)
+
+    assert stats["dropped_messages"] == 4
+    assert compacted[0] == task
+    assert compacted[1]["role"] == "system"
+    assert compacted[2:] == [messages[5]]
+    assert not any(m.get("role") == "tool" for m in compacted)
+
+
+def test_latest_turn_is_kept_over_the_budget():
+    messages = [
+        {"role": "user", "content": "task"},
+        {"role": "assistant", "content": "a" * 400},
+        {"role": "user", "content": "u" * 400},
+    ]
+    compacted, stats = ContextBudget("agent", max_prompt_tokens=10).compact(messages)
+    assert compacted[-1] == messages[-1]
+    assert stats["dropped_messages"] == 1
+    assert stats["prompt_tokens"] > 10
+
+
+def test_apply_compacts_the_request_and_records_metrics():
+    params = {
+        "messages": [{"role": "user", "content": "t"}]
+        + [{"role": "assistant", "content": "a" * 400} for _ in range(3)]
+    }
+    with mock.patch.object(context_budget, "agent_observability_mas") as observability:
+        ContextBudget("finance", max_prompt_tokens=150).apply(params)
+    assert len(params["messages"]) == 3
+    observability.track_context_budget.assert_called_once()
+    assert observability.track_context_budget.call_args.args[0] == "finance"
+
+
+def test_from_config():
+    assert ContextBudget.from_config(None) is None
+    budget = ContextBudget.from_config({"name": "weather", "max_prompt_tokens": 5}, model="gpt-4")
+    assert (budget.name, budget.max_prompt_tokens, budget.model) == ("weather", 5, "gpt-4")
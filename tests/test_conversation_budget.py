@@ -0,0 +1,86 @@
+"""Tests of the limits of the conversation budget."""
+
+from types import SimpleNamespace
+import pytest
+from mas_autogen.app.utils.conversation_budget import (
+    ConversationBudget,
+    ConversationBudgetExceededError,
+    max_duration_within,
+)
+
+
+def _budget(**limits) -> ConversationBudget:
+    return ConversationBudget(
+        **{"max_duration": 0, "max_tokens": 0, "max_rounds": 0, "max_repeats": 0, **limits}
+    )
+
+
+def test_disabled_limits_never_stop_the_conversation():
+    budget = _budget()
+    budget.add_usage(SimpleNamespace(prompt_tokens=10**6, completion_tokens=10**6))
+    for rounds in range(50):
+        budget.check_message("agent", {"content": "same"}, rounds)
+    assert budget.remaining_seconds() is None
+
+
+def test_token_limit():
+    budget = _budget(max_tokens=100)
+    budget.add_usage(SimpleNamespace(prompt_tokens=60, completion_tokens=None))
+    budget.add_usage(None)
+    budget.check()
+    budget.add_usage(SimpleNamespace(prompt_tokens=30, completion_tokens=10))
+    with pytest.raises(ConversationBudgetExceededError) as error:
+        budget.check()
+    assert error.value.limit == "tokens"
+
+
+def test_wall_time_limit_keeps_the_pending_message():
+    budget = _budget(max_duration=5)
+    assert 0 < budget.remaining_seconds() <= 5
+    budget.started -= 10
+    message = {"content": "partial answer"}
+    with pytest.raises(ConversationBudgetExceededError) as error:
+        budget.check_message("agent", message, rounds=0)
+    assert error.value.limit == "wall_time"
+    assert error.value.pending_message is message
+
+
+def test_round_limit():
+    budget = _budget(max_rounds=2)
+    budget.check_message("user_proxy", {"content": "hi"}, rounds=0)
+    budget.check_message("agent", {"content": "hello"}, rounds=1)
+    with pytest.raises(ConversationBudgetExceededError) as error:
+        budget.check_message("user_proxy", {"content": "bye"}, rounds=2)
+    assert error.value.limit == "rounds"
+
+
+def test_repetition_ignores_whitespace_and_case_but_not_the_sender():
+    budget = _budget(max_repeats=1)
+    budget.check_message("agent", {"content": "Checking  the weather"}, rounds=0)
+    budget.check_message("user_proxy", {"content": "checking the weather"}, rounds=1)
+    with pytest.raises(ConversationBudgetExceededError) as error:
+        budget.check_message("agent", {"content": "checking the weather "}, rounds=2)
+    assert error.value.limit == "repetition"
+
+
+def test_repetition_tells_function_calls_apart_by_arguments():
+    budget = _budget(max_repeats=1)
+
+    def call(arguments: str) -> dict:
+        return {
+            "content": None,
+            "tool_calls": [{"function": {"name": "get_weather", "arguments": arguments}}],
+        }
+
+    budget.check_message("agent", call('{"zip": "75001"}'), rounds=0)
+    budget.check_message("agent", call('{"zip": "10001"}'), rounds=1)
+    with pytest.raises(ConversationBudgetExceededError):
+        budget.check_message("agent", call('{"zip": "75001"}'), rounds=2)
+
+
+def test_wall_time_limit_ends_before_the_timeout():
+    assert max_duration_within(120, 60) == 55
+    assert max_duration_within(30, 60) == 30
+    assert max_duration_within(0, 60) == 55
+    assert max_duration_within(120, 8) == 6
+    assert max_duration_within(120, 0) == 120
@@ -0,0 +1,108 @@
+"""Tests of the conversation timelines and the endpoints serving them."""
+
+import time
+from unittest import mock
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from mas_autogen.app.services import debug_service
+from mas_autogen.app.utils.conversation_budget import ConversationBudgetExceededError
+from mas_autogen.app.utils.conversation_context import ConversationCancelledError
+from mas_autogen.app.utils.conversation_profiler import (
+    ConversationProfiler,
+    get_conversation_timeline,
+)
+
+
+def _conversation(profiler, session_id="s1", sleep_ms=0.0, error=None):
+    """Runs a profiled conversation of one round, returns its timeline."""
+    with profiler.profile("weather", session_id) as timeline:
+        assert get_conversation_timeline() is timeline
+        timeline.record_llm_call(5.0, mock.Mock(prompt_tokens=10, completion_tokens=2))
+        timeline.record_tool_call("fetch_weather_data", "ok", 3.0)
+        time.sleep(sleep_ms / 1000)
+        timeline.end_round("weather_agent")
+        if error is not None:
+            raise error
+    return timeline
+
+
+def test_fast_conversations_are_not_kept():
+    profiler = ConversationProfiler(slow_conversation_ms=1000)
+    timeline = _conversation(profiler)
+    assert timeline.outcome == "ok"
+    assert profiler.recent() == []
+    assert get_conversation_timeline() is None
+
+
+def test_conversations_from_the_slow_threshold_are_kept():
+    profiler = ConversationProfiler(slow_conversation_ms=20)
+    _conversation(profiler, session_id="fast")
+    timeline = _conversation(profiler, session_id="slow", sleep_ms=25)
+
+    (summary,) = profiler.recent()
+    assert summary["session_id"] == "slow"
+    assert summary["duration_ms"] >= 20
+    assert (summary["llm_ms"], summary["tool_ms"], summary["tokens"]) == (5.0, 3.0, 12)
+
+    (round_,) = profiler.get(timeline.conversation_id)["timeline"]
+    assert round_["speaker"] == "weather_agent"
+    assert round_["other_ms"] == pytest.approx(round_["duration_ms"] - 8.0, abs=0.2)
+    assert round_["tool_calls"] == [
+        {"name": "fetch_weather_data", "outcome": "ok", "duration_ms": 3.0}
+    ]
+
+
+@pytest.mark.parametrize(
+    "error, outcome, kept",
+    [
+        (RuntimeError("llm down"), "failed", True),
+        (ConversationBudgetExceededError("rounds", "too many rounds"), "budget_rounds", True),
+        (ConversationCancelledError(), "cancelled", False),
+    ],
+)
+def test_failed_conversations_are_kept(error, outcome, kept):
+    profiler = ConversationProfiler(slow_conversation_ms=10000)
+    with pytest.raises(type(error)):
+        _conversation(profiler, error=error)
+    recent = profiler.recent()
+    assert len(recent) == int(kept)
+    if kept:
+        assert recent[0]["outcome"] == outcome
+
+
+def test_buffer_keeps_the_latest_timelines():
+    profiler = ConversationProfiler(buffer_size=3, slow_conversation_ms=0)
+    timelines = [_conversation(profiler, session_id=f"s{index}") for index in range(5)]
+
+    assert [summary["session_id"] for summary in profiler.recent()] == ["s4", "s3", "s2"]
+    assert profiler.get(timelines[0].conversation_id) is None
+    assert profiler.get(timelines[4].conversation_id)["session_id"] == "s4"
+
+
+def _debug_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(debug_service.router)
+    return TestClient(app)
+
+
+def test_debug_endpoints_answer_404_when_the_profiler_is_off():
+    with mock.patch.object(debug_service, "conversation_profiler", None):
+        client = _debug_client()
+        assert client.get("/debug/conversations").status_code == 404
+        assert client.get("/debug/conversations/abc").status_code == 404
+
+
+def test_debug_endpoints_serve_the_kept_timelines():
+    profiler = ConversationProfiler(slow_conversation_ms=0)
+    timeline = _conversation(profiler)
+    with mock.patch.object(debug_service, "conversation_profiler", profiler):
+        client = _debug_client()
+        listing = client.get("/debug/conversations").json()
+        assert listing["slow_conversation_ms"] == 0
+        assert [c["conversation_id"] for c in listing["conversations"]] == [
+            timeline.conversation_id
+        ]
+        response = client.get(f"/debug/conversations/{timeline.conversation_id}")
+        assert response.json()["rounds"] == 1
+        assert client.get("/debug/conversations/unknown").status_code == 404
@@ -0,0 +1,97 @@
+"""Tests of the tiered extraction of customer ids and ZIP codes."""
+
+from unittest import mock
+import pytest
+from mas_autogen.app.functions import entity_extraction
+from mas_autogen.app.functions.entity_extraction import (
+    CUSTOMER_ID_PATTERN,
+    ZIP_CODE_PATTERN,
+    TieredExtractor,
+    normalize_customer_id,
+    normalize_zip_code,
+)
+from mas_autogen.app.utils.conversation_context import conversation_context
+
+
+@pytest.fixture
+def tiers():
+    """Collects the tiers the extractions are tracked with."""
+    with mock.patch.object(entity_extraction, "agent_observability_mas") as observability:
+        yield observability.track_entity_extraction
+
+
+def _customer_ids(llm_answer="CUST999"):
+    llm = mock.Mock(return_value=llm_answer)
+    return TieredExtractor("customer_id", CUSTOMER_ID_PATTERN, normalize_customer_id, llm), llm
+
+
+def _zip_codes(llm_answer="None"):
+    llm = mock.Mock(return_value=llm_answer)
+    return TieredExtractor("zip_code", ZIP_CODE_PATTERN, normalize_zip_code, llm), llm
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("balance of CUST001", ["CUST001"]),
+        ("cust-002 and Cust_003", ["CUST002", "CUST003"]),
+        ("customer cust 4, again CUST4", ["CUST4"]),
+        ("CUST001x and XCUST002 and CUST", []),
+    ],
+)
+def test_customer_id_pattern(text, expected):
+    assert _customer_ids()[0].find_all(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("weather in 95014", ["95014"]),
+        ("weather in 95014-1234", ["95014"]),
+        ("10001 or 94105", ["10001", "94105"]),
+        ("call 1234567 or 1234, CUST12345", []),
+    ],
+)
+def test_zip_code_pattern(text, expected):
+    assert _zip_codes()[0].find_all(text) == expected
+
+
+def test_single_match_in_the_input_uses_the_pattern(tiers):
+    extractor, llm = _customer_ids()
+    assert extractor.extract("what does cust_007 owe?", session_history=["CUST001"]) == "CUST007"
+    llm.assert_not_called()
+    tiers.assert_called_once_with("customer_id", "pattern")
+
+
+def test_no_match_in_the_input_uses_the_latest_match_of_the_history(tiers):
+    extractor, llm = _zip_codes()
+    history = ["weather in 10001", "and in 94105 or 60601?", "thanks"]
+    assert extractor.extract("and tomorrow?", session_history=history) == "60601"
+    llm.assert_not_called()
+    tiers.assert_called_once_with("zip_code", "session_history")
+
+
+def test_ambiguous_input_falls_back_to_the_llm(tiers):
+    extractor, llm = _customer_ids("CUST002")
+    assert extractor.extract("CUST001 or CUST002?", session_history=["CUST003"]) == "CUST002"
+    llm.assert_called_once_with("CUST001 or CUST002?\n\nSession Chat History:\nCUST003")
+    tiers.assert_called_once_with("customer_id", "llm")
+
+
+def test_no_match_anywhere_falls_back_to_the_llm(tiers):
+    extractor, llm = _zip_codes()
+    assert extractor.extract("what is the weather?", session_history=[]) == "None"
+    llm.assert_called_once_with("what is the weather?")
+    tiers.assert_called_once_with("zip_code", "llm")
+
+
+def test_history_defaults_to_the_user_messages_of_the_conversation(tiers):
+    extractor, llm = _customer_ids()
+    history = [
+        {"role": "user", "content": "balance of CUST010"},
+        {"role": "assistant", "content": "CUST011 owes nothing."},
+    ]
+    with conversation_context(session_id="s1", session_history=history):
+        assert extractor.extract("and the invoices?") == "CUST010"
+    assert extractor.extract("and the invoices?") == "CUST999"
+    llm.assert_called_once_with("and the invoices?")
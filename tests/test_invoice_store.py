@@ -0,0 +1,98 @@
+"""Tests of the memory-mapped invoice store and its binary index."""
+
+import json
+import os
+import pytest
+from mas_autogen.app.data.finance_data_store import FinanceDataStore
+from mas_autogen.app.data.invoice_store import (
+    INDEX_SUFFIX,
+    MappedInvoiceStore,
+    check_invoice_store,
+    convert_invoices,
+)
+
+INVOICES = [
+    {"invoice_id": "INV3", "customer_id": "CUST002", "amount": 30},
+    {"invoice_id": "INV1", "customer_id": "CUST001", "amount": 10},
+    {"invoice_id": "INV10", "customer_id": "CUST10", "amount": 100},
+    {"invoice_id": "INV2", "customer_id": "CUST001", "amount": 20},
+    {"invoice_id": "INV4", "customer_id": None, "amount": 40},
+]
+
+
+@pytest.fixture(name="store")
+def fixture_store(tmp_path) -> MappedInvoiceStore:
+    source = tmp_path / "invoices.json"
+    source.write_text(json.dumps({"invoices": INVOICES}), encoding="utf-8")
+    target = str(tmp_path / "invoices.ndjson")
+    assert convert_invoices(str(source), target) == len(INVOICES)
+    return MappedInvoiceStore(file_path=target, reload_interval=0)
+
+
+def test_invoices_of_a_customer_in_file_order(store):
+    assert [invoice["invoice_id"] for invoice in store.get_invoices("CUST001")] == ["INV1", "INV2"]
+    assert [invoice["invoice_id"] for invoice in store.get_invoices("CUST10")] == ["INV10"]
+    assert not store.get_invoices("CUST00")
+    assert not store.get_invoices("CUST0010000000")
+
+
+def test_invoice_by_id(store):
+    assert store.get_invoice("INV10")["amount"] == 100
+    assert store.get_invoice("INV4")["customer_id"] is None
+    assert store.get_invoice("INV") is None
+    assert store.get_invoice("") is None
+
+
+def test_index_is_binary_and_reconverted_data_is_remapped(store, tmp_path):
+    with open(store.file_path + INDEX_SUFFIX, "rb") as index_file:
+        assert index_file.read(8) == b"INVIDX01"
+    assert store.get_invoice("INV5") is None
+
+    source = tmp_path / "invoices.json"
+    source.write_text(
+        json.dumps({"invoices": [*INVOICES, {"invoice_id": "INV5", "customer_id": "CUST001"}]}),
+        encoding="utf-8",
+    )
+    convert_invoices(str(source), store.file_path)
+    assert len(store.get_invoices("CUST001")) == 3
+    assert store.get_invoice("INV5")["customer_id"] == "CUST001"
+
+
+def test_index_of_an_older_convert_is_rejected(store):
+    with open(store.file_path + INDEX_SUFFIX, "w", encoding="utf-8") as index_file:
+        index_file.write(json.dumps({"customer_id": {}, "invoice_id": {}}))
+    with pytest.raises(ValueError, match="convert the invoices again"):
+        store.get_invoice("INV1")
+
+
+def test_converted_file_older_than_its_source_is_not_current(store, tmp_path):
+    source = tmp_path / "invoices.json"
+    assert store.is_current(str(source))
+    os.utime(source, ns=(os.stat(store.file_path).st_mtime_ns + 10**9,) * 2)
+    assert not store.is_current(str(source))
+    assert not MappedInvoiceStore(file_path=str(tmp_path / "missing.ndjson")).is_current()
+
+
+def test_auto_store_serves_the_json_file_when_it_is_newer(store, tmp_path):
+    data_store = FinanceDataStore(invoice_store="json", reload_interval=0)
+    data_store.invoice_store = "auto"
+    data_store.mapped_invoices = store
+    source = tmp_path / "invoices.json"
+    data_store.invoices.file_path = str(source)
+    assert data_store.use_mapped_invoices
+
+    changed = [*INVOICES, {"invoice_id": "INV5", "customer_id": "CUST001"}]
+    source.write_text(json.dumps({"invoices": changed}), encoding="utf-8")
+    os.utime(source, ns=(os.stat(store.file_path).st_mtime_ns + 10**9,) * 2)
+    assert not data_store.use_mapped_invoices
+    assert data_store.get_invoice("INV5")["customer_id"] == "CUST001"
+
+
+def test_mapped_store_without_the_converted_file_fails_at_startup(tmp_path):
+    missing = str(tmp_path / "invoices.ndjson")
+    with pytest.raises(FileNotFoundError, match="convert"):
+        check_invoice_store("mapped", missing)
+    with pytest.raises(ValueError, match="FINANCE_INVOICE_STORE"):
+        check_invoice_store("mmap", missing)
+    check_invoice_store("auto", missing)
+    check_invoice_store("json", missing)
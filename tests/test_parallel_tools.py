@@ -0,0 +1,96 @@
+"""Tests of the concurrent execution of the tool calls of a message."""
+
+import asyncio
+import threading
+import autogen
+from autogen import ConversableAgent
+from mas_autogen.app.agents.parallel_tools import (
+    a_generate_parallel_tool_calls_reply,
+    generate_parallel_tool_calls_reply,
+    register_parallel_tool_execution,
+)
+
+
+def _user_proxy(function_map: dict) -> autogen.UserProxyAgent:
+    user_proxy = autogen.UserProxyAgent(
+        name="user_proxy",
+        human_input_mode="NEVER",
+        code_execution_config=False,
+        is_termination_msg=lambda message: "TERMINATE" in str(message.get("content") or ""),
+    )
+    user_proxy.register_function(function_map)
+    register_parallel_tool_execution(user_proxy)
+    return user_proxy
+
+
+def _tool_call(call_id: str, name: str) -> dict:
+    return {"id": call_id, "type": "function", "function": {"name": name, "arguments": "{}"}}
+
+
+def test_parallel_replies_follow_the_termination_check():
+    user_proxy = _user_proxy({"noop": lambda: "ok"})
+    reply_funcs = [reply["reply_func"] for reply in user_proxy._reply_func_list]
+    termination_check = max(
+        reply_funcs.index(ConversableAgent.check_termination_and_human_reply),
+        reply_funcs.index(ConversableAgent.a_check_termination_and_human_reply),
+    )
+    assert reply_funcs.index(a_generate_parallel_tool_calls_reply) == termination_check + 1
+    assert reply_funcs.index(generate_parallel_tool_calls_reply) == termination_check + 2
+
+
+def test_tool_calls_run_concurrently_in_call_order():
+    both_running = threading.Barrier(2, timeout=5)
+
+    def details():
+        both_running.wait()
+        return "details"
+
+    def balance():
+        both_running.wait()
+        return "balance"
+
+    user_proxy = _user_proxy({"details": details, "balance": balance})
+    assistant = autogen.AssistantAgent(name="finance_agent", llm_config=False)
+    message = {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [_tool_call("1", "details"), _tool_call("2", "balance")],
+    }
+    reply = user_proxy.generate_reply(messages=[message], sender=assistant)
+    assert [response["content"] for response in reply["tool_responses"]] == [
+        "details",
+        "balance",
+    ]
+    assert [response["tool_call_id"] for response in reply["tool_responses"]] == ["1", "2"]
+
+
+def test_terminating_message_is_not_executed():
+    calls = []
+    user_proxy = _user_proxy({"noop": lambda: calls.append(1) or "ok"})
+    assistant = autogen.AssistantAgent(name="finance_agent", llm_config=False)
+    message = {
+        "role": "assistant",
+        "content": "TERMINATE",
+        "tool_calls": [_tool_call("1", "noop"), _tool_call("2", "noop")],
+    }
+    assert user_proxy.generate_reply(messages=[message], sender=assistant) is None
+    assert calls == []
+
+
+def test_single_tool_call_of_an_async_chat_runs_off_the_event_loop():
+    tool_threads = []
+
+    def fetch_weather_data():
+        tool_threads.append(threading.current_thread())
+        return "sunny"
+
+    user_proxy = _user_proxy({"fetch_weather_data": fetch_weather_data})
+    assistant = autogen.AssistantAgent(name="weather_agent", llm_config=False)
+    message = {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [_tool_call("1", "fetch_weather_data")],
+    }
+    reply = asyncio.run(user_proxy.a_generate_reply(messages=[message], sender=assistant))
+    assert [response["content"] for response in reply["tool_responses"]] == ["sunny"]
+    assert tool_threads and tool_threads[0] is not threading.main_thread()
@@ -0,0 +1,124 @@
+"""Tests of the circuit breaker, the backoff delays and the weather API client retries."""
+
+import asyncio
+from unittest import mock
+import pytest
+import requests
+from mas_autogen.app.functions.weather_client import WeatherApiClient, WeatherApiError
+from mas_autogen.app.utils.resilience import CircuitBreaker, CircuitOpenError, backoff_delays
+
+
+def _response(status_code: int, payload: dict | None = None) -> mock.Mock:
+    response = mock.Mock(status_code=status_code, reason="reason", reason_phrase="reason")
+    response.json.return_value = payload or {}
+    return response
+
+
+def _half_open_breaker() -> CircuitBreaker:
+    """Returns a breaker whose next call is the half open trial."""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = _half_open_breaker()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_trial_opens_the_circuit_again():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_aborted_trial_frees_the_half_open_circuit():
+    breaker = _half_open_breaker()
+    breaker.before_call()
+    breaker.abort_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.before_call()
+
+
+def test_backoff_delays_are_capped():
+    delays = list(backoff_delays(6, base=0.5, maximum=2.0))
+    assert len(delays) == 6
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(2.0, 0.5 * 2**attempt)
+
+
+def test_client_retries_retryable_status_codes():
+    client = WeatherApiClient(base_url="http://weather", api_key="key", max_retries=2)
+    client.session.get = mock.Mock(
+        side_effect=[_response(503), _response(200, {"location": "Paris"})]
+    )
+    with mock.patch("mas_autogen.app.functions.weather_client.time.sleep"):
+        assert client.get_current_weather("75001") == {"location": "Paris"}
+    assert client.session.get.call_count == 2
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_does_not_retry_client_errors():
+    client = WeatherApiClient(base_url="http://weather", api_key="key", max_retries=2)
+    client.session.get = mock.Mock(return_value=_response(400))
+    with pytest.raises(WeatherApiError):
+        client.get_current_weather("00000")
+    assert client.session.get.call_count == 1
+
+
+def test_unexpected_error_of_the_trial_call_does_not_stick_the_circuit():
+    client = WeatherApiClient(
+        base_url="http://weather",
+        api_key="key",
+        max_retries=0,
+        circuit_breaker=_half_open_breaker(),
+    )
+    client.session.get = mock.Mock(side_effect=requests.exceptions.ChunkedEncodingError("broken"))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.get_current_weather("75001")
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+
+    client.session.get = mock.Mock(return_value=_response(200, {"location": "Paris"}))
+    assert client.get_current_weather("75001") == {"location": "Paris"}
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_call_does_not_stick_the_circuit():
+    client = WeatherApiClient(
+        base_url="http://weather",
+        api_key="key",
+        max_retries=0,
+        circuit_breaker=_half_open_breaker(),
+    )
+    client._async_client = mock.Mock(get=mock.AsyncMock(side_effect=asyncio.CancelledError))
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(client.a_get_current_weather("75001"))
+    assert client.circuit_breaker.state == CircuitBreaker.HALF_OPEN
+
+    client._async_client.get = mock.AsyncMock(return_value=_response(200, {"location": "Paris"}))
+    assert asyncio.run(client.a_get_current_weather("75001")) == {"location": "Paris"}
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
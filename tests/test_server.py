@@ -0,0 +1,55 @@
+"""Tests of the server startup and the background agent warm up."""
+
+import threading
+from unittest import mock
+import pytest
+from fastapi.testclient import TestClient
+from mas_autogen.app import server
+from mas_autogen.app.agents.agent_registry import AgentSpecError
+
+
+@pytest.fixture
+def startup():
+    """Stubs the observability and the chat workers of the lifespan."""
+    with mock.patch.object(server.agent_observability_mas, "setup_providers"), mock.patch.object(
+        server, "start_metrics_server"
+    ), mock.patch.object(server.chat_executor, "shutdown") as shutdown:
+        yield shutdown
+
+
+def test_requests_are_served_while_the_agents_warm_up(startup):
+    started, finish = threading.Event(), threading.Event()
+
+    def warm_up_agent_pools():
+        started.set()
+        finish.wait(timeout=5)
+
+    with mock.patch.object(server, "warm_up_agent_pools", warm_up_agent_pools):
+        with TestClient(server.app) as client:
+            assert started.wait(timeout=5)
+            assert client.get("/").status_code == 200
+            assert not finish.is_set()
+            finish.set()
+    startup.assert_called_once()
+
+
+def test_failed_warm_up_does_not_stop_the_server(startup):
+    warmed_up = threading.Event()
+
+    def warm_up_agent_pools():
+        warmed_up.set()
+        raise RuntimeError("no LLM credentials")
+
+    with mock.patch.object(server, "warm_up_agent_pools", warm_up_agent_pools):
+        with TestClient(server.app) as client:
+            assert warmed_up.wait(timeout=5)
+            assert client.get("/").status_code == 200
+
+
+def test_invalid_agent_override_fails_the_startup(startup, monkeypatch):
+    monkeypatch.setenv("AGENT_WEATHER_POOL_SIZE", "0")
+    with mock.patch.object(server, "warm_up_agent_pools") as warm_up_agent_pools:
+        with pytest.raises(AgentSpecError):
+            with TestClient(server.app):
+                pass
+    warm_up_agent_pools.assert_not_called()
@@ -0,0 +1,105 @@
+"""Tests of the per-session chat history."""
+
+import time
+import pytest
+from mas_autogen.app.services.session_store import (
+    MemorySessionBackend,
+    SessionStore,
+    SqliteSessionBackend,
+    build_session_message,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def new_store(request, tmp_path):
+    """Returns a function creating a session store on each backend."""
+
+    def create(ttl: float = 60, max_sessions: int = 10, **kwargs) -> SessionStore:
+        if request.param == "sqlite":
+            backend = SqliteSessionBackend(ttl, max_sessions, str(tmp_path / "sessions.sqlite3"))
+        else:
+            backend = MemorySessionBackend(ttl, max_sessions)
+        return SessionStore(backend, **kwargs)
+
+    return create
+
+
+def _contents(history: list) -> list:
+    return [(turn["role"], turn["content"]) for turn in history]
+
+
+def test_exchanges_are_kept_in_order(new_store):
+    store = new_store()
+    store.add_exchange("s1", "finance", "balance of CUST001?", "It is 100.")
+    store.add_exchange("s1", "finance", "and invoices?", "There are two.")
+    store.add_exchange("s2", "weather", "weather in 30041?", "Sunny.")
+
+    history = store.get_history("s1")
+    assert _contents(history) == [
+        ("user", "balance of CUST001?"),
+        ("assistant", "It is 100."),
+        ("user", "and invoices?"),
+        ("assistant", "There are two."),
+    ]
+    assert {turn["agent_name"] for turn in history} == {"finance"}
+    assert store.get_history("unknown") == []
+
+
+def test_history_is_trimmed_to_max_messages(new_store):
+    store = new_store(max_messages=3, max_message_chars=5)
+    store.add_exchange("s1", "finance", "first question", "first answer")
+    store.add_exchange("s1", "finance", "second question", "second answer")
+    assert _contents(store.get_history("s1")) == [
+        ("assistant", "first"),
+        ("user", "secon"),
+        ("assistant", "secon"),
+    ]
+
+
+def test_idle_sessions_expire_and_reads_keep_them_alive(new_store):
+    store = new_store(ttl=0.3)
+    store.add_exchange("idle", "finance", "question", "answer")
+    store.add_exchange("busy", "finance", "question", "answer")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert store.get_history("busy")
+    assert store.get_history("idle") == []
+
+
+def test_least_recently_used_session_is_evicted(new_store):
+    store = new_store(max_sessions=2)
+    store.add_exchange("s1", "finance", "question", "answer")
+    time.sleep(0.01)
+    store.add_exchange("s2", "finance", "question", "answer")
+    time.sleep(0.01)
+    store.get_history("s1")
+    time.sleep(0.01)
+    store.add_exchange("s3", "finance", "question", "answer")
+    assert store.get_history("s2") == []
+    assert store.get_history("s1") and store.get_history("s3")
+
+
+def test_deleted_session_has_no_history(new_store):
+    store = new_store()
+    store.add_exchange("s1", "finance", "question", "answer")
+    store.delete("s1")
+    assert store.get_history("s1") == []
+
+
+def test_sqlite_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SessionStore(SqliteSessionBackend(60, 10, path)).add_exchange("s1", "weather", "hi", "hello")
+    restarted = SessionStore(SqliteSessionBackend(60, 10, path))
+    assert _contents(restarted.get_history("s1")) == [("user", "hi"), ("assistant", "hello")]
+
+
+def test_session_message_prepends_the_history():
+    assert build_session_message("hello", []) == "hello"
+    history = [
+        {"role": "user", "content": "weather in 30041?"},
+        {"role": "assistant", "content": "Sunny."},
+    ]
+    assert build_session_message("and tomorrow?", history) == (
+        "Session Chat History:\nuser: weather in 30041?\nassistant: Sunny.\n\n"
+        "User Input: and tomorrow?"
+    )
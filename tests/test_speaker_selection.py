@@ -0,0 +1,86 @@
+"""Tests of the rule based speaker selection of the finance group chat."""
+
+from unittest import mock
+import autogen
+from mas_autogen.app.agents.speaker_selection import (
+    REMINDER_INTENT_PATTERN,
+    USER_INPUT_MARKER,
+    IntentHandoff,
+    RuleBasedSpeakerSelector,
+)
+
+
+def _group_chat(user_input: str, *messages: dict):
+    user_proxy = autogen.UserProxyAgent(
+        name="user_proxy", human_input_mode="NEVER", code_execution_config=False
+    )
+    user_proxy.register_function({"fetch_customer_details": lambda customer_id: "{}"})
+    finance_agent = autogen.AssistantAgent(name="finance_agent", llm_config=False)
+    csr_agent = autogen.AssistantAgent(name="csr_agent", llm_config=False)
+    group_chat = autogen.GroupChat(
+        agents=[user_proxy, finance_agent, csr_agent],
+        allowed_or_disallowed_speaker_transitions={
+            user_proxy: [finance_agent],
+            finance_agent: [user_proxy, csr_agent],
+            csr_agent: [],
+        },
+        speaker_transitions_type="allowed",
+        messages=[
+            {"role": "user", "content": f"History{USER_INPUT_MARKER}{user_input}"},
+            *messages,
+        ],
+    )
+    return group_chat, user_proxy, finance_agent, csr_agent
+
+
+def _selector(**kwargs) -> RuleBasedSpeakerSelector:
+    return RuleBasedSpeakerSelector(
+        name="finance",
+        handoffs=[
+            IntentHandoff(
+                from_agent="finance_agent",
+                to_agent="csr_agent",
+                pattern=REMINDER_INTENT_PATTERN,
+                after_function="fetch_customer_details",
+            )
+        ],
+        **kwargs,
+    )
+
+
+FETCHED = {
+    "role": "assistant",
+    "content": None,
+    "function_call": {"name": "fetch_customer_details", "arguments": "{}"},
+}
+
+
+def test_handoff_intent_selects_the_csr_agent():
+    group_chat, _, finance_agent, csr_agent = _group_chat(
+        "Send a reminder to customer 42", FETCHED, {"role": "user", "content": "details"}
+    )
+    assert _selector()(finance_agent, group_chat) is csr_agent
+
+
+def test_finance_agent_answers_the_user_proxy_without_a_handoff_intent():
+    group_chat, user_proxy, finance_agent, _ = _group_chat(
+        "What is the balance of customer 42?", {"role": "user", "content": "100"}
+    )
+    selector = _selector(defaults={"finance_agent": "user_proxy"})
+    assert selector(finance_agent, group_chat) is user_proxy
+    assert _selector()(finance_agent, group_chat) == "auto"
+
+
+def test_autogen_shortcuts_are_not_counted_as_rule_wins():
+    group_chat, user_proxy, finance_agent, _ = _group_chat("What is my balance?", FETCHED)
+    selector = _selector(defaults={"finance_agent": "user_proxy"})
+    with mock.patch(
+        "mas_autogen.app.agents.speaker_selection.agent_observability_mas"
+    ) as observability:
+        assert selector(finance_agent, group_chat) is user_proxy
+        group_chat.messages.append({"role": "user", "content": "details"})
+        assert selector(user_proxy, group_chat) is finance_agent
+        observability.track_speaker_selection.assert_not_called()
+
+        selector(finance_agent, group_chat)
+        observability.track_speaker_selection.assert_called_once_with("finance", "default")
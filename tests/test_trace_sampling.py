@@ -0,0 +1,90 @@
+"""Tests of the tail sampling of finished traces."""
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import NonRecordingSpan, SpanContext, Status, StatusCode, TraceFlags
+from mas_autogen.app.utils.trace_sampling import TailSamplingSpanProcessor
+
+MS = 1_000_000  # nanoseconds
+
+
+def _tracer(sample_ratio: float = 0.0, max_traces: int = 1024):
+    exporter = InMemorySpanExporter()
+    sampler = TailSamplingSpanProcessor(
+        SimpleSpanProcessor(exporter),
+        latency_ms=100,
+        sample_ratio=sample_ratio,
+        max_traces=max_traces,
+    )
+    provider = TracerProvider()
+    provider.add_span_processor(sampler)
+    return provider.get_tracer(__name__), sampler, exporter
+
+
+def _trace(tracer, duration_ms: float, failed_child: bool = False, parent=None):
+    """Records a root span with one child, returns the root."""
+    root = tracer.start_span("request", context=parent, start_time=0)
+    child = tracer.start_span("llm_call", context=trace.set_span_in_context(root), start_time=0)
+    if failed_child:
+        child.set_status(Status(StatusCode.ERROR))
+    child.end(end_time=10 * MS)
+    root.end(end_time=int(duration_ms * MS))
+    return root
+
+
+def _exported(exporter) -> list:
+    return sorted(span.name for span in exporter.get_finished_spans())
+
+
+def test_slow_traces_are_kept_with_all_their_spans():
+    tracer, _, exporter = _tracer()
+    _trace(tracer, duration_ms=100)
+    assert _exported(exporter) == ["llm_call", "request"]
+
+
+def test_fast_traces_are_sampled_by_ratio():
+    tracer, _, exporter = _tracer(sample_ratio=0.0)
+    _trace(tracer, duration_ms=99)
+    assert _exported(exporter) == []
+
+    tracer, _, exporter = _tracer(sample_ratio=1.0)
+    _trace(tracer, duration_ms=99)
+    assert _exported(exporter) == ["llm_call", "request"]
+
+
+def test_traces_with_a_failed_span_are_kept():
+    tracer, _, exporter = _tracer()
+    _trace(tracer, duration_ms=1, failed_child=True)
+    assert _exported(exporter) == ["llm_call", "request"]
+
+
+def test_root_with_a_remote_parent_ends_the_local_trace():
+    tracer, sampler, exporter = _tracer()
+    remote = SpanContext(
+        trace_id=0x1234, span_id=0x5678, is_remote=True, trace_flags=TraceFlags(TraceFlags.SAMPLED)
+    )
+    _trace(tracer, duration_ms=200, parent=trace.set_span_in_context(NonRecordingSpan(remote)))
+    assert _exported(exporter) == ["llm_call", "request"]
+    assert not sampler._traces
+
+
+def test_oldest_unfinished_trace_is_evicted():
+    tracer, sampler, exporter = _tracer(max_traces=2)
+    roots = [tracer.start_span("request", start_time=0) for _ in range(3)]
+    for root in roots:
+        tracer.start_span("llm_call", context=trace.set_span_in_context(root)).end()
+    assert sampler.dropped_traces == 1
+    assert len(sampler._traces) == 2
+
+    for root in roots:
+        root.end(end_time=500 * MS)
+    spans = exporter.get_finished_spans()
+    # The evicted trace lost its child span, the others are complete.
+    assert [span.name for span in spans].count("llm_call") == 2
+    assert [span.name for span in spans].count("request") == 3
+    assert roots[0].get_span_context().trace_id not in {
+        span.context.trace_id for span in spans if span.name == "llm_call"
+    }
+    assert not sampler._traces
@@ -0,0 +1,137 @@
+"""Tests of the weather API client against the local weather API stub."""
+
+import asyncio
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+from mas_autogen.app.functions import weather_functions
+from mas_autogen.app.functions.weather_client import WeatherApiClient, WeatherApiError
+from mas_autogen.app.utils.resilience import CircuitBreaker, CircuitOpenError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks"))
+from stub_latency import StubBehavior  # noqa: E402 pylint: disable=wrong-import-position
+from weather_stub_server import WeatherStubHandler  # noqa: E402 pylint: disable=C0413
+
+
+@pytest.fixture
+def weather_stub():
+    """Starts the weather API stub on a free port and yields a function setting its behavior."""
+
+    class Handler(WeatherStubHandler):
+        behavior = StubBehavior()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def configure(**behavior) -> str:
+        Handler.behavior = StubBehavior(**behavior)
+        return f"http://127.0.0.1:{server.server_address[1]}/v1/current.json"
+
+    yield configure
+    server.shutdown()
+    server.server_close()
+
+
+def _client(base_url: str, max_retries: int = 1) -> WeatherApiClient:
+    return WeatherApiClient(
+        base_url=base_url,
+        api_key="stub",
+        timeout=2,
+        max_retries=max_retries,
+        pool_size=2,
+        circuit_breaker=CircuitBreaker("weather_stub", failure_threshold=2, reset_timeout=60),
+    )
+
+
+def test_client_reads_the_current_weather(weather_stub):
+    client = _client(weather_stub())
+    try:
+        for _ in range(2):
+            data = client.get_current_weather("30041")
+            assert data["location"]["name"] == "Stubville 30041"
+            assert data["current"]["temp_c"] == 21.5
+    finally:
+        client.close()
+
+
+def test_async_client_reads_the_current_weather(weather_stub):
+    client = _client(weather_stub())
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                client.a_get_current_weather("30041"), client.a_get_current_weather("10001")
+            )
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(scenario())
+    assert first["location"]["name"] == "Stubville 30041"
+    assert second["location"]["name"] == "Stubville 10001"
+
+
+def test_failing_api_is_retried_then_opens_the_circuit(weather_stub):
+    client = _client(weather_stub(error_rate=1.0, error_statuses=[503]), max_retries=1)
+    try:
+        with pytest.raises(WeatherApiError, match="503"):
+            client.get_current_weather("30041")
+        assert client.circuit_breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            client.get_current_weather("30041")
+    finally:
+        client.close()
+
+
+def test_async_client_does_not_retry_a_rejected_request(weather_stub):
+    client = _client(weather_stub(), max_retries=2)
+    client.api_key = ""
+
+    async def scenario():
+        try:
+            with pytest.raises(WeatherApiError, match="401"):
+                await client.a_get_current_weather("30041")
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_concurrent_async_lookups_share_one_weather_api_call(weather_stub, monkeypatch):
+    client = _client(weather_stub(latency_ms=50))
+    calls = []
+    get_current_weather = client.a_get_current_weather
+
+    async def counted(zip_code):
+        calls.append(zip_code)
+        return await get_current_weather(zip_code)
+
+    monkeypatch.setattr(client, "a_get_current_weather", counted)
+    monkeypatch.setattr(weather_functions, "weather_api_client", client)
+    monkeypatch.setattr(weather_functions, "WEATHER_API_KEY", "stub")
+    weather_functions.weather_cache.clear()
+
+    async def scenario():
+        try:
+            return await asyncio.gather(
+                weather_functions.a_get_weather_data("30041"),
+                weather_functions.a_get_weather_data("30041-1234"),
+            )
+        finally:
+            await client.aclose()
+
+    first, second = asyncio.run(scenario())
+    weather_functions.weather_cache.clear()
+    assert (
+        first
+        == second
+        == {
+            "location": "Stubville 30041",
+            "temperature": 21.5,
+            "condition": "Partly cloudy",
+        }
+    )
+    assert calls == ["30041"]
@@ -0,0 +1,70 @@
+"""Tests of merging the metrics of several server workers."""
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+from mas_autogen.app.utils.worker_metrics import merge_expositions
+
+
+def _exposition(requests: float, in_use: float, bucket: float) -> str:
+    return f"""# HELP target_info Target metadata
+# TYPE target_info gauge
+target_info{{service_name="mas_app"}} 1.0
+# HELP chat_requests_total Chat requests
+# TYPE chat_requests_total counter
+chat_requests_total{{agent_name="weather"}} {requests}
+chat_requests_created{{agent_name="weather"}} 1.7e9
+# HELP agent_pool_in_use Graphs in use
+# TYPE agent_pool_in_use gauge
+agent_pool_in_use{{agent_name="weather"}} {in_use}
+# HELP chat_duration_ms Chat duration
+# TYPE chat_duration_ms histogram
+chat_duration_ms_bucket{{le="100.0"}} {bucket}
+chat_duration_ms_bucket{{le="+Inf"}} {bucket}
+chat_duration_ms_count {bucket}
+chat_duration_ms_sum {bucket * 10}
+"""
+
+
+def _samples(exposition: str) -> dict:
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(exposition)
+        for sample in family.samples
+    }
+
+
+def test_counters_and_histograms_are_summed_gauges_kept_per_worker():
+    merged = _samples(merge_expositions({"101": _exposition(3, 2, 1), "102": _exposition(4, 1, 5)}))
+    assert merged[("chat_requests_total", (("agent_name", "weather"),))] == 7
+    assert merged[("chat_duration_ms_bucket", (("le", "100.0"),))] == 6
+    assert merged[("chat_duration_ms_sum", ())] == 60
+    assert merged[("agent_pool_in_use", (("agent_name", "weather"), ("worker", "101")))] == 2
+    assert merged[("agent_pool_in_use", (("agent_name", "weather"), ("worker", "102")))] == 1
+    assert merged[("target_info", (("service_name", "mas_app"), ("worker", "101")))] == 1
+    assert merged[("target_info", (("service_name", "mas_app"), ("worker", "102")))] == 1
+    assert not any(name.endswith("_created") for name, _ in merged)
+
+
+def test_merged_exposition_round_trips():
+    registry = CollectorRegistry()
+    requests = Counter("chat_requests", "Chat requests", ["agent_name"], registry=registry)
+    requests.labels(agent_name="weather").inc(2)
+    Gauge("agent_pool_in_use", "Graphs in use", registry=registry).set(1)
+    exposition = generate_latest(registry).decode("utf-8")
+
+    merged = merge_expositions({"101": exposition, "102": exposition})
+    # The TYPE line of a counter names its _total samples, else they parse as untyped.
+    assert "# TYPE chat_requests_total counter" in merged
+    assert 'chat_requests_total{agent_name="weather"} 4.0' in merged
+    assert "chat_requests_created" not in merged
+
+    families = {family.name: family for family in text_string_to_metric_families(merged)}
+    assert families["chat_requests"].type == "counter"
+    assert families["chat_requests"].samples[0].value == 4
+    assert families["agent_pool_in_use"].type == "gauge"
+    assert len(families["agent_pool_in_use"].samples) == 2
+
+    # Merging it again keeps the counter typed and summed.
+    remerged = merge_expositions({"supervisor": merged})
+    assert "# TYPE chat_requests_total counter" in remerged
+    assert 'chat_requests_total{agent_name="weather"} 4.0' in remerged
@@ -0,0 +1,157 @@
+"""Tests of the worker processes serving the app."""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+from unittest import mock
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+from mas_autogen.app.utils import worker_supervisor
+from mas_autogen.app.utils.worker_supervisor import (
+    check_session_store,
+    resolve_worker_count,
+    run_workers,
+)
+
+# Serves the process id of the worker, and its metrics from the lifespan like the server.
+WORKER_APP = textwrap.dedent(
+    """
+    import os
+    import sys
+    from contextlib import asynccontextmanager
+    from fastapi import FastAPI
+    from prometheus_client import Counter
+    from mas_autogen.app.utils import worker_metrics
+    from mas_autogen.app.utils.worker_supervisor import run_workers
+
+    worker_metrics.METRICS_PORT = int(sys.argv[2])
+    requests = Counter("worker_requests", "Requests")
+
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        worker_metrics.start_metrics_server()
+        yield
+
+
+    app = FastAPI(lifespan=lifespan)
+
+
+    @app.get("/")
+    async def pid():
+        requests.inc()
+        return {"pid": os.getpid()}
+
+
+    run_workers(app, host="127.0.0.1", port=int(sys.argv[1]), workers=2)
+    """
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 10) -> str:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return response.read().decode("utf-8")
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _worker_pids(port: int, requests: int = 40) -> list:
+    return [json.loads(_get(f"http://127.0.0.1:{port}/"))["pid"] for _ in range(requests)]
+
+
+def _requests_total(metrics_port: int) -> float:
+    exposition = _get(f"http://127.0.0.1:{metrics_port}/")
+    families = {family.name: family for family in text_string_to_metric_families(exposition)}
+    assert "worker_requests_created" not in families
+    return sum(sample.value for sample in families["worker_requests"].samples)
+
+
+def test_worker_count():
+    assert resolve_worker_count("3") == 3
+    assert resolve_worker_count("0") == 1
+    assert resolve_worker_count("auto") == (os.cpu_count() or 1)
+
+
+def test_several_workers_need_a_shared_session_store():
+    with pytest.raises(ValueError, match="SESSION_STORE_BACKEND=sqlite"):
+        check_session_store(2, "memory")
+    check_session_store(1, "memory")
+    check_session_store(2, "sqlite")
+    check_session_store(2, "none")
+
+
+def test_memory_session_store_is_refused_before_forking():
+    with mock.patch.object(worker_supervisor, "SESSION_STORE_BACKEND", "memory"), mock.patch.object(
+        worker_supervisor, "check_session_store", wraps=check_session_store
+    ), mock.patch.object(worker_supervisor, "WorkerSupervisor") as supervisor:
+        with pytest.raises(ValueError):
+            run_workers("app", host="127.0.0.1", port=0, workers=2)
+    supervisor.assert_not_called()
+
+
+def test_single_worker_runs_in_process():
+    with mock.patch("uvicorn.run") as uvicorn_run, mock.patch.object(
+        worker_supervisor, "WorkerSupervisor"
+    ) as supervisor:
+        run_workers("app", host="127.0.0.1", port=8080, workers=1)
+    uvicorn_run.assert_called_once_with("app", host="127.0.0.1", port=8080, reload=False)
+    supervisor.assert_not_called()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="the workers are forked")
+def test_workers_share_the_port_and_are_replaced(tmp_path):
+    port, metrics_port = _free_port(), _free_port()
+    script = tmp_path / "worker_app.py"
+    script.write_text(WORKER_APP)
+    supervisor = subprocess.Popen(
+        [sys.executable, str(script), str(port), str(metrics_port)],
+        env={**os.environ, "SESSION_STORE_BACKEND": "sqlite"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        # Its own process group, so that a failed test kills the workers too.
+        start_new_session=True,
+    )
+    try:
+        answered = _worker_pids(port)
+        for _ in range(5):
+            if len(set(answered)) == 2:
+                break
+            answered += _worker_pids(port)
+        pids = set(answered)
+        assert len(pids) == 2
+
+        # The supervisor sums the requests counted by both workers.
+        assert _requests_total(metrics_port) == len(answered)
+
+        killed = pids.pop()
+        os.kill(killed, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        replaced = set()
+        while len(replaced) < 2 or killed in replaced:
+            assert time.monotonic() < deadline
+            replaced = set(_worker_pids(port))
+        assert pids < replaced
+
+        supervisor.send_signal(signal.SIGTERM)
+        assert supervisor.wait(timeout=10) == 0
+    finally:
+        if supervisor.poll() is None:
+            os.killpg(supervisor.pid, signal.SIGKILL)
+            supervisor.wait()